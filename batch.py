@@ -0,0 +1,11 @@
+import sys
+from source.batch import run_batch
+
+# python batch.py <manifest.json or directory of logs> [workers] [output directory]
+# converts every job on a pool of worker processes (see source/batch.py)
+jobs = sys.argv[1]
+workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+output_dir = sys.argv[3] if len(sys.argv) > 3 else "generated_documents/batch"
+
+if __name__ == "__main__":
+    run_batch(jobs, workers, output_dir)
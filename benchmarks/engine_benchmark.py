@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+# Run from the main directory: python benchmarks/engine_benchmark.py [scale] [descriptors file]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_log import SAMPLE_EVENTS_PER_TRACE, log_parameters, generate_logs
+from source.sinks import StreamingSink
+from source.uri_cache import default_uri_cache
+from source.timestamps import default_timestamp_normalizer
+from source.manual_solution import convert_xes_to_rdf_manual_position
+
+'''
+Compares the two engines of the manual converter on a synthetic log (10x
+data.xes by default): the columnar engine, which gives the URI columns to the
+sink in batches, and the row by row loop.
+
+Every engine is timed with a sink that drops the triples, so that only the
+building and the emission of the triples are timed, and with a StreamingSink
+writing N-Triples. The log is parsed into the XES cache before the runs, the
+best of REPEATS runs is kept.
+'''
+
+OUTPUT_PATH = "generated_documents/engine_benchmark.nt"
+REPEATS = 3
+
+ENGINES = ("columnar", "rows")
+
+
+class NullSink:
+    # Takes the triples one by one and in batches and drops them
+    def __init__(self):
+        self.count = 0
+
+    def bind(self, prefix, namespace):
+        pass
+
+    def add(self, triple):
+        self.count += 1
+
+    def add_columns(self, subjects, predicate, objects, unique=False):
+        self.count += len(subjects)
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return self.count
+
+
+def run(xes_file_path, descriptors_file_path, engine, new_sink):
+    best = None
+    for _ in range(REPEATS):
+        default_uri_cache.clear()
+        default_timestamp_normalizer.clear()
+        sink = new_sink()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            convert_xes_to_rdf_manual_position(xes_file_path, descriptors_file_path, engine=engine, sink=sink)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return round(best, 3), len(sink)
+
+
+if __name__ == "__main__":
+    scale = sys.argv[1] if len(sys.argv) > 1 else "10"
+    scale = float(scale) if "." in scale else int(scale)
+    descriptors_file_path = sys.argv[2] if len(sys.argv) > 2 else "descriptors.json"
+
+    # The same logs as benchmarks/synthetic_benchmark.py
+    directory = os.path.join("generated_documents/benchmark", f"scale_{scale}_e{SAMPLE_EVENTS_PER_TRACE}_c1.0")
+    xes_file_path, _ = generate_logs(directory, **log_parameters(scale))
+    # A first run parses the log into the XES cache
+    with redirect_stdout(io.StringIO()):
+        convert_xes_to_rdf_manual_position(xes_file_path, descriptors_file_path, sink=NullSink())
+
+    sinks = [
+        ("null", NullSink),
+        ("nt", lambda: StreamingSink(OUTPUT_PATH)),
+    ]
+    for sink_name, new_sink in sinks:
+        seconds = {}
+        for engine in ENGINES:
+            seconds[engine], triples = run(xes_file_path, descriptors_file_path, engine, new_sink)
+            print({"sink": sink_name, "engine": engine, "seconds": seconds[engine], "triples": triples})
+        print({"sink": sink_name, "speedup": round(seconds["rows"] / seconds["columnar"], 2)})
+    os.remove(OUTPUT_PATH)
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+
+# Run from the main directory: python benchmarks/graph_insert_benchmark.py [xes file] [descriptors file] [batch size]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source.sinks import GraphSink
+from source.uri_cache import default_uri_cache
+from source.timestamps import default_timestamp_normalizer
+from source.manual_solution import convert_xes_to_rdf_manual_position
+from source.xpath_solution import convert_xes_to_rdf_xpath_position
+
+
+class InsertOnlySink(GraphSink):
+    # Fills the graph like GraphSink but does not write the outputs, so that
+    # only the building of the triples and their insertion are timed
+    def __init__(self, batch_size):
+        super().__init__(os.devnull, os.devnull, batch_size=batch_size)
+        self.adds = 0
+
+    def add(self, triple):
+        self.adds += 1
+        super().add(triple)
+
+    def close(self):
+        self.flush()
+
+
+def run(name, convert, batch_size):
+    default_uri_cache.clear()
+    default_timestamp_normalizer.clear()
+    sink = InsertOnlySink(batch_size)
+
+    start = time.perf_counter()
+    convert(sink)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "converter": name,
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 3),
+        "adds": sink.adds,
+        "triples": len(sink),
+        "triples_per_second": round(len(sink) / elapsed),
+    }
+
+
+if __name__ == "__main__":
+    xes_file_path = sys.argv[1] if len(sys.argv) > 1 else "data.xes"
+    descriptors_file_path = sys.argv[2] if len(sys.argv) > 2 else "descriptors.json"
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+
+    converters = [
+        ("xpath", lambda sink: convert_xes_to_rdf_xpath_position(xes_file_path, descriptors_file_path, sink=sink)),
+        ("manual rows", lambda sink: convert_xes_to_rdf_manual_position(xes_file_path, descriptors_file_path, engine="rows", sink=sink)),
+        ("manual columnar", lambda sink: convert_xes_to_rdf_manual_position(xes_file_path, descriptors_file_path, sink=sink)),
+    ]
+
+    # batch_size 0 is the per-triple Graph.add the converters used before
+    results = []
+    for name, convert in converters:
+        results.append(run(name, convert, 0))
+        results.append(run(name, convert, batch_size))
+    for result in results:
+        print(result)
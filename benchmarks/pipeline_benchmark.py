@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+# Run from the main directory: python benchmarks/pipeline_benchmark.py [xes file] [oced file] [descriptors file]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source.sinks import StreamingSink
+from source.uri_cache import default_uri_cache
+from source.timestamps import default_timestamp_normalizer
+from source.xpath_solution import convert_xes_to_rdf_xpath_position
+from source.read_from_OCED import convert_OCED_to_rdf
+
+OUTPUT_PATH = "generated_documents/pipeline_benchmark.nt"
+
+
+def run(name, convert, pipeline):
+    default_uri_cache.clear()
+    default_timestamp_normalizer.clear()
+    # The triples are streamed to an N-Triples file, so that writing is a stage of its own
+    sink = StreamingSink(OUTPUT_PATH)
+
+    start = time.perf_counter()
+    convert(sink, pipeline)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "converter": name,
+        "pipeline": pipeline,
+        "seconds": round(elapsed, 3),
+        "triples": len(sink),
+        "triples_per_second": round(len(sink) / elapsed),
+    }
+
+
+if __name__ == "__main__":
+    xes_file_path = sys.argv[1] if len(sys.argv) > 1 else "data.xes"
+    oced_file_path = sys.argv[2] if len(sys.argv) > 2 else "OCED_data.json"
+    descriptors_file_path = sys.argv[3] if len(sys.argv) > 3 else "descriptors.json"
+
+    converters = [
+        ("xpath streaming", lambda sink, pipeline: convert_xes_to_rdf_xpath_position(xes_file_path, descriptors_file_path, streaming=True, sink=sink, pipeline=pipeline)),
+        ("oced streaming", lambda sink, pipeline: convert_OCED_to_rdf(oced_file_path, descriptors_file_path, streaming=True, sink=sink, pipeline=pipeline)),
+    ]
+
+    results = []
+    for name, convert in converters:
+        results.append(run(name, convert, False))
+        results.append(run(name, convert, True))
+    os.remove(OUTPUT_PATH)
+    for result in results:
+        print(result)
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+# Run from the main directory: python benchmarks/provenance_benchmark.py [xes file] [descriptors file]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source.sinks import StreamingSink
+from source.uri_cache import default_uri_cache
+from source.timestamps import default_timestamp_normalizer
+from source.provenance import PROVENANCE_LEVELS
+from source.manual_solution import convert_xes_to_rdf_manual_position
+from source.xpath_solution import convert_xes_to_rdf_xpath_position
+
+OUTPUT_PATH = "generated_documents/provenance_benchmark.nt"
+
+
+def run(name, convert, provenance):
+    default_uri_cache.clear()
+    default_timestamp_normalizer.clear()
+    # The triples are streamed to an N-Triples file, its size is the size of the output
+    sink = StreamingSink(OUTPUT_PATH)
+
+    start = time.perf_counter()
+    convert(sink, provenance)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "converter": name,
+        "provenance": provenance,
+        "seconds": round(elapsed, 3),
+        "triples": len(sink),
+        "bytes": os.path.getsize(OUTPUT_PATH),
+    }
+
+
+if __name__ == "__main__":
+    xes_file_path = sys.argv[1] if len(sys.argv) > 1 else "data.xes"
+    descriptors_file_path = sys.argv[2] if len(sys.argv) > 2 else "descriptors.json"
+
+    converters = [
+        ("manual", lambda sink, provenance: convert_xes_to_rdf_manual_position(xes_file_path, descriptors_file_path, sink=sink, provenance=provenance)),
+        ("xpath", lambda sink, provenance: convert_xes_to_rdf_xpath_position(xes_file_path, descriptors_file_path, sink=sink, provenance=provenance)),
+    ]
+
+    results = []
+    for name, convert in converters:
+        # A first run parses the log into the XES cache, the levels are compared without it
+        convert(StreamingSink(OUTPUT_PATH), "none")
+        full = None
+        for provenance in PROVENANCE_LEVELS:
+            result = run(name, convert, provenance)
+            if full is None:
+                full = result
+            # The share of the full output that is left
+            result["triples_ratio"] = round(result["triples"] / full["triples"], 3)
+            result["bytes_ratio"] = round(result["bytes"] / full["bytes"], 3)
+            results.append(result)
+    os.remove(OUTPUT_PATH)
+    for result in results:
+        print(result)
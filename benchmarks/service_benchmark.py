@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import json
+import tempfile
+import subprocess
+import statistics
+import xml.etree.ElementTree as ET
+
+# Run from the main directory: python benchmarks/service_benchmark.py [xes file] [oced file] [descriptors file] [requests]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source.service import ServiceClient
+
+
+def first_trace(xes_file_path):
+    # The first <trace> of the log, as a fragment
+    for _, element in ET.iterparse(xes_file_path):
+        if element.tag.endswith("trace"):
+            return ET.tostring(element)
+
+
+def wait_for(unix_socket, process, seconds=60):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The service stopped before it was ready")
+        if os.path.exists(unix_socket):
+            return
+        time.sleep(0.05)
+    raise RuntimeError("The service did not start in time")
+
+
+def latencies(client, convert, payload, requests, **parameters):
+    # Milliseconds of every request, the first one warms the caches up
+    convert(payload, **parameters)
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        convert(payload, **parameters)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times), 2),
+        "p95_ms": round(times[int(0.95 * (len(times) - 1))], 2),
+        "triples": int(client.last_headers["X-Triples"]),
+    }
+
+
+if __name__ == "__main__":
+    xes_file_path = sys.argv[1] if len(sys.argv) > 1 else "data.xes"
+    oced_file_path = sys.argv[2] if len(sys.argv) > 2 else "OCED_data.json"
+    descriptors_file_path = sys.argv[3] if len(sys.argv) > 3 else "descriptors.json"
+    requests = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+
+    trace = first_trace(xes_file_path)
+    with open(oced_file_path, 'rb') as oced_file:
+        oced = oced_file.read()
+
+    # The same single-trace conversion in a new process, as a run of index.py would do it
+    with tempfile.NamedTemporaryFile("wb", suffix=".xes", delete=False) as fragment_file:
+        fragment_file.write(b'<log xes.version="1.0">' + trace + b'</log>')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"from source.xpath_solution import convert_xes_to_rdf_xpath_position as convert; from source.sinks import StreamingSink; convert({fragment_file.name!r}, {descriptors_file_path!r}, streaming=True, sink=StreamingSink(open(__import__('os').devnull, 'w')))"], check=True, stdout=subprocess.DEVNULL)
+    cold_ms = round((time.perf_counter() - start) * 1000, 1)
+    os.remove(fragment_file.name)
+
+    with tempfile.TemporaryDirectory() as directory:
+        unix_socket = os.path.join(directory, "conversion.sock")
+        service = subprocess.Popen([sys.executable, "service.py", descriptors_file_path, unix_socket], stdout=subprocess.DEVNULL)
+        try:
+            wait_for(unix_socket, service)
+            with ServiceClient(unix_socket=unix_socket) as client:
+                results = {
+                    "new process, xpath trace": {"ms": cold_ms},
+                    "service, xpath trace, nt": latencies(client, client.convert_xes, trace, requests),
+                    "service, xpath trace, turtle": latencies(client, client.convert_xes, trace, requests, format="turtle"),
+                    "service, manual trace, nt": latencies(client, client.convert_xes, trace, requests, converter="manual"),
+                    "service, oced document, nt": latencies(client, client.convert_oced, oced, requests),
+                }
+                results["health"] = client.health()
+        finally:
+            service.terminate()
+            service.wait()
+
+    for name, result in results.items():
+        print(name, json.dumps(result))
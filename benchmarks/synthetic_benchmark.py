@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import multiprocessing
+
+# Run from the main directory: python benchmarks/synthetic_benchmark.py [scales] [results file] [baseline results file]
+# e.g. python benchmarks/synthetic_benchmark.py 1,10,100 generated_documents/benchmark/results.json
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_log import SAMPLE_EVENTS_PER_TRACE, log_parameters, generate_logs
+
+'''
+Times the three converters on synthetic logs of growing size.
+
+For every scale the XES log and the OCED JSON file are generated once in
+generated_documents/benchmark/scale_<scale>/ and every converter is run on them
+in a fresh process, so the peak resident memory (ru_maxrss) of the process is
+the one of that conversion only. The wall time, the peak memory, the number of
+triples, the triples per second and the time of every stage (see
+source/instrumentation.py) of every run are saved as JSON.
+
+Given the results of an earlier run as baseline, the runs that got slower than
+the baseline by more than TOLERANCE are listed and the exit code is 1.
+'''
+
+BENCHMARK_DIRECTORY = "generated_documents/benchmark"
+DESCRIPTORS_FILE_PATH = os.path.abspath("descriptors.json")
+TOLERANCE = 0.2
+
+CONVERTERS = ("manual", "xpath", "oced")
+
+
+def _convert(converter, xes_file_path, oced_file_path, output_directory, connection):
+    # Runs in the benchmark process, the outputs are written in output_directory
+    from source.sinks import GraphSink
+    from source.instrumentation import Instrumentation
+    from source.manual_solution import convert_xes_to_rdf_manual_position
+    from source.xpath_solution import convert_xes_to_rdf_xpath_position
+    from source.read_from_OCED import convert_OCED_to_rdf
+
+    os.makedirs(os.path.join(output_directory, "generated_documents"), exist_ok=True)
+    os.chdir(output_directory)
+    sink = GraphSink(f"{converter}_to_rdf.rdf", f"{converter}_to_owl.owl")
+    instrumentation = Instrumentation()
+
+    start = time.perf_counter()
+    if converter == "manual":
+        report = convert_xes_to_rdf_manual_position(xes_file_path, DESCRIPTORS_FILE_PATH, sink=sink, instrumentation=instrumentation)
+    elif converter == "xpath":
+        report = convert_xes_to_rdf_xpath_position(xes_file_path, DESCRIPTORS_FILE_PATH, sink=sink, instrumentation=instrumentation)
+    else:
+        report = convert_OCED_to_rdf(oced_file_path, DESCRIPTORS_FILE_PATH, sink=sink, instrumentation=instrumentation)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    stages = {stage["stage"]: stage["seconds"] for stage in report.stages}
+    connection.send({"seconds": elapsed, "peak_rss_mb": peak_rss / 1024, "triples": len(sink), "stages": stages})
+    connection.close()
+
+
+def run(converter, xes_file_path, oced_file_path, output_directory):
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_convert, args=(converter, xes_file_path, oced_file_path, output_directory, sender))
+    process.start()
+    sender.close()
+    try:
+        measures = receiver.recv()
+    except EOFError:
+        measures = None
+    process.join()
+    if measures is None:
+        print(f"The {converter} conversion failed with exit code {process.exitcode}!")
+        return None
+
+    input_path = oced_file_path if converter == "oced" else xes_file_path
+    return {
+        "converter": converter,
+        "input_bytes": os.path.getsize(input_path),
+        "seconds": round(measures["seconds"], 3),
+        "peak_rss_mb": round(measures["peak_rss_mb"], 1),
+        "triples": measures["triples"],
+        "triples_per_second": round(measures["triples"] / measures["seconds"]) if measures["seconds"] > 0 else None,
+        "stages": measures["stages"],
+    }
+
+
+def run_benchmark(scales, events_per_trace=SAMPLE_EVENTS_PER_TRACE, cardinality=1.0, converters=CONVERTERS):
+    results = []
+    for scale in scales:
+        parameters = log_parameters(scale, events_per_trace, cardinality)
+        directory = os.path.abspath(os.path.join(BENCHMARK_DIRECTORY, f"scale_{scale}_e{events_per_trace}_c{cardinality}"))
+        xes_file_path, oced_file_path = generate_logs(directory, **parameters)
+        for converter in converters:
+            result = run(converter, xes_file_path, oced_file_path, directory)
+            if result is None:
+                continue
+            result = {"scale": scale, **parameters, **result}
+            print(result)
+            results.append(result)
+    return results
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    # The runs at least tolerance slower than the run of the baseline with the same parameters
+    def key(result):
+        return (result["converter"], result["traces"], result["events_per_trace"], result["cardinality"])
+
+    previous = {key(result): result for result in baseline["results"]}
+    slower = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None or not before["triples_per_second"] or not result["triples_per_second"]:
+            continue
+        if result["triples_per_second"] < before["triples_per_second"] * (1 - tolerance):
+            slower.append({
+                "converter": result["converter"],
+                "scale": result["scale"],
+                "triples_per_second": result["triples_per_second"],
+                "baseline_triples_per_second": before["triples_per_second"],
+            })
+    return slower
+
+
+if __name__ == "__main__":
+    scales = [float(scale) if "." in scale else int(scale) for scale in (sys.argv[1] if len(sys.argv) > 1 else "1,10").split(",")]
+    results_file_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(BENCHMARK_DIRECTORY, "results.json")
+    baseline_file_path = sys.argv[3] if len(sys.argv) > 3 else None
+
+    results = run_benchmark(scales)
+    os.makedirs(os.path.dirname(os.path.abspath(results_file_path)), exist_ok=True)
+    with open(results_file_path, 'w') as results_file:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "results": results,
+        }, results_file, indent=2)
+    print(f"Benchmark results saved to {results_file_path}")
+
+    if baseline_file_path is not None:
+        with open(baseline_file_path, 'r') as baseline_file:
+            slower = regressions(results, json.load(baseline_file))
+        for regression in slower:
+            print("Regression:", regression)
+        if len(slower) > 0:
+            sys.exit(1)
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import random
+from datetime import datetime, timedelta
+from xml.sax.saxutils import quoteattr
+
+# Run from the main directory: python benchmarks/synthetic_log.py [scale] [output directory] [events per trace] [cardinality]
+
+'''
+Synthetic incident logs with the schema of descriptors.json, to measure the
+converters on logs larger than data.xes.
+
+A log is described by its number of traces, the number of events of every
+trace and a cardinality factor that multiplies the number of distinct values
+of the attributes found in data.xes (140 products, 241 resources, ...).
+Scale 1 has the 819 traces of data.xes, scale 1000 has 819000.
+
+The events are drawn from a random generator seeded with seed, so the XES file
+and the OCED JSON file written for the same parameters describe the same events
+and every run writes the same files. Both files are written as they are
+generated, the events are never all held in memory.
+'''
+
+SAMPLE_TRACES = 819
+SAMPLE_EVENTS_PER_TRACE = 3
+
+# Distinct values of the attributes in data.xes
+SAMPLE_CARDINALITY = {
+    "product": 140,
+    "org:resource": 241,
+    "org:role": 26,
+    "oranization country": 14,
+    "resource country": 15,
+    "org:group": 12,
+}
+
+STATUSES = ["Accepted", "Queued", "Completed", "Unmatched"]
+TRANSITIONS = ["In Progress", "Awaiting Assignment", "Closed", "Assigned", "Wait"]
+IMPACTS = ["Medium", "High", "Low", "Major"]
+
+START_TIME = datetime.fromisoformat("2006-11-07T10:00:36+01:00")
+
+
+def log_parameters(scale=1, events_per_trace=SAMPLE_EVENTS_PER_TRACE, cardinality=1.0, seed=0):
+    return {
+        "traces": int(SAMPLE_TRACES * scale),
+        "events_per_trace": events_per_trace,
+        "cardinality": cardinality,
+        "seed": seed,
+    }
+
+
+def _values(key, cardinality):
+    count = max(1, int(SAMPLE_CARDINALITY[key] * cardinality))
+    prefix = {
+        "product": "PROD",
+        "org:resource": "Resource",
+        "org:role": "A",
+        "oranization country": "country",
+        "resource country": "Country",
+        "org:group": "Org line ",
+    }[key]
+    return [f"{prefix}{index}" for index in range(count)]
+
+
+def synthetic_traces(traces, events_per_trace, cardinality, seed):
+    # Yields (trace id, [event attributes]) for every trace of the log
+    generator = random.Random(seed)
+    values = {key: _values(key, cardinality) for key in SAMPLE_CARDINALITY}
+
+    for trace_index in range(traces):
+        trace_id = f"1-{147898401 + trace_index}"
+        time = START_TIME + timedelta(hours=trace_index)
+        # The objects of an incident do not change from one event to the next
+        objects = {key: generator.choice(values[key]) for key in SAMPLE_CARDINALITY}
+        impact = generator.choice(IMPACTS)
+        events = []
+        for _ in range(events_per_trace):
+            time += timedelta(seconds=generator.randrange(60, 86400))
+            event = dict(objects)
+            event["concept:name"] = generator.choice(STATUSES)
+            event["lifecycle:transition"] = generator.choice(TRANSITIONS)
+            event["impact"] = impact
+            event["time:timestamp"] = time.isoformat()
+            events.append(event)
+        yield trace_id, events
+
+
+def write_xes(xes_file_path, traces, events_per_trace, cardinality, seed):
+    with open(xes_file_path, 'w', encoding="utf-8") as xes_file:
+        xes_file.write('<?xml version="1.0" encoding="UTF-8" ?>\n')
+        xes_file.write('<log xes.version="1.0" xes.features="nested-attributes" xmlns="http://www.xes-standard.org/">\n')
+        xes_file.write('\t<extension name="Lifecycle" prefix="lifecycle" uri="http://www.xes-standard.org/lifecycle.xesext"/>\n')
+        xes_file.write('\t<extension name="Organizational" prefix="org" uri="http://www.xes-standard.org/org.xesext"/>\n')
+        xes_file.write('\t<extension name="Time" prefix="time" uri="http://www.xes-standard.org/time.xesext"/>\n')
+        xes_file.write('\t<extension name="Concept" prefix="concept" uri="http://www.xes-standard.org/concept.xesext"/>\n')
+        xes_file.write('\t<classifier name="Activity classifier" keys="concept:name lifecycle:transition"/>\n')
+        for trace_id, events in synthetic_traces(traces, events_per_trace, cardinality, seed):
+            lines = ['\t<trace>\n', f'\t\t<string key="concept:name" value={quoteattr(trace_id)}/>\n']
+            for event in events:
+                lines.append('\t\t<event>\n')
+                for key, value in event.items():
+                    element = "date" if key == "time:timestamp" else "string"
+                    lines.append(f'\t\t\t<{element} key={quoteattr(key)} value={quoteattr(value)}/>\n')
+                lines.append('\t\t</event>\n')
+            lines.append('\t</trace>\n')
+            xes_file.write("".join(lines))
+        xes_file.write('</log>\n')
+
+
+def _oced_records(table, traces, events_per_trace, cardinality, seed):
+    # Yields the records of one table of the OCED model of the synthetic log
+    objects = (
+        ("Product", lambda event: [event["product"]], [("Product_number", "product")]),
+        ("Support_Team_ST", lambda event: [event["org:role"], event["oranization country"]],
+         [("Support_Team_function_division", "org:role"), ("Support_Team_country", "oranization country")]),
+        ("ST_responsible", lambda event: [event["org:resource"], event["resource country"]],
+         [("ST_resp_person_first_name", "org:resource"), ("ST_resp_person_op_country", "resource country")]),
+    )
+    relations = ("has_product", "has_support_team", "has_support_team_responsible", "is_part_of_case")
+
+    if table == "event_type":
+        for status in STATUSES:
+            for transition in TRANSITIONS:
+                yield {"event_type": f"{status} {transition}"}
+        return
+    if table == "event_attribute_name":
+        for name in ("Status", "Sub-status", "Impact"):
+            yield {"event_attribute_name": name}
+        return
+    if table == "object_type":
+        for object_type in ("Product", "Support_Team_ST", "ST_responsible", "Incident"):
+            yield {"object_type": object_type}
+        return
+    if table == "object_attribute_name":
+        for object_type, _, attributes in objects:
+            for name, _ in attributes:
+                yield {"object_attribute_name": name}
+        yield {"object_attribute_name": "Incident_number"}
+        return
+    if table == "object_relation_type":
+        yield {"object_relation_type": "WORKS_FOR"}
+        return
+
+    seen = set()
+    event_number = 0
+    value_number = 0
+    relation_number = 0
+    for trace_id, events in synthetic_traces(traces, events_per_trace, cardinality, seed):
+        incident_id = f"object_{trace_id}"
+        for event in events:
+            event_number += 1
+            event_id = f"event_id{event_number}"
+            object_ids = ["object_" + "_".join(identifier(event)) for _, identifier, _ in objects] + [incident_id]
+
+            if table == "event":
+                yield {"event_id": event_id, "event_type": f"{event['concept:name']} {event['lifecycle:transition']}", "event_time": event["time:timestamp"]}
+            elif table == "event_time":
+                if not event["time:timestamp"] in seen:
+                    seen.add(event["time:timestamp"])
+                    yield {"event_time": event["time:timestamp"]}
+            elif table == "event_attribute_value":
+                for name, key in (("Status", "concept:name"), ("Sub-status", "lifecycle:transition"), ("Impact", "impact")):
+                    yield {"event_id": event_id, "event_attribute_name": name, "event_attribute_value": event[key]}
+            elif table == "event_x_object":
+                for object_id, relation in zip(object_ids, relations):
+                    yield {"event_id": event_id, "object_id": object_id, "qualifier_type": relation, "qualifier_index": 0}
+            elif table in ("object", "object_attribute_value"):
+                for (object_type, _, attributes), object_id in zip(objects, object_ids):
+                    if object_id in seen:
+                        continue
+                    seen.add(object_id)
+                    if table == "object":
+                        yield {"object_id": object_id, "object_type": object_type, "object_existency": True}
+                        continue
+                    for name, key in attributes:
+                        value_number += 1
+                        yield {"object_attribute_value_id": f"object_attribute_value_id{value_number}", "object_id": object_id,
+                               "object_attribute_name": name, "object_attribute_value": event[key], "object_attribute_value_existency": True}
+                if not incident_id in seen:
+                    seen.add(incident_id)
+                    if table == "object":
+                        yield {"object_id": incident_id, "object_type": "Incident", "object_existency": False}
+                    else:
+                        value_number += 1
+                        yield {"object_attribute_value_id": f"object_attribute_value_id{value_number}", "object_id": incident_id,
+                               "object_attribute_name": "Incident_number", "object_attribute_value": trace_id, "object_attribute_value_existency": True}
+            elif table == "object_relation":
+                relation = (object_ids[2], object_ids[1])
+                if not relation in seen:
+                    seen.add(relation)
+                    relation_number += 1
+                    yield {"object_relation_id": f"object_relation_id{relation_number}", "from_object_id": object_ids[2],
+                           "to_object_id": object_ids[1], "object_relation_type": "WORKS_FOR", "object_relation_existency": True}
+
+
+def write_oced_json(oced_file_path, traces, events_per_trace, cardinality, seed):
+    # One pass over the synthetic traces for every table, in the layout of OCED_data.json
+    tables = (
+        "event", "event_type", "event_time", "event_attribute_name", "event_attribute_value",
+        "object", "object_type", "object_attribute_name", "object_attribute_value",
+        "object_relation", "object_relation_type", "event_x_object",
+    )
+    with open(oced_file_path, 'w', encoding="utf-8") as json_file:
+        json_file.write("{")
+        for table_index, table in enumerate(tables):
+            json_file.write(("," if table_index > 0 else "") + f"\n    {json.dumps(table)}: [")
+            for record_index, record in enumerate(_oced_records(table, traces, events_per_trace, cardinality, seed)):
+                json_file.write(("," if record_index > 0 else "") + "\n        " + json.dumps(record))
+            json_file.write("\n    ]")
+        json_file.write("\n}\n")
+
+
+def generate_logs(directory, traces, events_per_trace, cardinality, seed=0):
+    # Write <directory>/synthetic.xes and <directory>/synthetic_OCED.json, unless they are already there
+    os.makedirs(directory, exist_ok=True)
+    xes_file_path = os.path.join(directory, "synthetic.xes")
+    oced_file_path = os.path.join(directory, "synthetic_OCED.json")
+    if not os.path.exists(xes_file_path):
+        write_xes(xes_file_path + ".tmp", traces, events_per_trace, cardinality, seed)
+        os.replace(xes_file_path + ".tmp", xes_file_path)
+    if not os.path.exists(oced_file_path):
+        write_oced_json(oced_file_path + ".tmp", traces, events_per_trace, cardinality, seed)
+        os.replace(oced_file_path + ".tmp", oced_file_path)
+    return xes_file_path, oced_file_path
+
+
+if __name__ == "__main__":
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    directory = sys.argv[2] if len(sys.argv) > 2 else "generated_documents/benchmark"
+    events_per_trace = int(sys.argv[3]) if len(sys.argv) > 3 else SAMPLE_EVENTS_PER_TRACE
+    cardinality = float(sys.argv[4]) if len(sys.argv) > 4 else 1.0
+
+    parameters = log_parameters(scale, events_per_trace, cardinality)
+    for path in generate_logs(directory, **parameters):
+        print(f"Synthetic log saved to {path}")
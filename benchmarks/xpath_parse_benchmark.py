@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import tempfile
+import xml.etree.ElementTree as ET
+
+# Run from the main directory: python benchmarks/xpath_parse_benchmark.py [xes file] [descriptors file]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source.xpath_solution import convert_xes_to_rdf_xpath_position
+
+ANNOTATED_XML_PATH = "generated_documents/modified_xes_file_for_xpath.xml"
+
+parse_calls = {"parse": 0, "iterparse": 0}
+original_parse = ET.parse
+original_iterparse = ET.iterparse
+
+def counting_parse(*args, **kwargs):
+    parse_calls["parse"] += 1
+    return original_parse(*args, **kwargs)
+
+def counting_iterparse(*args, **kwargs):
+    parse_calls["iterparse"] += 1
+    return original_iterparse(*args, **kwargs)
+
+ET.parse = counting_parse
+ET.iterparse = counting_iterparse
+
+
+def run(xes_file_path, descriptors_file_path, **options):
+    parse_calls["parse"] = 0
+    parse_calls["iterparse"] = 0
+    if os.path.exists(ANNOTATED_XML_PATH):
+        os.remove(ANNOTATED_XML_PATH)
+
+    start = time.perf_counter()
+    convert_xes_to_rdf_xpath_position(xes_file_path, descriptors_file_path, **options)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "options": options,
+        "seconds": round(elapsed, 3),
+        "parses": parse_calls["parse"] + parse_calls["iterparse"],
+        "annotated_xml_written": os.path.exists(ANNOTATED_XML_PATH),
+    }
+
+
+if __name__ == "__main__":
+    xes_file_path = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else "data.xes")
+    descriptors_file_path = os.path.abspath(sys.argv[2] if len(sys.argv) > 2 else "descriptors.json")
+
+    # The outputs, the annotated XES file and the XES cache are written in
+    # generated_documents of a temporary working directory, not in the repository
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs("generated_documents")
+        results = [
+            run(xes_file_path, descriptors_file_path),
+            run(xes_file_path, descriptors_file_path, streaming=True),
+            run(xes_file_path, descriptors_file_path, annotated_xml_path=ANNOTATED_XML_PATH),
+        ]
+    for result in results:
+        print(result)
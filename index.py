@@ -1,7 +1,9 @@
-from source.manual_solution import convert_xes_to_rdf_manual_position
-from source.xpath_solution import convert_xes_to_rdf_xpath_position
-from source.read_from_OCED import convert_OCED_to_rdf
+import sys
+from source.result_cache import cached_conversion
 
-convert_xes_to_rdf_manual_position("data.xes", "descriptors.json")
-convert_xes_to_rdf_xpath_position("data.xes", "descriptors.json")
-convert_OCED_to_rdf("OCED_data.json", "descriptors.json")
\ No newline at end of file
+# python index.py --force converts again even when the inputs did not change
+force = "--force" in sys.argv
+
+cached_conversion("manual", "data.xes", "descriptors.json", force=force)
+cached_conversion("xpath", "data.xes", "descriptors.json", force=force)
+cached_conversion("oced", "OCED_data.json", "descriptors.json", force=force)
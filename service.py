@@ -0,0 +1,14 @@
+import sys
+from source.service import serve, DEFAULT_PORT
+
+# python service.py [descriptors file] [port or path of a Unix socket]
+# keeps the converters and their caches warm and converts the XES and OCED
+# payloads sent to it (see source/service.py)
+descriptors_file_path = sys.argv[1] if len(sys.argv) > 1 else "descriptors.json"
+address = sys.argv[2] if len(sys.argv) > 2 else str(DEFAULT_PORT)
+
+if __name__ == "__main__":
+    if address.isdigit():
+        serve(descriptors_file_path, port=int(address))
+    else:
+        serve(descriptors_file_path, unix_socket=address)
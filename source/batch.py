@@ -0,0 +1,335 @@
+import os
+import io
+import json
+import time
+import importlib
+import traceback
+import multiprocessing
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from source.result_cache import CONVERTERS
+from source.descriptor_plan import compile_descriptors
+from source.instrumentation import Instrumentation
+from source.sinks import GraphSink, StreamingSink
+
+'''
+Batch conversion of many logs on a pool of long-lived worker processes.
+
+A job converts one log with one descriptors file and one converter ("manual",
+"xpath" or "oced"). The jobs come from a manifest, a JSON file with a list of
+jobs where only input is required:
+
+    [
+        {"input": "logs/a.xes", "descriptors": "logs/descriptors.json", "converter": "manual"},
+        {"input": "logs/a_OCED.json", "format": "turtle", "options": {"streaming": true}}
+    ]
+
+or from a directory (jobs_from_directory): every .xes (.xes.gz) file in it or
+below it is a job of each of the XES converters, every .jsonl file and .json
+file with OCED in its name a job of the OCED converter. The descriptors of a
+log are <log>.descriptors.json when there is one, otherwise the closest
+descriptors.json in its directory or the ones above it. Without converter, a
+manifest job uses the converter of its extension and without descriptors the
+descriptors of the directory mode.
+
+Every job writes into a directory of its own, output_dir/<id> by default: the
+RDF/XML and Turtle files of the converter ("graph", the default format) or a
+single N-Triples ("nt") or Turtle ("turtle") file, and conversion.log with what
+the converter printed. options are given to the converter as they are
+(streaming, provenance, selection...).
+
+The workers are started once for the whole batch. They import rdflib, the
+converters and pm4py when they start and keep between jobs the compiled
+descriptors, the URI and timestamp caches and the parsed XES cache, so a job
+only pays for its own log. The workers share the XES cache directory, its
+entries are published atomically (see source/xes_cache.py). The workers of a
+pool cannot start processes of their own, so when the batch runs on more than
+one worker the jobs cannot have a workers option above 1. The biggest logs are
+started first. run_batch prints a line per finished job, appends its summary
+(status, triples, seconds, triples per second, the error of a failed job) to
+output_dir/summary.jsonl and returns the summaries. A failed job does not stop
+the others.
+
+    python batch.py logs/ 4 generated_documents/batch
+'''
+
+# The converter of a log, by its extension
+_EXTENSION_CONVERTERS = ((".xes", "xpath"), (".xes.gz", "xpath"), (".jsonl", "oced"), (".json", "oced"))
+
+FORMATS = ("graph", "nt", "turtle")
+
+_JOB_KEYS = ("id", "input", "descriptors", "converter", "output_dir", "format", "options")
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    id: str
+    input: str
+    descriptors: str
+    converter: str
+    output_dir: str
+    format: str = "graph"
+    options: dict = field(default_factory=dict)
+
+
+def _default_converter(input_path):
+    for extension, converter in _EXTENSION_CONVERTERS:
+        if input_path.endswith(extension):
+            return converter
+    return None
+
+
+def _is_log(name):
+    if name.endswith(".xes") or name.endswith(".xes.gz") or name.endswith(".jsonl"):
+        return True
+    return name.endswith(".json") and "oced" in name.lower() and not name.endswith("descriptors.json")
+
+
+def find_descriptors(input_path, root=None):
+    # <log>.descriptors.json, or the closest descriptors.json from the directory
+    # of the log up to root (up to the file system root without it)
+    own = f"{input_path}.descriptors.json"
+    if os.path.exists(own):
+        return own
+    directory = os.path.dirname(os.path.abspath(input_path))
+    root = os.path.abspath(root) if root is not None else None
+    while True:
+        candidate = os.path.join(directory, "descriptors.json")
+        if os.path.exists(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if directory == root or parent == directory:
+            return None
+        directory = parent
+
+
+def _unique_id(name, used):
+    job_id = name
+    n = 2
+    while job_id in used:
+        job_id = f"{name}-{n}"
+        n += 1
+    used.add(job_id)
+    return job_id
+
+
+def _pool_errors(jobs):
+    # The errors of the jobs that would start their own worker processes inside
+    # a worker of the pool, which are daemonic processes
+    errors = []
+    for job in jobs:
+        workers = job.options.get("workers")
+        if workers is not None and (not isinstance(workers, int) or workers > 1):
+            errors.append(f"Job {job.id} has workers={workers!r} in its options, its converter cannot start processes in a worker of the batch: leave workers out or run the batch with workers=1!")
+    return errors
+
+
+def jobs_from_directory(directory, output_dir="generated_documents/batch", xes_converters=("xpath",), format="graph", options=None, pooled=False):
+    # Returns (jobs, errors) for the logs in directory and below it. pooled tells
+    # that the jobs run on a pool of workers (see _pool_errors)
+    jobs = []
+    errors = []
+    used = set()
+    output_root = os.path.abspath(output_dir)
+    for current, directories, files in os.walk(directory):
+        # The outputs of a previous batch and the caches are not logs
+        directories[:] = sorted(name for name in directories if not name.startswith(".") and os.path.abspath(os.path.join(current, name)) != output_root)
+        for name in sorted(files):
+            if not _is_log(name):
+                continue
+            input_path = os.path.join(current, name)
+            descriptors = find_descriptors(input_path, directory)
+            if descriptors is None:
+                errors.append(f"There is no descriptors file for {input_path}, add {name}.descriptors.json or descriptors.json next to it!")
+                continue
+            converter = _default_converter(name)
+            converters = xes_converters if converter != "oced" else ("oced",)
+            stem = os.path.relpath(input_path, directory).replace(os.sep, "_")
+            for converter in converters:
+                job_id = _unique_id(f"{stem}-{converter}", used)
+                jobs.append(BatchJob(job_id, input_path, descriptors, converter, os.path.join(output_dir, job_id), format, dict(options or {})))
+    if len(jobs) == 0 and len(errors) == 0:
+        errors.append(f"There are no logs in {directory}!")
+    if pooled:
+        # The jobs share the options, the first one tells for all
+        errors += _pool_errors(jobs[:1])
+    return jobs, errors
+
+
+def load_manifest(manifest_path, output_dir="generated_documents/batch", pooled=False):
+    # Returns (jobs, errors) for the jobs of a manifest file, the relative paths
+    # in it are relative to the directory of the manifest. pooled tells that the
+    # jobs run on a pool of workers (see _pool_errors)
+    with open(manifest_path, 'r') as json_file:
+        entries = json.load(json_file)
+    base = os.path.dirname(manifest_path)
+
+    jobs = []
+    errors = []
+    used = set()
+    if not isinstance(entries, list):
+        return [], ["The manifest should be an array of jobs!"]
+    for n, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not isinstance(entry.get("input"), str):
+            errors.append(f"Job {n} of the manifest should be an object with an input!")
+            continue
+        for key in entry:
+            if not key in _JOB_KEYS:
+                errors.append(f"{key} of job {n} is not part of a job, it can have {', '.join(_JOB_KEYS)}!")
+        input_path = os.path.join(base, entry["input"])
+        converter = entry.get("converter", _default_converter(input_path))
+        if not converter in CONVERTERS:
+            errors.append(f"The converter of job {n} should be one of {', '.join(CONVERTERS)}, not {converter!r}!")
+        descriptors = os.path.join(base, entry["descriptors"]) if "descriptors" in entry else find_descriptors(input_path)
+        if descriptors is None:
+            errors.append(f"Job {n} has no descriptors and there is no descriptors file for {input_path}!")
+        format = entry.get("format", "graph")
+        if not format in FORMATS:
+            errors.append(f"The format of job {n} should be one of {', '.join(FORMATS)}, not {format!r}!")
+        options = entry.get("options", {})
+        if not isinstance(options, dict) or "sink" in options or "store" in options:
+            errors.append(f"The options of job {n} should be an object of converter options, without sink or store!")
+        job_id = _unique_id(entry.get("id", f"{os.path.basename(input_path)}-{converter}"), used)
+        job_output_dir = os.path.join(base, entry["output_dir"]) if "output_dir" in entry else os.path.join(output_dir, job_id)
+        jobs.append(BatchJob(job_id, input_path, descriptors, converter, job_output_dir, format, options))
+
+    if pooled:
+        errors += _pool_errors(job for job in jobs if isinstance(job.options, dict))
+    if len(errors) > 0:
+        return [], errors
+    return jobs, []
+
+
+def load_jobs(jobs, output_dir="generated_documents/batch", pooled=False, **directory_options):
+    # Returns (jobs, errors) for a manifest file, a directory of logs or a list of BatchJob
+    if isinstance(jobs, (list, tuple)):
+        return list(jobs), _pool_errors(jobs) if pooled else []
+    if os.path.isdir(jobs):
+        return jobs_from_directory(jobs, output_dir, pooled=pooled, **directory_options)
+    return load_manifest(jobs, output_dir, pooled)
+
+
+# Set in every worker process: the compiled plans by descriptors file, with the
+# size and modification time of the file they were compiled from
+_plans = {}
+
+
+def _start_worker(warm_modules):
+    # Import everything the jobs need once, what the imports print is dropped
+    with redirect_stdout(io.StringIO()):
+        for module_name, _ in CONVERTERS.values():
+            importlib.import_module(module_name)
+        for module_name in warm_modules:
+            try:
+                importlib.import_module(module_name)
+            except ImportError:
+                pass
+
+
+def _compiled_plan(descriptors, converter):
+    event_log = converter != "oced"
+    stat = os.stat(descriptors)
+    key = (os.path.abspath(descriptors), event_log)
+    known = _plans.get(key)
+    if known is not None and known[0] == (stat.st_size, stat.st_mtime_ns):
+        return known[1], []
+    plan, errors = compile_descriptors(descriptors, event_log=event_log)
+    if len(errors) == 0:
+        _plans[key] = ((stat.st_size, stat.st_mtime_ns), plan)
+    return plan, errors
+
+
+def _job_sink(job, module, plan):
+    # The sink of a job, its files are in the output directory of the job
+    if job.format == "graph":
+        rdf_path, owl_path = module.output_paths(plan.file_name)
+        return GraphSink(os.path.join(job.output_dir, os.path.basename(rdf_path)), os.path.join(job.output_dir, os.path.basename(owl_path)))
+    extension = "nt" if job.format == "nt" else "ttl"
+    return StreamingSink(os.path.join(job.output_dir, f"{plan.file_name}.{extension}"), job.format)
+
+
+def run_job(job):
+    # Convert one job in this process and return its summary
+    summary = {
+        "id": job.id, "converter": job.converter, "input": job.input, "output_dir": job.output_dir,
+        "status": "failed", "triples": 0, "seconds": 0.0, "triples_per_second": 0,
+        "input_bytes": os.path.getsize(job.input) if os.path.exists(job.input) else 0,
+        "error": None, "worker": os.getpid(),
+    }
+    os.makedirs(job.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    sink = None
+    with open(os.path.join(job.output_dir, "conversion.log"), "w", encoding="utf-8") as log, redirect_stdout(log):
+        try:
+            module_name, function_name = CONVERTERS[job.converter]
+            module = importlib.import_module(module_name)
+            plan, errors = _compiled_plan(job.descriptors, job.converter)
+            if len(errors) > 0:
+                print(errors)
+                summary["error"] = "; ".join(errors)
+            else:
+                sink = _job_sink(job, module, plan)
+                report = getattr(module, function_name)(job.input, plan, sink=sink, instrumentation=Instrumentation(), **job.options)
+                if report is None:
+                    # The converter printed its errors and stopped
+                    summary["error"] = f"The conversion stopped, see {log.name}"
+                else:
+                    summary["status"] = "ok"
+                    summary["triples"] = len(sink)
+        except Exception as error:
+            traceback.print_exc(file=log)
+            summary["error"] = f"{type(error).__name__}: {error}"
+            if isinstance(sink, StreamingSink) and sink.owns_file:
+                sink.file.close()
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    if summary["seconds"] > 0:
+        summary["triples_per_second"] = round(summary["triples"] / summary["seconds"])
+    return summary
+
+
+def run_batch(jobs, workers=None, output_dir="generated_documents/batch", warm_modules=("pm4py",), **directory_options):
+    # Run the jobs (a manifest file, a directory of logs or a list of BatchJob)
+    # on workers processes, os.cpu_count() by default, and return their summaries
+    if workers is None:
+        workers = os.cpu_count() or 1
+    jobs, errors = load_jobs(jobs, output_dir, pooled=workers > 1, **directory_options)
+    if len(errors) > 0:
+        print(errors)
+        return
+    workers = max(1, min(workers, len(jobs)))
+
+    # The biggest logs first, so that a long job does not start last
+    jobs = sorted(jobs, key=lambda job: -os.path.getsize(job.input) if os.path.exists(job.input) else 0)
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, "summary.jsonl")
+
+    start = time.perf_counter()
+    summaries = []
+    with open(summary_path, "a", encoding="utf-8") as summary_file:
+        if workers == 1:
+            _start_worker(warm_modules)
+            results = map(run_job, jobs)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(workers, initializer=_start_worker, initargs=(warm_modules,))
+            results = pool.imap_unordered(run_job, jobs, chunksize=1)
+        try:
+            for summary in results:
+                summaries.append(summary)
+                summary_file.write(json.dumps(summary) + "\n")
+                summary_file.flush()
+                detail = f"{summary['triples']} triples, {summary['triples_per_second']} triples/s" if summary["status"] == "ok" else summary["error"]
+                print(f"[{len(summaries)}/{len(jobs)}] {summary['status']} {summary['id']} in {summary['seconds']}s: {detail}")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    elapsed = time.perf_counter() - start
+    failed = [summary for summary in summaries if summary["status"] != "ok"]
+    triples = sum(summary["triples"] for summary in summaries)
+    print(f"{len(summaries) - len(failed)} of {len(summaries)} jobs converted on {workers} workers in {round(elapsed, 3)}s, {triples} triples, {round(triples / elapsed) if elapsed > 0 else 0} triples/s")
+    for summary in failed:
+        print(f"Failed {summary['id']} ({summary['input']}): {summary['error']}")
+    print(f"Summary saved to {summary_path}")
+    return summaries
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+from rdflib import RDF, URIRef
+from source.sinks import add_columns
+from source.provenance import range_position
+
+'''
+Columnar version of the row loop of convert_xes_to_rdf_manual_position.
+Instead of building every URI string row by row, the URI columns of the whole
+event table are built at once. The columns of the table are integer codes (see
+source/event_table.py): text conversions (splitting, quoting, isoformat) and
+the URIRefs are made once per distinct code of a column, or combination of
+codes of several columns. A URI column is kept as (codes, values), the code of
+every row and the URI of every code, and every kind of triple is deduplicated
+on the codes before it is handed to the sink.
+
+The triples go to the sink a column at a time with add_columns (see
+source/sinks.py). The triples of the events (their type, event type,
+timestamp, attribute values, positions and relations) are distinct by
+construction, one per row, and are marked unique so that the sink writes them
+without looking for duplicates; the few triples of the distinct values,
+objects and relations are checked by the sink. The URIRefs come from the
+shared URI cache, the texts of the events and positions are only turned into
+URIRefs for a sink that takes the triples one by one.
+The has_position triples follow plan.provenance (see source/provenance.py).
+'''
+
+def _underscored(value):
+    return "_".join(str(value).split(" "))
+
+
+def combined_codes(table, keys):
+    # (codes, texts): one code per row for its combination of values of the keys
+    # of the table, and the text of every code, "_".join of the underscored values
+    columns = [table.distinct(key) for key in keys if key in table]
+    if len(columns) == 0:
+        return np.zeros(len(table), dtype=np.int64), [""]
+    if len(columns) == 1:
+        codes, values = columns[0]
+        return codes, [_underscored(value) for value in values]
+    combinations, codes = np.unique(np.stack([codes for codes, _ in columns], axis=1), axis=0, return_inverse=True)
+    texts = ["_".join(_underscored(values[code]) for code, (_, values) in zip(combination, columns)) for combination in combinations.tolist()]
+    return codes.reshape(-1), texts
+
+
+def joined_column(table, keys):
+    # Same as "_".join(["_".join(str(row[key]).split(" ")) for key in keys if key in row]) for every row
+    codes, texts = combined_codes(table, keys)
+    return np.array(texts, dtype=object)[codes]
+
+
+def trace_positions(trace_values):
+    # A new trace starts on the first row of every trace value and the event
+    # counter restarts there, exactly as in the row loop
+    is_new_trace = ~pd.Series(trace_values).duplicated().to_numpy()
+    trace_ids = np.cumsum(is_new_trace)
+    event_ids = pd.Series(trace_ids).groupby(trace_ids).cumcount().to_numpy() + 1
+    return trace_ids, event_ids
+
+
+def _constant(value, length):
+    return np.full(length, value, dtype=object)
+
+
+def _row_pairs(columns):
+    # (rows, values): the distinct (row, value) pairs of columns of values of the
+    # rows, a single column has one value per row
+    if len(columns) == 1:
+        return np.arange(len(columns[0])), columns[0]
+    if len(columns) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=object)
+    rows = np.tile(np.arange(len(columns[0]), dtype=np.int64), len(columns))
+    values = np.concatenate(columns)
+    codes, uniques = pd.factorize(values)
+    _, first = np.unique(rows * len(uniques) + codes, return_index=True)
+    return rows[first], values[first]
+
+
+def _position_ranges(subjects, trace_ids, event_ids, prefix, suffix):
+    # (subjects, positions) of the positions of the subjects as ranges: the
+    # rows of a run have the same subject and trace and follow each other in the trace
+    subject_codes = pd.factorize(subjects)[0]
+    order = np.lexsort((event_ids, trace_ids, subject_codes))
+    subject_codes = subject_codes[order]
+    trace_ids = trace_ids[order]
+    event_ids = event_ids[order]
+    starts_run = np.ones(len(order), dtype=bool)
+    starts_run[1:] = (subject_codes[1:] != subject_codes[:-1]) | (trace_ids[1:] != trace_ids[:-1]) | (event_ids[1:] != event_ids[:-1] + 1)
+    firsts = np.flatnonzero(starts_run)
+    lasts = np.append(firsts[1:], len(order)) - 1
+    positions = [
+        range_position(f"{prefix}Trace:{trace_ids[first]}/Event:", event_ids[first], event_ids[last], suffix)
+        for first, last in zip(firsts.tolist(), lasts.tolist())
+    ]
+    return subjects[order[firsts]], np.array(positions, dtype=object)
+
+
+def add_columnar_triples(g, table, plan, traceKey, attributes_positions, uri_cache, trace_events=None):
+    # table is an EventTable (see source/event_table.py). trace_events can give
+    # the trace and event ids of the rows, as computed by trace_positions, when
+    # the table is only a part of the log.
+    ont_ns = plan.ont_ns
+    v = plan.vocabulary
+
+    if len(table) == 0:
+        return
+    rows_count = len(table)
+
+    def row_uris(texts):
+        # A column of texts of URIs, as URIRefs for a sink without add_columns
+        if hasattr(g, "add_columns"):
+            return texts
+        return np.array([URIRef(text) for text in texts], dtype=object)
+
+    def uri_column(codes, texts, build):
+        return codes, np.array([build(text) for text in texts], dtype=object)
+
+    def value_column(column):
+        codes, values = table.distinct(column)
+        return uri_column(codes, values, lambda value: uri_cache.quoted(ont_ns, value))
+
+    # Every code of a column is used by a row
+    def add_types(column, class_uri):
+        values = column[1]
+        add_columns(g, values, RDF.type, _constant(class_uri, len(values)))
+
+    def add_names(column, name_uri):
+        values = column[1]
+        add_columns(g, values, v.has_attribute_name, _constant(name_uri, len(values)))
+
+    def add_distinct_pairs(subjects, predicate, objects):
+        pairs = np.unique(np.stack([subjects[0], objects[0]], axis=1), axis=0)
+        add_columns(g, subjects[1][pairs[:, 0]], predicate, objects[1][pairs[:, 1]])
+
+    # Trace and event positions
+    provenance = plan.provenance
+    if provenance != "none":
+        if trace_events is None:
+            trace_events = trace_positions(joined_column(table, traceKey))
+        trace_ids, event_ids = (np.asarray(ids) for ids in trace_events)
+        positions = ont_ns + "Trace:" + pd.Series(trace_ids).astype(str) + "/Event:" + pd.Series(event_ids).astype(str)
+        positions = positions.to_numpy(dtype=object)
+
+    # The positions of every attribute column once, the same selector can be
+    # an attribute of the events and of an object
+    emitted_positions = set()
+
+    def add_attribute_positions(column, selector):
+        if provenance in ("event", "none") or selector in emitted_positions:
+            return
+        emitted_positions.add(selector)
+        suffix = f"/Attribute:{attributes_positions[selector]}"
+        subjects = column[1][column[0]]
+        if provenance == "full":
+            add_columns(g, subjects, v.has_position, row_uris(positions + suffix), unique=True)
+        else:
+            subjects, ranges = _position_ranges(subjects, trace_ids, event_ids, ont_ns, suffix)
+            add_columns(g, subjects, v.has_position, row_uris(ranges), unique=True)
+
+    # Events
+    events = row_uris((ont_ns + "EventID_" + pd.Series(table.index + 1).astype(str)).to_numpy(dtype=object))
+    add_columns(g, events, RDF.type, _constant(v.events, rows_count), unique=True)
+
+    event_types = uri_column(*combined_codes(table, plan.event_type_selector), lambda text: uri_cache.uri(ont_ns, text))
+    add_types(event_types, v.event_type)
+    add_columns(g, events, v.has_event_type, event_types[1][event_types[0]], unique=True)
+
+    codes, timestamps = table.distinct(plan.event_timestamp)
+    event_timestamps = uri_column(codes, timestamps, lambda timestamp: uri_cache.uri(ont_ns, timestamp.isoformat()))
+    add_types(event_timestamps, v.event_timestamp)
+    add_columns(g, events, v.has_timestamp, event_timestamps[1][event_timestamps[0]], unique=True)
+
+    if provenance != "none":
+        add_columns(g, events, v.has_position, row_uris(positions), unique=True)
+
+    # Two attributes can have the same value for an event, the pairs are deduplicated over all of them
+    event_values = []
+    for attribute in plan.event_attributes:
+        attribute_values = value_column(attribute.selector)
+        add_types(attribute_values, v.event_attribute_value)
+        add_names(attribute_values, attribute.name_uri)
+        event_values.append(attribute_values[1][attribute_values[0]])
+        add_attribute_positions(attribute_values, attribute.selector)
+    rows, values = _row_pairs(event_values)
+    add_columns(g, events[rows], v.has_attribute_value, values, unique=True)
+
+    # Objects, the columns and ids are kept by the place of the object in plan.objects
+    object_columns = []
+    for obj in plan.objects:
+        codes, texts = combined_codes(table, obj.identifier_selector)
+        ids = ["OBJ_" + text for text in texts]
+        object_instances = uri_column(codes, ids, lambda text: uri_cache.uri(ont_ns, text))
+        add_types(object_instances, v.objects)
+
+        g.add((obj.type_uri, RDF.type, v.object_type))
+        add_columns(g, object_instances[1], v.has_object_type, _constant(obj.type_uri, len(ids)))
+
+        object_columns.append((object_instances, ids))
+
+        for attribute in obj.attributes:
+            attribute_values = value_column(attribute.selector)
+            add_types(attribute_values, v.object_attribute_value)
+            add_names(attribute_values, attribute.name_uri)
+            add_distinct_pairs(object_instances, v.has_attribute_value, attribute_values)
+            add_attribute_positions(attribute_values, attribute.selector)
+
+    for relation in plan.object_relations:
+        # One URI per distinct pair of objects
+        (codes_a, values_a), ids_a = object_columns[relation.object_index]
+        (codes_b, values_b), ids_b = object_columns[relation.related_index]
+        pairs = np.unique(np.stack([codes_a, codes_b], axis=1), axis=0)
+        relation_instances = np.array([uri_cache.uri(ont_ns, f"{ids_a[a]}_{ids_b[b]}") for a, b in pairs.tolist()], dtype=object)
+        add_columns(g, relation_instances, RDF.type, _constant(relation.relation_type_uri, len(pairs)))
+        add_columns(g, relation_instances, v.involves_object, values_a[pairs[:, 0]])
+        add_columns(g, relation_instances, v.involves_object, values_b[pairs[:, 1]])
+
+    # Event relations, the relations with the same predicate are deduplicated together
+    related = {}
+    for relation in plan.event_relations:
+        (codes, values), _ = object_columns[relation.related_index]
+        related.setdefault(relation.predicate, []).append(values[codes])
+    for predicate, columns in related.items():
+        rows, values = _row_pairs(columns)
+        add_columns(g, events[rows], predicate, values, unique=True)
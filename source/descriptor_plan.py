@@ -0,0 +1,273 @@
+import json
+from dataclasses import dataclass
+from rdflib import RDF, RDFS, OWL, URIRef
+
+'''
+The descriptor file is validated once and compiled into an immutable plan.
+The plan holds every constant the converters need while they go through the
+events: the URIs of the classes and properties, the selectors of the event
+type, timestamp, attributes and object identifiers as tuples, the object type
+specs and the relations to emit. The per-event loops only read attributes of
+the plan, they never look into the descriptor dicts or build constant URIs.
+'''
+
+@dataclass(frozen=True, slots=True)
+class Vocabulary:
+    events: URIRef
+    event_type: URIRef
+    event_timestamp: URIRef
+    event_attribute_name: URIRef
+    event_attribute_value: URIRef
+    objects: URIRef
+    object_type: URIRef
+    object_attribute_name: URIRef
+    object_attribute_value: URIRef
+    object_relation_type: URIRef
+    involves_object: URIRef
+    has_attribute_name: URIRef
+    has_attribute_value: URIRef
+    has_event_type: URIRef
+    has_timestamp: URIRef
+    has_object_type: URIRef
+    has_position: URIRef
+
+
+@dataclass(frozen=True, slots=True)
+class AttributeSpec:
+    selector: str
+    name: str
+    name_uri: URIRef
+
+
+@dataclass(frozen=True, slots=True)
+class ObjectSpec:
+    object_type: str
+    type_uri: URIRef
+    identifier_selector: tuple
+    attributes: tuple
+    is_trace: bool
+
+
+@dataclass(frozen=True, slots=True)
+class EventRelationSpec:
+    # event --predicate--> object of type related_to, related_index is its place in plan.objects
+    predicate: URIRef
+    related_to: str
+    related_index: int
+
+
+@dataclass(frozen=True, slots=True)
+class ObjectRelationSpec:
+    # A relation instance <object_type id>_<related_to id> of class relation_type_uri
+    # that involves both objects, the indexes are their places in plan.objects
+    object_type: str
+    related_to: str
+    relation_type_uri: URIRef
+    object_index: int
+    related_index: int
+
+
+@dataclass(frozen=True, slots=True)
+class DescriptorPlan:
+    file_name: str
+    IRI: str
+    ont_ns: str
+    vocabulary: Vocabulary
+    # Class and property declarations written before any instance
+    schema_triples: tuple
+    event_type_selector: tuple
+    event_timestamp: str
+    event_attributes: tuple
+    event_relations: tuple
+    objects: tuple
+    trace_object: object
+    object_relations: tuple
+    # The has_position triples to write (see source/provenance.py)
+    provenance: str = "full"
+
+
+def load_descriptors(descriptors_file_path):
+    # Load descriptors file
+    with open(descriptors_file_path, 'r') as json_file:
+        # Read the JSON data from the file
+        return json.load(json_file)
+
+
+def validate_descriptors(descriptors):
+    # Validate JSON file so that it has the proper information
+    errors = []
+
+    if not "referred_information_from_event_log" in descriptors:
+        errors.append("You need to have referred_information_from_event_log in the descriptor file!")
+
+    if not "injected_information_to_OCED_model" in descriptors:
+        errors.append("You need to have injected_information_to_OCED_model in the descriptor file!")
+
+    if len(errors) > 0:
+        return errors
+
+    referred = descriptors["referred_information_from_event_log"]
+
+    if not "events" in referred:
+        errors.append("You need to have event data in the descriptor file!")
+
+    if not "objects" in referred:
+        errors.append("You need to have objects data in the descriptor file!")
+
+    if "events" in referred:
+        if not isinstance(referred["events"], dict):
+            errors.append("events should be an object!")
+        else:
+            if not "event_type_selector" in referred["events"]:
+                errors.append("You need to have event_type_selector in the descriptor file, they represent the value of Event Type!")
+            if not "event_timestamp" in referred["events"]:
+                errors.append("You need to have event_timestamp in the descriptor file, it represents the Event Timestamp!")
+            for attr in referred["events"].get("attributes", []):
+                if not "event_attribute_value_selector" in attr or not "event_attribute_name" in attr:
+                    errors.append("You need to have event_attribute_value_selector and event_attribute_name for each attribute in the descriptor file!")
+                    break
+            for relation in referred["events"].get("relations_to_objects", []):
+                if not "event_relation_type" in relation or not "event_related_to" in relation:
+                    errors.append("You need to have event_relation_type and event_related_to for each relation in the descriptor file!")
+                    break
+
+    if "objects" in referred:
+        if not isinstance(referred["objects"], list):
+            errors.append("objects should be array!")
+        else:
+            for obj in referred["objects"]:
+                if not "object_type" in obj:
+                    errors.append("You need to have object_type data in the descriptor file for each object!")
+                if not "object_identifier_selector" in obj:
+                    errors.append("You need to have object_identifier_selector in the descriptor file for each object!")
+                for attr in obj.get("attributes", []):
+                    if not "object_attribute_value_selector" in attr or not "object_attribute_name" in attr:
+                        errors.append("You need to have object_attribute_value_selector and object_attribute_name for each attribute in the descriptor file!")
+                        break
+                if "relations" in obj:
+                    for relation in obj["relations"]:
+                        if not "object_relation_type" in relation or not "object_related_to" in relation:
+                            errors.append("You need to have object_relation_type and object_related_to for each relation in the descriptor file!")
+                            break
+
+    return errors
+
+
+def _vocabulary(ont_ns):
+    return Vocabulary(*(URIRef(ont_ns + name) for name in (
+        "events", "event_type", "event_timestamp", "event_attribute_name", "event_attribute_value",
+        "objects", "object_type", "object_attribute_name", "object_attribute_value", "object_relation_type",
+        "relation_involves_object", "has_attribute_name", "has_attribute_value", "has_event_type",
+        "has_timestamp", "has_object_type", "has_position",
+    )))
+
+
+def base_triples(vocabulary):
+    # The classes and properties every converter declares
+    triples = []
+    for class_uri in (vocabulary.events, vocabulary.event_type, vocabulary.event_timestamp,
+                      vocabulary.event_attribute_name, vocabulary.event_attribute_value, vocabulary.objects,
+                      vocabulary.object_type, vocabulary.object_attribute_name, vocabulary.object_attribute_value,
+                      vocabulary.object_relation_type):
+        triples.append((class_uri, RDF.type, OWL.Class))
+    for property_uri in (vocabulary.involves_object, vocabulary.has_attribute_name, vocabulary.has_attribute_value,
+                         vocabulary.has_event_type, vocabulary.has_timestamp, vocabulary.has_object_type):
+        triples.append((property_uri, RDF.type, OWL.ObjectProperty))
+    triples.append((vocabulary.has_position, RDF.type, OWL.DatatypeProperty))
+    return triples
+
+
+def compile_descriptors(descriptors, event_log=True):
+    # Returns (plan, errors). plan is None when errors is not empty.
+    # With event_log=False only the general information is needed (OCED conversion),
+    # the parts describing the event log are compiled when they are present.
+    # descriptors can be a path, the loaded dict or a plan compiled before.
+    if isinstance(descriptors, DescriptorPlan):
+        if event_log and descriptors.event_timestamp == "":
+            return None, ["You need to have referred_information_from_event_log in the descriptor file!"]
+        return descriptors, []
+    if isinstance(descriptors, (str, bytes)) or hasattr(descriptors, "__fspath__"):
+        descriptors = load_descriptors(descriptors)
+
+    errors = []
+    has_event_log = "referred_information_from_event_log" in descriptors
+    if event_log or has_event_log:
+        errors = validate_descriptors(descriptors)
+    if not "general_information_related_to_event_log" in descriptors:
+        errors.append("You need to have general_information_related_to_event_log in the descriptor file!")
+    if len(errors) > 0:
+        return None, errors
+
+    file_name = descriptors["general_information_related_to_event_log"]["file_name"]
+    IRI = descriptors["general_information_related_to_event_log"]["IRI"]
+    ont_ns = f"{IRI}/ontology#"
+    vocabulary = _vocabulary(ont_ns)
+    schema_triples = base_triples(vocabulary)
+
+    if not has_event_log:
+        return DescriptorPlan(file_name, IRI, ont_ns, vocabulary, tuple(schema_triples), (), "", (), (), (), None, ()), []
+
+    referred = descriptors["referred_information_from_event_log"]
+    injected = descriptors["injected_information_to_OCED_model"]
+    events = referred["events"]
+
+    event_attributes = tuple(
+        AttributeSpec(attribute["event_attribute_value_selector"], attribute["event_attribute_name"], URIRef(ont_ns + attribute["event_attribute_name"]))
+        for attribute in events.get("attributes", [])
+    )
+    for attribute in event_attributes:
+        schema_triples.append((attribute.name_uri, RDF.type, vocabulary.event_attribute_name))
+
+    objects = []
+    for obj in referred["objects"]:
+        attributes = tuple(
+            AttributeSpec(attribute["object_attribute_value_selector"], attribute["object_attribute_name"], URIRef(ont_ns + attribute["object_attribute_name"]))
+            for attribute in obj.get("attributes", [])
+        )
+        for attribute in attributes:
+            schema_triples.append((attribute.name_uri, RDF.type, vocabulary.object_attribute_name))
+        objects.append(ObjectSpec(obj["object_type"], URIRef(ont_ns + obj["object_type"]), tuple(obj["object_identifier_selector"]), attributes, obj.get("is_trace") is True))
+    objects = tuple(objects)
+    trace_objects = [obj for obj in objects if obj.is_trace]
+    object_indexes = {obj.object_type: i for i, obj in enumerate(objects)}
+
+    event_relations = []
+    for relation in events.get("relations_to_objects", []):
+        if not relation["event_related_to"] in object_indexes:
+            errors.append(f"The event relation {relation['event_relation_type']} is related to {relation['event_related_to']}, which is not an object in the descriptor file!")
+            continue
+        event_relations.append(EventRelationSpec(URIRef(ont_ns + relation["event_relation_type"]), relation["event_related_to"], object_indexes[relation["event_related_to"]]))
+        schema_triples.append((event_relations[-1].predicate, RDF.type, OWL.ObjectProperty))
+
+    object_relations = []
+    for rel, rel_val in injected.get("objects_relation", {}).items():
+        for relation in rel_val.get("relations", []):
+            if not rel in object_indexes or not relation["object_related_to"] in object_indexes:
+                errors.append(f"The object relation {relation['object_relation_type']} needs {rel} and {relation['object_related_to']} to be objects in the descriptor file!")
+                continue
+            relation_type_uri = URIRef(ont_ns + relation["object_relation_type"])
+            schema_triples.append((relation_type_uri, RDF.type, OWL.Class))
+            schema_triples.append((relation_type_uri, RDFS.subClassOf, vocabulary.object_relation_type))
+            object_relations.append(ObjectRelationSpec(rel, relation["object_related_to"], relation_type_uri, object_indexes[rel], object_indexes[relation["object_related_to"]]))
+
+    if len(errors) > 0:
+        return None, errors
+
+    plan = DescriptorPlan(
+        file_name, IRI, ont_ns, vocabulary, tuple(schema_triples),
+        tuple(events["event_type_selector"]), events["event_timestamp"], event_attributes, tuple(event_relations),
+        objects, trace_objects[0] if len(trace_objects) > 0 else None, tuple(object_relations),
+    )
+    return plan, []
+
+
+def referenced_keys(plan):
+    # The XES attribute keys (dataframe columns) the plan reads, the traces are
+    # identified by the trace object even when a selection leaves it out of the objects
+    keys = list(plan.event_type_selector) + [plan.event_timestamp]
+    keys += [attribute.selector for attribute in plan.event_attributes]
+    for obj in plan.objects:
+        keys += list(obj.identifier_selector) + [attribute.selector for attribute in obj.attributes]
+    if plan.trace_object is not None:
+        keys += list(plan.trace_object.identifier_selector)
+    return list(dict.fromkeys(keys))
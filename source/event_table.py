@@ -0,0 +1,133 @@
+import sys
+import numpy as np
+import pandas as pd
+
+'''
+Dictionary-encoded event table of the manual converter.
+
+The attributes of an XES log (org:group, resource country, product, impact...)
+only take a few distinct values over thousands of events. Instead of a
+dataframe with a Python object per cell, EventTable keeps one array of integer
+codes per column and a single dictionary of the distinct values shared by all
+the columns: dictionary[code] is the value of a cell, as the dataframe of
+source/xes_columns.py has it (str, float, NaN for a missing value...). The date
+columns, which hardly repeat a value, keep their timestamps as they are.
+
+The converter works on the codes: the texts and the URIs of a column are built
+once per distinct code and spread over the rows with the codes, so this work
+grows with the number of distinct values, not with the number of events.
+'''
+
+
+def _dictionary_key(value):
+    # Values equal for the dictionary: the same type and value, all the NaN of a type
+    if value != value:
+        return (type(value), "missing")
+    return (type(value), value)
+
+
+class SharedDictionary:
+    # The distinct values of all the columns of a table, in the order they are added
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, values):
+        # The codes of values, a value not in the dictionary is added to it
+        codes = np.empty(len(values), dtype=np.int32)
+        for n, value in enumerate(values):
+            key = _dictionary_key(value)
+            code = self.codes.get(key)
+            if code is None:
+                code = self.codes[key] = len(self.values)
+                self.values.append(value)
+            codes[n] = code
+        return codes
+
+    def add_column(self, distinct, local_codes):
+        # The codes in this dictionary of the rows of a column given as its
+        # distinct values and the place of the value of every row among them
+        mapping = self.encode(distinct)
+        if len(mapping) == 0:
+            return np.zeros(len(local_codes), dtype=np.int32)
+        return mapping[local_codes]
+
+
+class EventTable:
+    # One row per event: columns maps the name of every dictionary-encoded column
+    # to the codes of its rows in dictionary, dates the name of every date column
+    # to its timestamps. index numbers the rows like the index of the dataframe
+    # (the place of the event in the log) and names keeps the order of the columns.
+    def __init__(self, columns, dictionary, index, dates=None, names=None):
+        self.columns = columns
+        self.dictionary = dictionary
+        self.index = index
+        self.dates = dates if dates is not None else {}
+        self.names = names if names is not None else list(columns) + list(self.dates)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, column):
+        return column in self.columns or column in self.dates
+
+    def distinct(self, column):
+        # (codes, values): the code of every row of a column from 0 on and the
+        # value of every code, each distinct value of the column once
+        if column in self.dates:
+            codes, uniques = pd.factorize(self.dates[column], use_na_sentinel=False)
+            return codes, list(uniques)
+        used, codes = np.unique(self.columns[column], return_inverse=True)
+        return codes.reshape(-1), [self.dictionary[code] for code in used.tolist()]
+
+    def slice(self, start, end):
+        # The rows from start to end, on the same dictionary
+        columns = {column: codes[start:end] for column, codes in self.columns.items()}
+        dates = {column: timestamps.iloc[start:end] for column, timestamps in self.dates.items()}
+        return EventTable(columns, self.dictionary, self.index[start:end], dates, self.names)
+
+    def take(self, rows):
+        # The rows at the places rows (an array of places in order), on the same dictionary
+        columns = {column: codes[rows] for column, codes in self.columns.items()}
+        dates = {column: timestamps.iloc[rows] for column, timestamps in self.dates.items()}
+        return EventTable(columns, self.dictionary, self.index[rows], dates, self.names)
+
+    def compact(self):
+        # The same rows with a dictionary of only the values they use, to send a
+        # part of the table to a worker process without the whole dictionary
+        all_codes = [codes for codes in self.columns.values()]
+        used = np.unique(np.concatenate(all_codes)) if len(all_codes) > 0 else np.zeros(0, dtype=np.int32)
+        columns = {column: np.searchsorted(used, codes).astype(np.int32) for column, codes in self.columns.items()}
+        return EventTable(columns, [self.dictionary[code] for code in used.tolist()], self.index, self.dates, self.names)
+
+    def itertuples(self):
+        # (index, value of every column...) per row, like dataframe.itertuples(name=None)
+        columns = []
+        for column in self.names:
+            if column in self.dates:
+                columns.append(list(self.dates[column]))
+            else:
+                columns.append([self.dictionary[code] for code in self.columns[column].tolist()])
+        return zip(self.index, *columns)
+
+    def memory_usage(self):
+        # Bytes of the codes, of the values of the dictionary and of the dates
+        codes = sum(codes.nbytes for codes in self.columns.values())
+        values = sum(sys.getsizeof(value) for value in self.dictionary) + sys.getsizeof(self.dictionary)
+        dates = sum(timestamps.memory_usage(index=False) for timestamps in self.dates.values())
+        return codes + values + dates
+
+
+def event_table_from_dataframe(dataframe):
+    # Encode the columns of a dataframe (pm4py's or the one of read_xes_columns),
+    # the date columns are kept as they are
+    dictionary = SharedDictionary()
+    columns = {}
+    dates = {}
+    for column in dataframe.columns:
+        if pd.api.types.is_datetime64_any_dtype(dataframe[column]):
+            dates[column] = dataframe[column].reset_index(drop=True)
+            continue
+        local_codes, distinct = pd.factorize(dataframe[column], use_na_sentinel=False)
+        columns[column] = dictionary.add_column(list(distinct), local_codes)
+    return EventTable(columns, dictionary.values, pd.RangeIndex(len(dataframe)), dates, list(dataframe.columns))
@@ -0,0 +1,76 @@
+import os
+import json
+from rdflib import RDF, URIRef
+
+'''
+Incremental conversion of a growing XES log.
+
+The XES converters can be given a checkpoint file. After every run it records
+how far the log has been converted (the number of traces and the id of the
+last one), the counters the next traces continue from and the ids of the
+objects already emitted. The next run converts only the traces after that
+watermark and writes their triples as a delta, by default to a new N-Triples
+file next to the previous ones, or into the store given to the converter.
+'''
+
+def load_checkpoint(checkpoint_path, converter):
+    # The checkpoint of the previous run, or None before the first one
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, 'r') as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint.get("converter") != converter:
+        raise ValueError(f"{checkpoint_path} is a checkpoint of the {checkpoint.get('converter')} converter, not of the {converter} one!")
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    # Replace the checkpoint in one step, a crash leaves the previous one in place
+    temporary_path = checkpoint_path + ".tmp"
+    with open(temporary_path, 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temporary_path, checkpoint_path)
+
+
+def delta_path(prefix, file_name, checkpoint):
+    # generated_documents/<prefix><file_name>_delta_<run>.nt, run 1 holds the whole log
+    run = 1 if checkpoint is None else checkpoint["runs"] + 1
+    return f"generated_documents/{prefix}{file_name}_delta_{run}.nt"
+
+
+class DeltaSink:
+    # Passes the triples on to sink, except the declarations (rdf:type and
+    # has_object_type) of the objects emitted by an earlier run or earlier in this one
+    def __init__(self, sink, vocabulary, emitted_objects):
+        self.sink = sink
+        self.objects_uri = vocabulary.objects
+        self.has_object_type_uri = vocabulary.has_object_type
+        self.emitted_objects = set(URIRef(object_uri) for object_uri in emitted_objects)
+        self.new_objects = set()
+
+    def bind(self, prefix, namespace):
+        self.sink.bind(prefix, namespace)
+
+    def add(self, triple):
+        subject, predicate, obj = triple
+        if predicate == self.has_object_type_uri or (predicate == RDF.type and obj == self.objects_uri):
+            if subject in self.emitted_objects and not subject in self.new_objects:
+                return
+            self.emitted_objects.add(subject)
+            self.new_objects.add(subject)
+        self.sink.add(triple)
+
+    def progress(self, name):
+        if hasattr(self.sink, "progress"):
+            return self.sink.progress(name)
+        return 0
+
+    def set_progress(self, name, value):
+        if hasattr(self.sink, "set_progress"):
+            self.sink.set_progress(name, value)
+
+    def __len__(self):
+        return len(self.sink)
+
+    def close(self):
+        self.sink.close()
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import cProfile
+import resource
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, asdict
+from rdflib import RDF
+from source.sinks import add_columns
+
+'''
+Instrumentation of a conversion: where its time and memory go.
+
+The converters take an optional instrumentation=Instrumentation(...). With it
+they time every stage of the conversion (reading the log, building the
+dataframe, parsing the XML, producing the triples, writing the outputs...),
+count the triples they produce by category and return a ConversionReport with
+these numbers, the statistics of their caches and the peak memory of the
+process. Without it nothing is measured, the triples go straight to the sink.
+
+    instrumentation = Instrumentation(jsonl_path="generated_documents/reports.jsonl")
+    report = convert_xes_to_rdf_xpath_position("data.xes", "descriptors.json", instrumentation=instrumentation)
+    print(report.stages)
+
+trace_memory=True also measures the peak of the memory allocated by Python in
+every stage with tracemalloc, and profile_path writes a cProfile profile of
+the whole conversion to that file (read it with pstats). Both slow the
+conversion down and are off by default.
+'''
+
+TRIPLE_CATEGORIES = ("events", "objects", "attribute_values", "positions", "relations", "schema")
+
+
+@dataclass
+class ConversionReport:
+    converter: str
+    input_path: str
+    started: float
+    seconds: float = 0.0
+    # [{"stage": name, "seconds": ..., "peak_traced_mb": ... with trace_memory}]
+    stages: list = field(default_factory=list)
+    # Triples given to the sink by category, duplicates included
+    triples: dict = field(default_factory=dict)
+    # stats() of the caches used by the conversion
+    caches: dict = field(default_factory=dict)
+    peak_rss_mb: float = 0.0
+    profile_path: str = None
+
+    def stage_seconds(self, name):
+        return sum(stage["seconds"] for stage in self.stages if stage["stage"] == name)
+
+    def as_dict(self):
+        return asdict(self)
+
+
+class Instrumentation:
+    def __init__(self, jsonl_path=None, trace_memory=False, profile_path=None):
+        self.jsonl_path = jsonl_path
+        self.trace_memory = trace_memory
+        self.profile_path = profile_path
+        self.report = None
+        self.reports = []
+        self._start = None
+        self._profiler = None
+        self._started_tracemalloc = False
+
+    def begin(self, converter, input_path):
+        self.report = ConversionReport(converter, str(input_path), time.time())
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        # A conversion that goes on after a cache miss stays in the same profile
+        if self.profile_path is not None and self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        return self.report
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            measures = {"stage": name, "seconds": round(time.perf_counter() - start, 4)}
+            if self.trace_memory:
+                measures["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+            self.report.stages.append(measures)
+
+    def count_triples(self, sink, plan):
+        # The sink to give the triples to, it counts them by category on the way
+        return CountingSink(sink, plan, self.report.triples)
+
+    def finish(self, **caches):
+        # Complete the report with the stats of the caches given as name=cache
+        report = self.report
+        report.seconds = round(time.perf_counter() - self._start, 4)
+        for name, cache in caches.items():
+            if cache is not None:
+                report.caches[name] = cache.stats()
+        # ru_maxrss is in kilobytes on Linux
+        report.peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            report.profile_path = self.profile_path
+            self._profiler = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        if self.jsonl_path is not None:
+            directory = os.path.dirname(self.jsonl_path)
+            if directory != "":
+                os.makedirs(directory, exist_ok=True)
+            with open(self.jsonl_path, 'a') as jsonl_file:
+                jsonl_file.write(json.dumps(report.as_dict()) + "\n")
+        self.reports.append(report)
+        return report
+
+
+def stage(instrumentation, name):
+    # instrumentation.stage(name), or a context that does nothing without instrumentation
+    if instrumentation is None:
+        return nullcontext()
+    return instrumentation.stage(name)
+
+
+class CountingSink:
+    # Passes the triples on to sink and counts them in counts by category. The
+    # other attributes (progress, emitted_objects, ...) are the ones of sink.
+    def __init__(self, sink, plan, counts):
+        self.sink = sink
+        self.counts = counts
+        for category in TRIPLE_CATEGORIES:
+            counts.setdefault(category, 0)
+
+        v = plan.vocabulary
+        self.predicates = {
+            v.has_position: "positions",
+            v.has_attribute_value: "attribute_values",
+            v.has_attribute_name: "attribute_values",
+            v.has_event_type: "events",
+            v.has_timestamp: "events",
+            v.has_object_type: "objects",
+            v.involves_object: "relations",
+        }
+        for relation in plan.event_relations:
+            self.predicates[relation.predicate] = "relations"
+        self.types = {
+            v.events: "events",
+            v.event_type: "events",
+            v.event_timestamp: "events",
+            v.objects: "objects",
+            v.object_type: "objects",
+            v.event_attribute_value: "attribute_values",
+            v.object_attribute_value: "attribute_values",
+        }
+        for relation in plan.object_relations:
+            self.types[relation.relation_type_uri] = "relations"
+
+    def add(self, triple):
+        predicate = triple[1]
+        if predicate == RDF.type:
+            category = self.types.get(triple[2], "schema")
+        else:
+            category = self.predicates.get(predicate, "schema")
+        self.counts[category] += 1
+        self.sink.add(triple)
+
+    def add_columns(self, subjects, predicate, objects, unique=False):
+        if predicate == RDF.type:
+            for class_uri, count in Counter(objects).items():
+                self.counts[self.types.get(class_uri, "schema")] += count
+        else:
+            self.counts[self.predicates.get(predicate, "schema")] += len(subjects)
+        add_columns(self.sink, subjects, predicate, objects, unique)
+
+    def __len__(self):
+        return len(self.sink)
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
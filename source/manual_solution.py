@@ -1,278 +1,363 @@
-import json
-import pm4py
-import urllib.parse
-from rdflib import RDF, RDFS, URIRef, Graph
-
-def convert_xes_to_rdf_manual_position(xes_file_path, descriptors_file_path):
-    # Load XES file
-    log = pm4py.read_xes(xes_file_path)
-    # Get file data
-    dataframe = pm4py.convert_to_dataframe(log)
-
-    # Load descriptors file
-    with open(descriptors_file_path, 'r') as json_file:
-        # Read the JSON data from the file
-        descriptors = json.load(json_file)
-
-    # Validate JSON file so that it has the proper information
-    errors = []
-
-    if not "referred_information_from_event_log" in descriptors:
-        errors.append("You need to have referred_information_from_event_log in the descriptor file!")
-
-    if not "injected_information_to_OCED_model" in descriptors:
-        errors.append("You need to have injected_information_to_OCED_model in the descriptor file!")
-
+import numpy as np
+from rdflib import RDF, URIRef
+from source.sinks import GraphSink, StreamingSink, SqliteSink, resume_point, record_progress
+from source.uri_cache import default_uri_cache
+from source.columnar import add_columnar_triples, trace_positions, joined_column
+from source.parallel import ShardSink, convert_shards, worker_context
+from source.incremental import DeltaSink, load_checkpoint, save_checkpoint, delta_path
+from source.descriptor_plan import compile_descriptors, referenced_keys
+from source.xes_columns import read_xes_columns
+from source.xes_cache import default_xes_cache
+from source.event_table import event_table_from_dataframe
+from source.selection import load_selection, select_plan
+from source.provenance import check_provenance, with_provenance, PositionRuns
+from source.instrumentation import stage
+from source.pipeline import PipelineSink
+
+# Changed whenever the triples produced for the same input change, it is part of
+# the key of the result cache (see source/result_cache.py)
+CONVERTER_VERSION = 1
+
+
+def output_paths(file_name):
+    # The RDF/XML and Turtle files written by the default sink
+    return (f"generated_documents/{file_name}_data_to_rdf.rdf", f"generated_documents/{file_name}_data_to_owl.owl")
+
+
+def convert_xes_to_rdf_manual_position(xes_file_path, descriptors_file_path, engine="columnar", sink=None, uri_cache=None, workers=None, shard_size=200, store=None, checkpoint=None, instrumentation=None, pipeline=False, xes_cache=None, selection=None, provenance="full"):
+    # descriptors_file_path can also be a plan already compiled with compile_descriptors.
+    # The events of the log are read into a dictionary-encoded event table (see
+    # source/event_table.py). engine can be "columnar", which builds the URI columns
+    # of the whole table at once, or "rows", which goes through the table row by row.
+    # Both produce the same graph.
+    # The triples are written to sink (see source/sinks.py), by default they are
+    # collected in a Graph and saved as RDF/XML and Turtle in generated_documents.
+    # The URIs of repeated values come from uri_cache (see source/uri_cache.py).
+    # With workers > 1 the log is converted in shards of shard_size traces on a
+    # pool of worker processes (see source/parallel.py), the output is the same.
+    # With store set to the path of an SQLite database the graph is kept on disk
+    # (see SqliteSink in source/sinks.py) and a stopped conversion can be resumed.
+    # With checkpoint set to the path of a checkpoint file only the traces added to
+    # the log since the previous run are converted (see source/incremental.py).
+    # With instrumentation (see source/instrumentation.py) the stages are timed, the
+    # triples counted and the ConversionReport is returned.
+    # With pipeline=True the triples are handed to the sink in a writer thread
+    # while the next ones are built (see source/pipeline.py). The log is read
+    # at once, so there is no reader stage.
+    # The parsed log is kept in xes_cache (see source/xes_cache.py) for the next
+    # runs and the xpath converter, xes_cache=False reads the file every time.
+    # With a selection (see source/selection.py) only the selected objects, event
+    # attributes, relations and the events of the time range are converted, the
+    # columns left out are not read.
+    # provenance sets the has_position triples written: "full", "event", "ranges"
+    # or "none" (see source/provenance.py).
+    if uri_cache is None:
+        uri_cache = default_uri_cache
+    if xes_cache is None:
+        xes_cache = default_xes_cache
+    if instrumentation is not None:
+        instrumentation.begin("manual", xes_file_path)
+
+    # Load, validate and compile the descriptors file
+    with stage(instrumentation, "compile_descriptors"):
+        plan, errors = compile_descriptors(descriptors_file_path)
+    if len(errors) == 0:
+        errors = check_provenance(provenance)
+        if len(errors) == 0:
+            plan = with_provenance(plan, provenance)
+    if len(errors) == 0 and selection is not None:
+        selection, errors = load_selection(selection)
+        if selection is not None:
+            plan = select_plan(plan, selection)
     if len(errors) > 0:
         print(errors)
         return
-    
-    referred = descriptors["referred_information_from_event_log"]
-    injected = descriptors["injected_information_to_OCED_model"]
-
-    if not "events" in referred:
-        errors.append("You need to have event data in the descriptor file!")
-
-    if not "objects" in referred:
-        errors.append("You need to have objects data in the descriptor file!")
-
-    if "events" in referred:
-        if not isinstance(referred["events"], dict):
-            errors.append("events should be an object!")
-        else: 
-            if not "event_type_selector" in referred["events"]:
-                errors.append("You need to have event_type_selector in the descriptor file, they represent the value of Event Type!")
-            if not "event_timestamp" in referred["events"]:
-                errors.append("You need to have event_timestamp in the descriptor file, it represents the Event Timestamp!")
-            for attr in referred["events"]["attributes"]:
-                if not "event_attribute_value_selector" in attr or not "event_attribute_name" in attr:
-                    errors.append("You need to have event_attribute_value_selector and event_attribute_name for each attribute in the descriptor file!")
-                    break
-            for relation in referred["events"]["relations_to_objects"]:
-                if not "event_relation_type" in relation or not "event_related_to" in relation:
-                    errors.append("You need to have event_relation_type and event_related_to for each relation in the descriptor file!")
-                    break
-
-    if "objects" in referred:
-        if not isinstance(referred["objects"], list):
-            errors.append("objects should be array!")
-        else: 
-            for obj in referred["objects"]:
-                if not "object_type" in obj:
-                    errors.append("You need to have object_type data in the descriptor file for each object!")
-                if not "object_identifier_selector" in obj:
-                    errors.append("You need to have object_identifier_selector in the descriptor file for each object!")
-                for attr in obj["attributes"]:
-                    if not "object_attribute_value_selector" in attr or not "object_attribute_name" in attr:
-                        errors.append("You need to have object_attribute_value_selector and object_attribute_name for each attribute in the descriptor file!")
-                        break
-                if "relations" in obj:
-                    for relation in obj["relations"]:
-                        if not "object_relation_type" in relation or not "object_related_to" in relation:
-                            errors.append("You need to have object_relation_type and object_related_to for each relation in the descriptor file!")
-                            break
 
-    if len(errors) > 0:
-        return
-
-    file_name = descriptors["general_information_related_to_event_log"]["file_name"]
-    IRI = descriptors["general_information_related_to_event_log"]["IRI"]
-
-    # Create an RDF graph
-    g = Graph()
+    # Load XES file, only the columns the descriptors refer to
+    with stage(instrumentation, "read_xes"):
+        table, attributes_positions = read_log(xes_file_path, referenced_keys(plan), xes_cache)
+
+    file_name = plan.file_name
+    ont_ns = plan.ont_ns
+
+    previous = None
+    if checkpoint is not None:
+        previous = load_checkpoint(checkpoint, "manual")
+
+    if plan.trace_object is not None:
+        traceKey = plan.trace_object.identifier_selector
+    else:
+        traceKey = ()
+
+    # The trace and event ids are computed on the whole log
+    trace_events = None
+    time_range = selection is not None and selection.has_time_range
+    if checkpoint is not None or (workers is not None and workers > 1) or time_range:
+        trace_values = joined_column(table, traceKey)
+        trace_events = trace_positions(trace_values)
+
+    if checkpoint is not None:
+        # Only the rows of the traces after the watermark of the previous run
+        trace_ids, event_ids = trace_events
+        first = previous["traces"] if previous is not None else 0
+        if first > 0 and (first > trace_ids.max() or trace_values[np.argmax(trace_ids == first)] != previous["last_trace_id"]):
+            print([f"Trace {first} of {xes_file_path} is not the last trace of the previous run, the log has changed instead of growing!"])
+            return
+        start = int(np.argmax(trace_ids > first)) if trace_ids.max() > first else len(table)
+        if (trace_ids[start:] <= first).any():
+            print([f"Events were added to traces converted by the previous run, only new traces can be appended to {xes_file_path}!"])
+            return
+        last_trace_id = trace_values[len(table) - 1] if len(table) > 0 else None
+        traces_count = int(trace_ids.max()) if len(table) > 0 else 0
+        table = table.slice(start, len(table))
+        trace_events = (trace_ids[start:], event_ids[start:])
+
+    if time_range:
+        # Only the rows of the events in the time range, the distinct timestamps are checked once
+        codes, timestamps = table.distinct(plan.event_timestamp)
+        keeps = np.array([selection.keeps_time(timestamp) for timestamp in timestamps], dtype=bool)
+        rows = np.flatnonzero(keeps[codes]) if len(keeps) > 0 else np.zeros(0, dtype=np.int64)
+        table = table.take(rows)
+        trace_events = (trace_events[0][rows], trace_events[1][rows])
+
+    # Create an RDF graph, once the log is known to extend the previous run: a
+    # rejected run leaves no empty delta file behind
+    if checkpoint is not None and sink is None and store is None:
+        sink = StreamingSink(delta_path("", file_name, previous))
+    if sink is None and store is not None:
+        sink = SqliteSink(store, *output_paths(file_name))
+    elif sink is None:
+        sink = GraphSink(*output_paths(file_name))
+    if checkpoint is not None:
+        sink = DeltaSink(sink, plan.vocabulary, previous["emitted_objects"] if previous is not None else [])
+    if pipeline:
+        sink = PipelineSink(sink)
+    g = sink
+    if instrumentation is not None:
+        g = instrumentation.count_triples(g, plan)
 
     # Define namespaces
-    ont_ns = f"{IRI}/ontology#"
-    owl_ns = "http://www.w3.org/2002/07/owl#"
-    rdf_ns = "http://www.w3.org/2000/01/rdf-schema#"
     g.bind("ont", ont_ns)
 
-    # Define classes
-    events_uri = URIRef(ont_ns + "events")
-    g.add((events_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_type_uri = URIRef(ont_ns + "event_type")
-    g.add((event_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_timestamp_uri = URIRef(ont_ns + "event_timestamp")
-    g.add((event_timestamp_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_attribute_name_uri = URIRef(ont_ns + "event_attribute_name")
-    g.add((event_attribute_name_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_attribute_value_uri = URIRef(ont_ns + "event_attribute_value")
-    g.add((event_attribute_value_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    objects_uri = URIRef(ont_ns + "objects")
-    g.add((objects_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_type_uri = URIRef(ont_ns + "object_type")
-    g.add((object_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_attribute_name_uri = URIRef(ont_ns + "object_attribute_name")
-    g.add((object_attribute_name_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_attribute_value_uri = URIRef(ont_ns + "object_attribute_value")
-    g.add((object_attribute_value_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_relation_type_uri = URIRef(ont_ns + "object_relation_type")
-    g.add((object_relation_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    involves_object_uri = URIRef(ont_ns + "relation_involves_object")
-    g.add((involves_object_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_attribute_name_uri = URIRef(ont_ns + "has_attribute_name")
-    g.add((has_attribute_name_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_attribute_value_uri = URIRef(ont_ns + "has_attribute_value")
-    g.add((has_attribute_value_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_event_type_uri = URIRef(ont_ns + "has_event_type")
-    g.add((has_event_type_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_timestamp_uri = URIRef(ont_ns + "has_timestamp")
-    g.add((has_timestamp_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_object_type_uri = URIRef(ont_ns + "has_object_type")
-    g.add((has_object_type_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_position_uri = URIRef(ont_ns + "has_position")
-    g.add((has_position_uri, RDF.type, URIRef(owl_ns + "DatatypeProperty")))
-
-    for key, value in referred.items():
-        if key == "events": 
-            for attribute in value["attributes"]:
-                event_attribute_name_instance_uri = URIRef(ont_ns + attribute["event_attribute_name"])
-                g.add((event_attribute_name_instance_uri, RDF.type, event_attribute_name_uri))
-
-            for relation in value["relations_to_objects"]:
-                event_relation_type_uri = URIRef(ont_ns + relation["event_relation_type"])
-                g.add((event_relation_type_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-        if key == "objects": 
-            for obj in value: 
-                for attribute in obj["attributes"]:
-                    object_attribute_name_instance_uri = URIRef(ont_ns + attribute["object_attribute_name"])
-                    g.add((object_attribute_name_instance_uri, RDF.type, object_attribute_name_uri))
-
-                # if "relations" in obj:
-                #     for relation in obj["relations"]:
-                #         object_relation_type_instance_uri = URIRef(ont_ns + relation["object_relation_type"])
-                #         g.add((object_relation_type_instance_uri, RDF.type, object_relation_type_uri))
-
-
-    if "objects_relation" in injected:
-        for rel, rel_val in injected["objects_relation"].items():
-            if "relations" in rel_val:
-                for relation in rel_val["relations"]:
-                    object_relation_type_instance_uri = URIRef(ont_ns + relation["object_relation_type"])
-                    g.add((object_relation_type_instance_uri, RDF.type, URIRef(owl_ns + "Class")))
-                    g.add((object_relation_type_instance_uri, RDFS.subClassOf, object_relation_type_uri))
-
-    allTraces = []
-    matching_objects = [obj for obj in referred["objects"] if "is_trace" in obj and obj["is_trace"] is True]
-    if len(matching_objects) > 0:
-        traceKey = matching_objects[0]["object_identifier_selector"]
-    else: 
-        traceKey = ""
-
-    traceId = 0
-    eventId = 0
+    # Define classes and properties
+    for triple in plan.schema_triples:
+        g.add(triple)
+
+    with stage(instrumentation, "triples"):
+        if workers is not None and workers > 1:
+            # Every shard gets its rows and their ids. The workers use their own URI cache.
+            context = {'plan': plan, 'engine': engine, 'traceKey': traceKey, 'attributes_positions': attributes_positions}
+            convert_shards(_row_shards(table, trace_events, shard_size), _convert_row_shard, context, g, workers)
+        elif engine == "columnar":
+            # The columns are converted all at once, a resumed sink has all of them or starts over
+            if len(table) > 0 and resume_point(g, "rows") < table.index[-1] + 1:
+                add_columnar_triples(g, table, plan, traceKey, attributes_positions, uri_cache, trace_events)
+                record_progress(g, "rows", int(table.index[-1] + 1))
+        else:
+            add_row_triples(g, table, plan, traceKey, attributes_positions, uri_cache, trace_events)
+
+    # Write the outputs
+    with stage(instrumentation, "write"):
+        g.close()
+
+    if checkpoint is not None:
+        save_checkpoint(checkpoint, {
+            "converter": "manual",
+            "runs": previous["runs"] + 1 if previous is not None else 1,
+            "traces": traces_count,
+            "last_trace_id": last_trace_id,
+            "rows": int(table.index[-1] + 1) if len(table) > 0 else (previous["rows"] if previous is not None else 0),
+            "emitted_objects": sorted(g.emitted_objects),
+        })
+
+    if workers is None or workers <= 1:
+        print(f"URI cache: {uri_cache.stats()}")
+
+    if instrumentation is not None:
+        return instrumentation.finish(uri_cache=uri_cache, xes_cache=xes_cache or None)
+
+
+def read_log(xes_file_path, keys, xes_cache=False):
+    # Returns (table, attributes_positions): the event table of the log with the
+    # columns among keys (see source/event_table.py) and the place of every column
+    # of the log, as in the dataframe of pm4py. They come from xes_cache unless it
+    # is False. pm4py is only imported to read the logs the lean loader cannot read.
+    try:
+        if xes_cache is False:
+            dataframe, column_names = read_xes_columns(xes_file_path, keys)
+            table = event_table_from_dataframe(dataframe)
+        else:
+            table, column_names = xes_cache.load(xes_file_path).event_table(keys)
+    except Exception as error:
+        print(f"Reading {xes_file_path} with pm4py, the XES loader failed: {error}")
+        import pm4py
+        log = pm4py.read_xes(xes_file_path)
+        dataframe = pm4py.convert_to_dataframe(log)
+        column_names = list(dataframe.columns)
+        table = event_table_from_dataframe(dataframe)
 
     attributes_positions = {}
-    for index, col_name in enumerate(dataframe.columns):
+    for index, col_name in enumerate(column_names):
         attributes_positions[col_name]= index
+    return table, attributes_positions
+
+
+def _row_shards(table, trace_events, shard_size):
+    # Cut the table in shards of rows that hold shard_size traces, a shard
+    # starts on the first row of a trace. A shard only carries the values of
+    # the dictionary its rows use.
+    trace_ids, event_ids = trace_events
+    starts = np.flatnonzero((event_ids == 1) & ((trace_ids - 1) % shard_size == 0))
+    if len(starts) == 0 or starts[0] != 0:
+        starts = np.concatenate([[0], starts])
+    ends = np.append(starts[1:], len(table))
+    for start, end in zip(starts, ends):
+        yield (table.slice(start, end).compact(), trace_ids[start:end], event_ids[start:end])
+
+
+def _convert_row_shard(shard):
+    # Runs in a worker process of convert_shards
+    table, trace_ids, event_ids = shard
+    context = worker_context
+    g = ShardSink()
+    if context['engine'] == "columnar":
+        add_columnar_triples(g, table, context['plan'], context['traceKey'], context['attributes_positions'], default_uri_cache, (trace_ids, event_ids))
+    else:
+        add_row_triples(g, table, context['plan'], context['traceKey'], context['attributes_positions'], default_uri_cache, (trace_ids, event_ids))
+    return list(g.triples)
+
+
+def add_row_triples(g, table, plan, traceKey, attributes_positions, uri_cache, trace_events=None):
+    # Row by row version of add_columnar_triples (see source/columnar.py).
+    # trace_events can give the trace and event ids of the rows, as computed by
+    # trace_positions, when the table is only a part of the log.
+    ont_ns = plan.ont_ns
+    v = plan.vocabulary
+
+    # Resolve the selectors to places in the row tuples once, the first place is the index.
+    # The attributes are numbered by their place among all the columns of the log.
+    row_places = {}
+    for index, col_name in enumerate(table.names):
+        row_places[col_name] = index + 1
+
+    def row_indexes(keys):
+        return tuple(row_places[key] for key in keys if key in row_places)
+
+    def attribute_columns(attributes):
+        return tuple((row_places[attribute.selector], attribute.name_uri, f"/Attribute:{attributes_positions[attribute.selector]}") for attribute in attributes)
+
+    trace_indexes = row_indexes(traceKey)
+    event_type_indexes = row_indexes(plan.event_type_selector)
+    timestamp_index = row_places[plan.event_timestamp]
+    event_attributes = attribute_columns(plan.event_attributes)
+    objects = tuple((obj.type_uri, row_indexes(obj.identifier_selector), attribute_columns(obj.attributes)) for obj in plan.objects)
+
+    # The positions of the attribute values, with "ranges" they are collected in
+    # runs written at the end of every trace (see source/provenance.py)
+    provenance = plan.provenance
+    runs = PositionRuns(g, v.has_position) if provenance == "ranges" else None
+    runs_trace = None
+
+    def add_attribute_position(full_uri, attribute_position):
+        if provenance == "full":
+            g.add((full_uri, v.has_position, URIRef(position + attribute_position)))
+        elif runs is not None:
+            runs.add(full_uri, ont_ns + f"Trace:{traceId}/Event:", eventId, attribute_position)
+
+    allTraces = set()
+    traceId = 0
+    eventId = 0
+    done = resume_point(g, "rows")
 
     # Add instances for the classes and properties based on the data file we have
-    for index, row in dataframe.iterrows():
-        traceValue = "_".join(["_".join(str(row[key]).split(" ")) for key in traceKey if key in row])
-        if not traceValue in allTraces:
-            allTraces.append(traceValue)
-            traceId += 1
-            eventId = 1
-        else: 
-            eventId += 1
-
-        key = "events"
-        value = referred[key]       
+    for n, row in enumerate(table.itertuples()):
+        index = row[0]
+        if trace_events is not None:
+            traceId = trace_events[0][n]
+            eventId = trace_events[1][n]
+        else:
+            traceValue = "_".join(["_".join(str(row[i]).split(" ")) for i in trace_indexes])
+            if not traceValue in allTraces:
+                allTraces.add(traceValue)
+                traceId += 1
+                eventId = 1
+            else:
+                eventId += 1
+
+        # Rows a resumed sink already has
+        if index < done:
+            continue
+
+        if runs is not None and traceId != runs_trace:
+            # The runs of a trace are complete, the rows before it are done
+            runs.flush()
+            if runs_trace is not None:
+                record_progress(g, "rows", index)
+            runs_trace = traceId
+
+        position = ont_ns + f"Trace:{traceId}/Event:{eventId}"
+
         event_instance_uri = URIRef(ont_ns + "EventID_" + str(index + 1))
-        g.add((event_instance_uri, RDF.type, events_uri))
+        g.add((event_instance_uri, RDF.type, v.events))
 
-        event_type_instance_uri = URIRef(ont_ns + "_".join(["_".join(str(row[key]).split(" ")) for key in value["event_type_selector"] if key in row]))
-        g.add((event_type_instance_uri, RDF.type, event_type_uri))
+        event_type_instance_uri = uri_cache.joined(ont_ns, [row[i] for i in event_type_indexes])
+        g.add((event_type_instance_uri, RDF.type, v.event_type))
 
-        g.add((event_instance_uri, has_event_type_uri, event_type_instance_uri))
+        g.add((event_instance_uri, v.has_event_type, event_type_instance_uri))
 
-        iso8601_timestamp = row[value["event_timestamp"]].isoformat()
-        event_timestamp_instance_uri = URIRef(ont_ns + iso8601_timestamp)
-        g.add((event_timestamp_instance_uri, RDF.type, event_timestamp_uri))
+        iso8601_timestamp = row[timestamp_index].isoformat()
+        event_timestamp_instance_uri = uri_cache.uri(ont_ns, iso8601_timestamp)
+        g.add((event_timestamp_instance_uri, RDF.type, v.event_timestamp))
 
-        g.add((event_instance_uri, has_timestamp_uri, event_timestamp_instance_uri))
+        g.add((event_instance_uri, v.has_timestamp, event_timestamp_instance_uri))
 
-        g.add((event_instance_uri, has_position_uri, URIRef(ont_ns + f"Trace:{traceId}/Event:{eventId}")))
+        if provenance != "none":
+            g.add((event_instance_uri, v.has_position, URIRef(position)))
 
-        for attribute in value["attributes"]:
+        for column, name_uri, attribute_position in event_attributes:
             # Combine the base URI and the encoded resource name to create the full URI
-            full_uri = ont_ns + urllib.parse.quote(str(row[attribute["event_attribute_value_selector"]]))
-            g.add((URIRef(full_uri), RDF.type, event_attribute_value_uri))
-            g.add((URIRef(full_uri), has_attribute_name_uri, URIRef(ont_ns + attribute["event_attribute_name"])))
+            full_uri = uri_cache.quoted(ont_ns, row[column])
+            g.add((full_uri, RDF.type, v.event_attribute_value))
+            g.add((full_uri, v.has_attribute_name, name_uri))
 
-            g.add((event_instance_uri, has_attribute_value_uri, URIRef(full_uri)))
-            g.add((URIRef(full_uri), has_position_uri, URIRef(ont_ns + f"Trace:{traceId}/Event:{eventId}/Attribute:{attributes_positions[attribute['event_attribute_value_selector']]}")))
+            g.add((event_instance_uri, v.has_attribute_value, full_uri))
+            add_attribute_position(full_uri, attribute_position)
 
-        key = "objects"
-        value = referred[key]  
-        all_event_objects = {}
-        object_ids = {}
-        for i, obj in enumerate(value):          
-            object_id = "OBJ_" + "_".join(["_".join(str(row[key]).split(" ")) for key in obj["object_identifier_selector"] if key in row])
-            object_instance_uri = URIRef(ont_ns + object_id)
-            g.add((object_instance_uri, RDF.type, objects_uri))
+        all_event_objects = []
+        object_ids = []
+        for type_uri, identifier_indexes, attributes in objects:
+            object_instance_uri = uri_cache.joined(ont_ns, [row[i] for i in identifier_indexes], "OBJ_")
+            g.add((object_instance_uri, RDF.type, v.objects))
 
-            object_type_instance_uri = URIRef(ont_ns + obj["object_type"])
-            g.add((object_type_instance_uri, RDF.type, object_type_uri))
+            g.add((type_uri, RDF.type, v.object_type))
 
-            g.add((object_instance_uri, has_object_type_uri, object_type_instance_uri))
+            g.add((object_instance_uri, v.has_object_type, type_uri))
 
-            all_event_objects[obj["object_type"]] = object_instance_uri
-            object_ids[obj["object_type"]] = object_id
+            all_event_objects.append(object_instance_uri)
+            object_ids.append(object_instance_uri[len(ont_ns):])
 
-            for attribute in obj["attributes"]:
+            for column, name_uri, attribute_position in attributes:
                 # Combine the base URI and the encoded resource name to create the full URI
-                full_uri = ont_ns + urllib.parse.quote(str(row[attribute["object_attribute_value_selector"]]))
-                g.add((URIRef(full_uri), RDF.type, object_attribute_value_uri))
-                g.add((URIRef(full_uri), has_attribute_name_uri, URIRef(ont_ns + attribute["object_attribute_name"])))
-                g.add((object_instance_uri, has_attribute_value_uri, URIRef(full_uri)))
-                g.add((URIRef(full_uri), has_position_uri, URIRef(ont_ns + f"Trace:{traceId}/Event:{eventId}/Attribute:{attributes_positions[attribute['object_attribute_value_selector']]}")))
-
-        if "objects_relation" in injected:
-            for rel, rel_val in injected["objects_relation"].items():
-                if "relations" in rel_val:
-                    for relation in rel_val["relations"]:
-                        current_object_instance_uri = URIRef(ont_ns + object_ids[rel])
-                        related_to_instance_uri = all_event_objects[relation["object_related_to"]]
+                full_uri = uri_cache.quoted(ont_ns, row[column])
+                g.add((full_uri, RDF.type, v.object_attribute_value))
+                g.add((full_uri, v.has_attribute_name, name_uri))
+                g.add((object_instance_uri, v.has_attribute_value, full_uri))
+                add_attribute_position(full_uri, attribute_position)
 
-                        relation_instance_uri = URIRef(ont_ns + f"{object_ids[rel]}_{object_ids[relation['object_related_to']]}")
-                        g.add((relation_instance_uri, RDF.type, URIRef(ont_ns + f"{relation['object_relation_type']}")))
+        for relation in plan.object_relations:
+            relation_instance_uri = uri_cache.uri(ont_ns, f"{object_ids[relation.object_index]}_{object_ids[relation.related_index]}")
+            g.add((relation_instance_uri, RDF.type, relation.relation_type_uri))
 
-                        g.add((relation_instance_uri, involves_object_uri, current_object_instance_uri))
-                        g.add((relation_instance_uri, involves_object_uri, related_to_instance_uri))
+            g.add((relation_instance_uri, v.involves_object, all_event_objects[relation.object_index]))
+            g.add((relation_instance_uri, v.involves_object, all_event_objects[relation.related_index]))
 
         # Now add the Event Relations because now all Object Instances are created and we can have the proper connections
-        for relation in referred["events"]["relations_to_objects"]:
-            g.add((event_instance_uri, URIRef(ont_ns + relation["event_relation_type"]), all_event_objects[f"{relation['event_related_to']}"]))
-
-    # Create an ElementTree from the root
-    rdf_xml = g.serialize(format="xml")
-
-    rdf_file_path = f"generated_documents/{file_name}_data_to_rdf.rdf"
-    with open(rdf_file_path, "w", encoding="utf-8") as file:
-        file.write(rdf_xml)
-    print(f"RDF/XML content saved to {rdf_file_path}")
+        for relation in plan.event_relations:
+            g.add((event_instance_uri, relation.predicate, all_event_objects[relation.related_index]))
 
-    rdf_data = g.serialize(format="turtle")
-    # Serialize the graph to a file
-    with open(f"generated_documents/{file_name}_data_to_owl.owl", "w", encoding="utf-8") as f:
-        f.write(rdf_data)
+        if runs is None:
+            record_progress(g, "rows", index + 1)
 
-    print(f"OWL content saved to {file_name}_data_to_owl.owl")
+    if runs is not None and runs_trace is not None:
+        runs.flush()
+        record_progress(g, "rows", index + 1)
@@ -0,0 +1,132 @@
+import json
+
+'''
+OCED files are read as a stream of (table, record) pairs, e.g.
+
+    ('event', {'event_id': 'event_id1', 'event_type': 'Accepted In Progress', 'event_time': '...'})
+    ('object', {'object_id': 'object_PROD753', 'object_type': 'Product', 'object_existency': True})
+
+iter_oced_json reads an OCED JSON file with an incremental tokenizer: the
+top level object is walked key by key and the arrays of the tables are decoded
+one record at a time, so only the current record is held in memory.
+iter_oced_jsonl reads the JSON Lines variant, one {"table": ..., "record": ...}
+object per line, in which the records of the tables can be interleaved.
+'''
+
+# The tables used by convert_OCED_to_rdf, in the order it converts them
+OCED_TABLES = (
+    "event_time", "event_type", "event_attribute_name", "event", "event_attribute_value",
+    "object_type", "object_attribute_name", "object_relation_type", "object",
+    "object_attribute_value", "object_relation",
+)
+
+_WHITESPACE = " \t\n\r"
+
+
+class _JsonTokenizer:
+    # Reads a JSON text in chunks. Values are decoded with JSONDecoder.raw_decode
+    # as soon as the buffer holds all of them.
+    def __init__(self, json_file, chunk_size=1 << 16):
+        self.file = json_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def _read(self):
+        chunk = self.file.read(self.chunk_size)
+        if chunk == "":
+            self.eof = True
+            return False
+        # Drop what has been consumed already before growing the buffer
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        # Next character that is not whitespace, "" at the end of the text
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                return ""
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError(f"Expected {character!r} at character {self.position} of the OCED file!")
+        self.position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number at the end of the buffer may go on in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read()
+
+
+def iter_oced_json(oced_file_path, chunk_size=1 << 16):
+    # Yields (table, record) for every record of every table of the OCED JSON file,
+    # in the order of the file. Top level values that are not arrays are skipped.
+    with open(oced_file_path, 'r', encoding="utf-8") as json_file:
+        tokens = _JsonTokenizer(json_file, chunk_size)
+        tokens.expect("{")
+        if tokens.peek() == "}":
+            return
+        while True:
+            table = tokens.value()
+            tokens.expect(":")
+            if tokens.peek() == "[":
+                tokens.expect("[")
+                if tokens.peek() == "]":
+                    tokens.expect("]")
+                else:
+                    while True:
+                        yield table, tokens.value()
+                        if tokens.peek() == ",":
+                            tokens.expect(",")
+                        else:
+                            tokens.expect("]")
+                            break
+            else:
+                tokens.value()
+
+            if tokens.peek() == ",":
+                tokens.expect(",")
+            else:
+                tokens.expect("}")
+                return
+
+
+def iter_oced_jsonl(oced_file_path):
+    # Yields (table, record) for every line of an OCED JSON Lines file
+    with open(oced_file_path, 'r', encoding="utf-8") as jsonl_file:
+        for line in jsonl_file:
+            if line.strip() == "":
+                continue
+            entry = json.loads(line)
+            yield entry["table"], entry["record"]
+
+
+def iter_oced_model(oced_model):
+    # Yields (table, record) for an OCED model already loaded with json.load,
+    # table by table in the order of OCED_TABLES
+    for table in OCED_TABLES:
+        for record in oced_model.get(table, []):
+            yield table, record
+
+
+def write_oced_jsonl(oced_file_path, jsonl_file_path):
+    # Convert an OCED JSON file to the JSON Lines variant without loading it
+    with open(jsonl_file_path, 'w', encoding="utf-8") as jsonl_file:
+        for table, record in iter_oced_json(oced_file_path):
+            jsonl_file.write(json.dumps({"table": table, "record": record}) + "\n")
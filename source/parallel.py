@@ -0,0 +1,73 @@
+import multiprocessing
+from collections import deque
+from source.sinks import resume_point, record_progress
+
+'''
+Trace-sharded conversion on a pool of worker processes.
+
+The XES converters split the log into shards of whole traces. Every shard
+carries what it needs to number its events exactly as a sequential run would
+(the number of events before it, or the trace and event ids of its rows), so
+the workers never talk to each other. A worker adds the triples of its shard
+to a ShardSink, which drops the triples it already has, and sends them back.
+The shards are merged in their order into the sink of the conversion, which
+removes the triples repeated between shards (the shared object, attribute
+value and event type nodes).
+'''
+
+# Set by _init_worker in every worker process: the plan and the options of the conversion
+worker_context = {}
+
+
+def _init_worker(context):
+    worker_context.clear()
+    worker_context.update(context)
+
+
+class ShardSink:
+    # Collects the distinct triples of a shard in the order they are produced
+    def __init__(self):
+        self.triples = {}
+
+    def bind(self, prefix, namespace):
+        pass
+
+    def add(self, triple):
+        self.triples[triple] = None
+
+    def __len__(self):
+        return len(self.triples)
+
+    def close(self):
+        pass
+
+
+def convert_shards(shards, shard_function, context, sink, workers):
+    # Run shard_function(shard) in workers processes and add the triples it
+    # returns to sink, in the order of the shards. shards can be a generator:
+    # at most two shards per worker are waiting at any time, so a streamed log
+    # is never read far ahead of the conversion. The shards a resumed sink
+    # already has are skipped (the shards have to be cut the same way).
+    done = resume_point(sink, "shards")
+    shard_count = 0
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(context,)) as pool:
+        pending = deque()
+        for n, shard in enumerate(shards):
+            if n < done:
+                continue
+            pending.append((n, pool.apply_async(shard_function, (shard,))))
+            if len(pending) >= 2 * workers:
+                _merge(sink, pending.popleft())
+                shard_count += 1
+        while len(pending) > 0:
+            _merge(sink, pending.popleft())
+            shard_count += 1
+
+    print(f"Converted {shard_count} shards on {workers} worker processes")
+
+
+def _merge(sink, pending_shard):
+    n, result = pending_shard
+    for triple in result.get():
+        sink.add(triple)
+    record_progress(sink, "shards", n + 1)
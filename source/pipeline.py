@@ -0,0 +1,177 @@
+import queue
+import threading
+from source.sinks import add_columns
+
+'''
+Pipelined conversion: reading, transforming and writing run at the same time.
+
+With pipeline=True the converters run in three stages connected by bounded
+queues:
+
+    reader thread  --traces / records-->  converter  --triple batches-->  writer thread
+
+pipelined() runs the reader of the input (iter_xes_traces, iter_oced_json, ...)
+in its own thread and PipelineSink hands the triples to the sink in another
+one. A full queue blocks the stage before it, so no stage runs ahead of the
+next one by more than maxsize items and the memory stays bounded.
+
+The stages are threads: reading the files, the XML parser and the writes of
+the sinks overlap with the building of the triples, the Python code of the
+stages still takes turns on the interpreter. workers (see source/parallel.py)
+is the option that spreads the building of the triples over several processors.
+The hand-offs between the threads have a cost of their own, compare both modes
+on the machine with benchmarks/pipeline_benchmark.py.
+'''
+
+_END = object()
+
+
+class _Failure:
+    # An exception of the reader, on its way to the converter
+    def __init__(self, error):
+        self.error = error
+
+
+def pipelined(items, chunk_size=256, maxsize=16):
+    # Iterate items in a reader thread and yield them from a bounded queue of
+    # at most maxsize chunks of chunk_size items. An exception of the reader is
+    # raised again here.
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(chunk):
+        while not stop.is_set():
+            try:
+                buffer.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read():
+        try:
+            chunk = []
+            for item in items:
+                chunk.append(item)
+                if len(chunk) == chunk_size:
+                    put(chunk)
+                    chunk = []
+                    if stop.is_set():
+                        return
+            put(chunk)
+            put(_END)
+        except BaseException as error:
+            put(_Failure(error))
+
+    reader = threading.Thread(target=read, name="pipeline-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield from item
+    finally:
+        # The converter can stop early (an error, a changed log), let the reader end
+        stop.set()
+        while reader.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        reader.join()
+
+
+class PipelineSink:
+    # Passes the triples on to sink from a writer thread, batch_size at a time
+    # through a queue of at most maxsize batches. bind and set_progress go through
+    # the same queue, so the sink gets everything in the order it was given.
+    def __init__(self, sink, batch_size=1000, maxsize=16):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.batch = []
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self.writer = threading.Thread(target=self._write, name="pipeline-writer", daemon=True)
+        self.writer.start()
+
+    def _write(self):
+        sink = self.sink
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                # After a failure the batches are still taken so that the converter never blocks
+                if self.error is None:
+                    if item[0] == "add":
+                        for triple in item[1]:
+                            sink.add(triple)
+                    elif item[0] == "columns":
+                        add_columns(sink, *item[1:])
+                    elif item[0] == "bind":
+                        sink.bind(item[1], item[2])
+                    else:
+                        sink.set_progress(item[1], item[2])
+            except BaseException as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _put(self, item):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(item)
+
+    def flush(self):
+        if len(self.batch) > 0:
+            batch = self.batch
+            self.batch = []
+            self._put(("add", batch))
+
+    def bind(self, prefix, namespace):
+        self.flush()
+        self._put(("bind", prefix, namespace))
+
+    def add(self, triple):
+        self.batch.append(triple)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def add_columns(self, subjects, predicate, objects, unique=False):
+        # The columns go through the queue as one item, after the triples added before them
+        self.flush()
+        self._put(("columns", subjects, predicate, objects, unique))
+
+    def progress(self, name):
+        if hasattr(self.sink, "progress"):
+            return self.sink.progress(name)
+        return 0
+
+    def set_progress(self, name, value):
+        # Recorded after the triples added before it
+        if hasattr(self.sink, "set_progress"):
+            self.flush()
+            self._put(("progress", name, value))
+
+    def wait(self):
+        # Block until the writer has given everything to the sink
+        self.flush()
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def __len__(self):
+        self.wait()
+        return len(self.sink)
+
+    def close(self):
+        self.wait()
+        self.queue.put(None)
+        self.writer.join()
+        self.sink.close()
+
+    def __getattr__(self, name):
+        # The other attributes (emitted_objects, ...) are the ones of sink
+        return getattr(self.sink, name)
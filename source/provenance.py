@@ -0,0 +1,89 @@
+import re
+from dataclasses import replace
+from rdflib import URIRef
+
+'''
+How much provenance (has_position triples) the XES converters write.
+
+Every attribute value node is shared by all the events with that value, in
+full provenance it gets one has_position triple per event, which makes the
+positions a large part of the output. The converters take provenance= one of:
+
+    "full"    the position of every event and of every attribute value of every
+              event (Trace:i/Event:j/Attribute:k, 0/27/2/4 in the xpath converter)
+    "event"   the positions of the events (and of the trace objects), no
+              positions of the attribute values
+    "ranges"  the positions of the events, the positions of an attribute value
+              in consecutive events of a trace are run-length compressed into one
+              range: Trace:27/Event:3-7/Attribute:5, 0/27/3-7/4
+    "none"    no has_position triples, has_position is still declared
+
+A range with a single event is written as the full position, so expanding the
+ranges of a "ranges" output with expand_position gives the positions of the
+"full" one. The level is carried by the plan (with_provenance), like the
+selection, so that the shards of the workers use it too.
+'''
+
+PROVENANCE_LEVELS = ("full", "event", "ranges", "none")
+
+# The range of events of a position, the component before the last one
+_RANGE = re.compile(r'(\d+)-(\d+)(?=/[^/]*$)')
+
+
+def check_provenance(provenance):
+    # The errors of a provenance level, as the other checks of the converters
+    if not provenance in PROVENANCE_LEVELS:
+        return [f"provenance should be one of {', '.join(PROVENANCE_LEVELS)}, not {provenance!r}!"]
+    return []
+
+
+def with_provenance(plan, provenance):
+    return replace(plan, provenance=provenance)
+
+
+def range_position(prefix, start, end, suffix):
+    # The text of the position of the events start to end of a trace, prefix is
+    # what comes before the event number and suffix what comes after it
+    if end > start:
+        return f"{prefix}{start}-{end}{suffix}"
+    return f"{prefix}{start}{suffix}"
+
+
+def expand_position(position):
+    # The positions a has_position value stands for, itself when it is not a range
+    position = str(position)
+    match = _RANGE.search(position)
+    if match is None:
+        return [position]
+    start, end = int(match.group(1)), int(match.group(2))
+    return [f"{position[:match.start()]}{n}{position[match.end():]}" for n in range(start, end + 1)]
+
+
+class PositionRuns:
+    # Collects the positions of the attribute values and writes them to sink as
+    # ranges: the events of a run follow each other in the same trace with the
+    # same subject and suffix. The events must come in order.
+    def __init__(self, sink, predicate):
+        self.sink = sink
+        self.predicate = predicate
+        self.runs = {}
+
+    def add(self, subject, prefix, event, suffix):
+        key = (subject, prefix, suffix)
+        run = self.runs.get(key)
+        if run is not None and event == run[1] + 1:
+            run[1] = event
+            return
+        if run is not None:
+            self._write(key, run)
+        self.runs[key] = [event, event]
+
+    def _write(self, key, run):
+        subject, prefix, suffix = key
+        self.sink.add((subject, self.predicate, URIRef(range_position(prefix, run[0], run[1], suffix))))
+
+    def flush(self):
+        # Write the runs collected so far, at the end of a trace
+        for key, run in self.runs.items():
+            self._write(key, run)
+        self.runs = {}
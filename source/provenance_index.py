@@ -0,0 +1,222 @@
+import os
+import re
+import mmap
+import numpy as np
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+'''
+Byte offsets of the elements of an XES file, to find the element of a
+has_position value ('0/27/2/4') without parsing the whole log again.
+
+build_provenance_index writes a sidecar index next to the log (data.xes ->
+data.xes.positions.npy) with the start and end byte of the root, of every child
+of <log> (the traces, the extensions, the globals...) and of every child of
+these (the events and the attributes of the traces). It is a single int64 array:
+
+    header                  INDEX_VERSION, size and mtime_ns of the log, number of
+                            children of the log (n), number of their children (m),
+                            start and end of the root
+    log_start, log_end      n values each, the children of the log
+    child_first             n + 1 values, where the children of every child of the log start
+    child_start, child_end  m values each, the children of the children of the log
+
+ProvenanceIndex memory-maps the index and the log: the bytes of a trace or an
+event are two array lookups away, the attributes below an event are found by
+scanning the bytes of the event only.
+
+    with ProvenanceIndex("data.xes") as index:
+        print(index.raw("0/27/2/4").decode("utf-8"))
+
+The converter writes the index with provenance_index_path (see
+convert_xes_to_rdf_xpath_position). The index of a log changed since it was
+written is built again when it is opened. Compressed (.gz) logs have no index.
+'''
+
+INDEX_VERSION = 1
+_HEADER = 7
+
+# An opening tag, group 1 is "/" for an empty element. The attribute values can
+# hold ">" and "/", they are skipped whole.
+_TAG = re.compile(rb'<[^\s/>]+(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*\s*(/?)>')
+
+
+def default_index_path(xes_file_path):
+    return f"{xes_file_path}.positions.npy"
+
+
+def _position_path(position):
+    # [0, 27, 2, 4] for '0/27/2/4' or a has_position URI ending with it
+    text = str(position).rsplit("#", 1)[-1]
+    try:
+        return [int(part) for part in text.split("/")]
+    except ValueError:
+        raise KeyError(position)
+
+
+def _element_spans(data, max_depth, chunk_size=1 << 22):
+    # Yields (path, start, end) for every element of data (bytes or mmap) down
+    # to max_depth, with path the places of the element and its ancestors among
+    # their siblings, (0,) for the root, and data[start:end] the element. The
+    # elements come when they end, the children before their parent.
+    # The bytes are read as ISO-8859-1, one character per byte, the offsets are
+    # the same whatever the encoding of the file.
+    parser = expat.ParserCreate("ISO-8859-1")
+    path = []
+    counts = [0]
+    opened = []
+    spans = []
+
+    def start_element(name, attributes):
+        path.append(counts[-1])
+        counts[-1] += 1
+        counts.append(0)
+        if len(path) <= max_depth + 1:
+            begin = parser.CurrentByteIndex
+            tag = _TAG.match(data, begin)
+            opened.append((begin, tag.end() if tag.group(1) == b"/" else None))
+
+    def end_element(name):
+        if len(path) <= max_depth + 1:
+            begin, empty_end = opened.pop()
+            # The end of the closing tag, or of the opening tag of an empty element
+            finish = empty_end if empty_end is not None else data.find(b">", parser.CurrentByteIndex) + 1
+            spans.append((tuple(path), begin, finish))
+        path.pop()
+        counts.pop()
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    for offset in range(0, len(data), chunk_size):
+        parser.Parse(data[offset:offset + chunk_size], False)
+        yield from spans
+        spans.clear()
+    parser.Parse(b"", True)
+    yield from spans
+
+
+def build_provenance_index(xes_file_path, index_path=None):
+    # Write the index of the log to index_path (default_index_path when it is
+    # None or True) and return its path
+    if index_path is None or index_path is True:
+        index_path = default_index_path(xes_file_path)
+    stat = os.stat(xes_file_path)
+
+    root = (0, 0)
+    log_spans = []
+    child_first = [0]
+    child_spans = []
+    pending = []
+    with open(xes_file_path, 'rb') as xes_file, mmap.mmap(xes_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for path, start, end in _element_spans(data, 2):
+            if len(path) == 3:
+                pending.append((start, end))
+            elif len(path) == 2:
+                # The children of a child of the log all end before it
+                log_spans.append((start, end))
+                child_spans.extend(pending)
+                child_first.append(len(child_spans))
+                pending = []
+            else:
+                root = (start, end)
+
+    header = [INDEX_VERSION, stat.st_size, stat.st_mtime_ns, len(log_spans), len(child_spans), root[0], root[1]]
+    log_spans = np.array(log_spans, dtype=np.int64).reshape(-1, 2)
+    child_spans = np.array(child_spans, dtype=np.int64).reshape(-1, 2)
+    index = np.concatenate([
+        np.array(header, dtype=np.int64),
+        log_spans[:, 0], log_spans[:, 1],
+        np.array(child_first, dtype=np.int64),
+        child_spans[:, 0], child_spans[:, 1],
+    ])
+    directory = os.path.dirname(index_path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    # np.save adds .npy to a path without it, the index is written to a temporary file first
+    temporary_path = index_path + ".tmp.npy"
+    np.save(temporary_path, index)
+    os.replace(temporary_path, index_path)
+    return index_path
+
+
+class ProvenanceIndex:
+    # The elements of an XES file by position, from its index
+    def __init__(self, xes_file_path, index_path=None):
+        if index_path is None:
+            index_path = default_index_path(xes_file_path)
+        if not self._is_current(xes_file_path, index_path):
+            build_provenance_index(xes_file_path, index_path)
+        self.xes_file_path = xes_file_path
+        self.index = np.load(index_path, mmap_mode="r")
+        self.file = open(xes_file_path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = self.index[:_HEADER].tolist()
+        self.log_children = header[3]
+        self.child_count = header[4]
+        self.root = (header[5], header[6])
+        n = self.log_children
+        m = self.child_count
+        self.log_start = _HEADER
+        self.log_end = self.log_start + n
+        self.child_first = self.log_end + n
+        self.child_start = self.child_first + n + 1
+        self.child_end = self.child_start + m
+
+    @staticmethod
+    def _is_current(xes_file_path, index_path):
+        if not os.path.exists(index_path):
+            return False
+        header = np.load(index_path, mmap_mode="r")[:_HEADER].tolist()
+        stat = os.stat(xes_file_path)
+        return header[0] == INDEX_VERSION and header[1] == stat.st_size and header[2] == stat.st_mtime_ns
+
+    def span(self, position):
+        # (start, end) of the element at position in the log, KeyError if there is none
+        path = _position_path(position)
+        if path[0] != 0:
+            raise KeyError(position)
+        if len(path) == 1:
+            return self.root
+
+        index = self.index
+        child = path[1]
+        if child < 0 or child >= self.log_children:
+            raise KeyError(position)
+        if len(path) == 2:
+            return (int(index[self.log_start + child]), int(index[self.log_end + child]))
+
+        first = int(index[self.child_first + child])
+        place = path[2]
+        if place < 0 or first + place >= int(index[self.child_first + child + 1]):
+            raise KeyError(position)
+        start = int(index[self.child_start + first + place])
+        end = int(index[self.child_end + first + place])
+        if len(path) == 3:
+            return (start, end)
+
+        # Below the children of the traces, the bytes of the element are scanned
+        wanted = (0,) + tuple(path[3:])
+        for element_path, element_start, element_end in _element_spans(self.data[start:end], len(wanted) - 1):
+            if element_path == wanted:
+                return (start + element_start, start + element_end)
+        raise KeyError(position)
+
+    def raw(self, position):
+        # The bytes of the element at position, as they are in the file
+        start, end = self.span(position)
+        return self.data[start:end]
+
+    def element(self, position):
+        # The element at position, parsed on its own
+        return ET.fromstring(self.raw(position))
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,227 +1,219 @@
 import json
-import urllib.parse
-from rdflib import RDF, RDFS, URIRef, Graph
+import tempfile
+from rdflib import RDF, RDFS, OWL, URIRef
+from source.sinks import GraphSink, SqliteSink, resume_point, record_progress
+from source.descriptor_plan import compile_descriptors, base_triples
+from source.uri_cache import default_uri_cache
+from source.timestamps import default_timestamp_normalizer
+from source.oced_reader import iter_oced_json, iter_oced_jsonl, iter_oced_model
+from source.instrumentation import stage
+from source.pipeline import PipelineSink, pipelined
+from source.selection import load_selection, select_records
 import xml.etree.ElementTree as ET
-from dateutil.parser import parse
 
-def convert_OCED_to_rdf(oced_file_path, descriptors_file_path):
-
-    # Load OCED file
-    with open(oced_file_path, 'r') as json_file:
-        # Read the JSON data from the file
-        oced_model = json.load(json_file)
-
-    # Load descriptors file
-    with open(descriptors_file_path, 'r') as json_file:
-        # Read the JSON data from the file
-        descriptors = json.load(json_file)
-
-    file_name = descriptors["general_information_related_to_event_log"]["file_name"]
-    IRI = descriptors["general_information_related_to_event_log"]["IRI"]
+# Changed whenever the triples produced for the same input change, it is part of
+# the key of the result cache (see source/result_cache.py)
+CONVERTER_VERSION = 1
+
+
+def output_paths(file_name):
+    # The RDF/XML and Turtle files written by the default sink
+    return (f"generated_documents/OCED_{file_name}_to_rdf.rdf", f"generated_documents/OCED_{file_name}_to_owl.owl")
+
+
+def convert_OCED_to_rdf(oced_file_path, descriptors_file_path, sink=None, uri_cache=None, timestamp_normalizer=None, streaming=False, store=None, instrumentation=None, pipeline=False, selection=None):
+    # With streaming=True the OCED file is read record by record instead of being
+    # loaded at once, files ending with .jsonl are always read that way as JSON Lines
+    # (see source/oced_reader.py). Only the ids of the objects that do not exist are kept.
+    # With store set to the path of an SQLite database the graph is kept on disk
+    # (see SqliteSink in source/sinks.py) and a stopped conversion can be resumed.
+    # The triples are written to sink (see source/sinks.py), by default they are
+    # collected in a Graph and saved as RDF/XML and Turtle in generated_documents.
+    # The URIs of repeated values come from uri_cache (see source/uri_cache.py)
+    # and the timestamps are read by timestamp_normalizer (see source/timestamps.py).
+    # With instrumentation (see source/instrumentation.py) the stages are timed, the
+    # triples counted and the ConversionReport is returned.
+    # With pipeline=True the records are read as with streaming=True in a reader
+    # thread and the triples are handed to the sink in a writer thread, while the
+    # records are converted (see source/pipeline.py).
+    # With a selection (see source/selection.py) only the records of the selected
+    # object types, event attributes, relations and time range are converted, the
+    # others are dropped as they are read.
+    if uri_cache is None:
+        uri_cache = default_uri_cache
+    if timestamp_normalizer is None:
+        timestamp_normalizer = default_timestamp_normalizer
+    if instrumentation is not None:
+        instrumentation.begin("oced", oced_file_path)
+
+    # Load OCED file. Only a loaded model gives the records table by table, the
+    # records of a file read as a stream can come in any order
+    streamed = oced_file_path.endswith(".jsonl") or streaming or pipeline
+    if oced_file_path.endswith(".jsonl"):
+        records = iter_oced_jsonl(oced_file_path)
+    elif streaming or pipeline:
+        records = iter_oced_json(oced_file_path)
+    else:
+        with stage(instrumentation, "load_json"), open(oced_file_path, 'r') as json_file:
+            # Read the JSON data from the file
+            oced_model = json.load(json_file)
+        records = iter_oced_model(oced_model)
+    if selection is not None:
+        selection, errors = load_selection(selection)
+        if len(errors) > 0:
+            print(errors)
+            return
+        records = select_records(records, selection)
+    if pipeline:
+        records = pipelined(records)
+
+    # Load and compile the descriptors file, only its general information is needed
+    # (descriptors_file_path can also be a plan already compiled with compile_descriptors)
+    with stage(instrumentation, "compile_descriptors"):
+        plan, errors = compile_descriptors(descriptors_file_path, event_log=False)
+    if len(errors) > 0:
+        print(errors)
+        return
+
+    file_name = plan.file_name
+    ont_ns = plan.ont_ns
+    v = plan.vocabulary
 
     # Create an RDF graph
-    g = Graph()
+    if sink is None and store is not None:
+        sink = SqliteSink(store, *output_paths(file_name))
+    elif sink is None:
+        sink = GraphSink(*output_paths(file_name))
+    if pipeline:
+        sink = PipelineSink(sink)
+    g = sink
+    if instrumentation is not None:
+        g = instrumentation.count_triples(g, plan)
 
     # Define namespaces
-    ont_ns = f"{IRI}/ontology#"
-    owl_ns = "http://www.w3.org/2002/07/owl#"
-    rdf_ns = "http://www.w3.org/2000/01/rdf-schema#"
     g.bind("ont", ont_ns)
 
-    # Define classes
-    events_uri = URIRef(ont_ns + "events")
-    g.add((events_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_type_uri = URIRef(ont_ns + "event_type")
-    g.add((event_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_timestamp_uri = URIRef(ont_ns + "event_timestamp")
-    g.add((event_timestamp_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_attribute_name_uri = URIRef(ont_ns + "event_attribute_name")
-    g.add((event_attribute_name_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_attribute_value_uri = URIRef(ont_ns + "event_attribute_value")
-    g.add((event_attribute_value_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    objects_uri = URIRef(ont_ns + "objects")
-    g.add((objects_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_type_uri = URIRef(ont_ns + "object_type")
-    g.add((object_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_attribute_name_uri = URIRef(ont_ns + "object_attribute_name")
-    g.add((object_attribute_name_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_attribute_value_uri = URIRef(ont_ns + "object_attribute_value")
-    g.add((object_attribute_value_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_relation_type_uri = URIRef(ont_ns + "object_relation_type")
-    g.add((object_relation_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    involves_object_uri = URIRef(ont_ns + "relation_involves_object")
-    g.add((involves_object_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_attribute_name_uri = URIRef(ont_ns + "has_attribute_name")
-    g.add((has_attribute_name_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_attribute_value_uri = URIRef(ont_ns + "has_attribute_value")
-    g.add((has_attribute_value_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_event_type_uri = URIRef(ont_ns + "has_event_type")
-    g.add((has_event_type_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_timestamp_uri = URIRef(ont_ns + "has_timestamp")
-    g.add((has_timestamp_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_object_type_uri = URIRef(ont_ns + "has_object_type")
-    g.add((has_object_type_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_position_uri = URIRef(ont_ns + "has_position")
-    g.add((has_position_uri, RDF.type, URIRef(owl_ns + "DatatypeProperty")))
+    # Define classes and properties
+    for triple in base_triples(v):
+        g.add(triple)
 
 
     # Getting data from the OCED_Model
 
-    # EVENT TIME instances
-    key = "event_time"
-    timestamps = oced_model[key]
-
-    for timestamp in timestamps:
-        date_object = parse(timestamp["event_time"])
-        iso8601_timestamp = date_object.isoformat()
-        event_timestamp_instance_uri = URIRef(ont_ns + iso8601_timestamp)
-        g.add((event_timestamp_instance_uri, RDF.type, event_timestamp_uri))
-
-
-    # EVENT TYPE instances
-    key = "event_type"
-    event_types = oced_model[key]
-
-    for event_type in event_types:
-        event_type_instance_uri = URIRef(ont_ns + urllib.parse.quote(event_type["event_type"]))
-        g.add((event_type_instance_uri, RDF.type, event_type_uri))
-
-
-    # EVENT ATTRIBUTE NAMES instances
-    key = "event_attribute_name"
-    event_attribute_names = oced_model[key]
-
-    for event_attribute_name in event_attribute_names:
-        event_attribute_name_instance_uri = URIRef(ont_ns + event_attribute_name["event_attribute_name"])
-        g.add((event_attribute_name_instance_uri, RDF.type, event_attribute_name_uri))
-
-
-    # EVENTS instances
-    key = "event"
-    event_dict = oced_model[key]
-
-    for event in event_dict:
-        event_instance_uri = URIRef(ont_ns + event["event_id"])
-        g.add((event_instance_uri, RDF.type, events_uri))
-
-        g.add((event_instance_uri, has_event_type_uri, URIRef(ont_ns + urllib.parse.quote(event["event_type"]))))
-
-        date_object = parse(event["event_time"])
-        iso8601_timestamp = date_object.isoformat()
-        g.add((event_instance_uri, has_timestamp_uri, URIRef(ont_ns + iso8601_timestamp)))
-
-
-    # EVENT ATTRIBUTE VALUES instances  &&  connection to event
-    key = "event_attribute_value"
-    event_attribute_values = oced_model[key]
-
-    for event_attribute_value in event_attribute_values:
-        value_full_uri = ont_ns + urllib.parse.quote(str(event_attribute_value["event_attribute_value"]))
-        name_full_uri = ont_ns + urllib.parse.quote(str(event_attribute_value["event_attribute_name"]))
-        g.add((URIRef(value_full_uri), RDF.type, event_attribute_value_uri))
-        g.add((URIRef(value_full_uri), has_attribute_name_uri, URIRef(name_full_uri)))
-
-        g.add((URIRef(ont_ns + event_attribute_value["event_id"]), has_attribute_value_uri, URIRef(value_full_uri)))
-
-
-    # EVENT TYPE instances
-    key = "object_type"
-    object_types = oced_model[key]
-
-    for object_type in object_types:
-        object_type_instance_uri = URIRef(ont_ns + object_type["object_type"])
-        g.add((object_type_instance_uri, RDF.type, object_type_uri))
-
-
-    # OBJECT ATTRIBUTE NAMES instances
-    key = "object_attribute_name"
-    object_attribute_names = oced_model[key]
-
-    for object_attribute_name in object_attribute_names:
-        object_attribute_name_instance_uri = URIRef(ont_ns + object_attribute_name["object_attribute_name"])
-        g.add((object_attribute_name_instance_uri, RDF.type, object_attribute_name_uri))
-
-
-    # OBJECT RELATION TYPES instances 
-    key = "object_relation_type"
-    object_relation_types = oced_model[key]
-
-    for object_relation_type in object_relation_types:
-        object_relation_type_instance_uri = URIRef(ont_ns + object_relation_type["object_relation_type"])
-        g.add((object_relation_type_instance_uri, RDF.type, URIRef(owl_ns + "Class")))
-        g.add((object_relation_type_instance_uri, RDFS.subClassOf, object_relation_type_uri))
-
-    # OBJECTS instances
-    key = "object"
-    objects = oced_model[key]
-
-    notExistingObjects = {}
-
-    for _object in objects:
-        if _object["object_existency"]:
-            object_instance_uri = URIRef(ont_ns + _object["object_id"])
-            g.add((object_instance_uri, RDF.type, objects_uri))
-            g.add((object_instance_uri, has_object_type_uri, URIRef(ont_ns + urllib.parse.quote(_object["object_type"]))))
-        else: 
-            notExistingObjects[_object["object_id"]] = True
-
-
-    # OBJECT ATTRIBUTE VALUES instances
-    key = "object_attribute_value"
-    object_attribute_values = oced_model[key]
-
-    for object_attribute_value in object_attribute_values:
-        if not object_attribute_value["object_id"] in notExistingObjects and object_attribute_value["object_attribute_value_existency"] is not False:
-            value_full_uri = ont_ns + urllib.parse.quote(str(object_attribute_value["object_attribute_value"]))
-            name_full_uri = ont_ns + urllib.parse.quote(str(object_attribute_value["object_attribute_name"]))
-            g.add((URIRef(value_full_uri), RDF.type, object_attribute_value_uri))
-            g.add((URIRef(value_full_uri), has_attribute_name_uri, URIRef(name_full_uri)))
-
-            g.add((URIRef(ont_ns + object_attribute_value["object_id"]), has_attribute_value_uri, URIRef(value_full_uri)))
-
-
-    # OBJECTS instances
-    key = "object_relation"
-    object_relations = oced_model[key]
-
-    for object_relation in object_relations:
-        if object_relation["object_relation_existency"]:
-            object_relation_type_instance_uri = URIRef(ont_ns + object_relation["object_relation_type"])
-            object_relation_from_instance_uri = URIRef(ont_ns + object_relation["from_object_id"])
-            object_relation_to_instance_uri = URIRef(ont_ns + object_relation["to_object_id"])
-
-            g.add((object_relation_type_instance_uri, involves_object_uri, object_relation_from_instance_uri))
-            g.add((object_relation_type_instance_uri, involves_object_uri, object_relation_to_instance_uri))
-
-
-    # Create an ElementTree from the root
-    rdf_xml = g.serialize(format="xml")
-
-    rdf_file_path = f"generated_documents/OCED_{file_name}_to_rdf.rdf"
-    with open(rdf_file_path, "w", encoding="utf-8") as file:
-        file.write(rdf_xml)
-    print(f"RDF/XML content saved to {rdf_file_path}")
-
-    rdf_data = g.serialize(format="turtle")
-    # Serialize the graph to a file
-    with open(f"generated_documents/OCED_{file_name}_to_owl.owl", "w", encoding="utf-8") as f:
-        f.write(rdf_data)
-
-    print(f"OWL content saved to OCED_{file_name}_to_owl.owl")
- 
\ No newline at end of file
+    notExistingObjects = set()
+
+    def add_record(table, record):
+        # EVENT TIME instances
+        if table == "event_time":
+            iso8601_timestamp = timestamp_normalizer.isoformat(record["event_time"])
+            event_timestamp_instance_uri = uri_cache.uri(ont_ns, iso8601_timestamp)
+            g.add((event_timestamp_instance_uri, RDF.type, v.event_timestamp))
+
+        # EVENT TYPE instances
+        elif table == "event_type":
+            event_type_instance_uri = uri_cache.quoted(ont_ns, record["event_type"])
+            g.add((event_type_instance_uri, RDF.type, v.event_type))
+
+        # EVENT ATTRIBUTE NAMES instances
+        elif table == "event_attribute_name":
+            event_attribute_name_instance_uri = URIRef(ont_ns + record["event_attribute_name"])
+            g.add((event_attribute_name_instance_uri, RDF.type, v.event_attribute_name))
+
+        # EVENTS instances
+        elif table == "event":
+            event_instance_uri = URIRef(ont_ns + record["event_id"])
+            g.add((event_instance_uri, RDF.type, v.events))
+
+            g.add((event_instance_uri, v.has_event_type, uri_cache.quoted(ont_ns, record["event_type"])))
+
+            iso8601_timestamp = timestamp_normalizer.isoformat(record["event_time"])
+            g.add((event_instance_uri, v.has_timestamp, uri_cache.uri(ont_ns, iso8601_timestamp)))
+
+        # EVENT ATTRIBUTE VALUES instances  &&  connection to event
+        elif table == "event_attribute_value":
+            value_full_uri = uri_cache.quoted(ont_ns, record["event_attribute_value"])
+            name_full_uri = uri_cache.quoted(ont_ns, record["event_attribute_name"])
+            g.add((value_full_uri, RDF.type, v.event_attribute_value))
+            g.add((value_full_uri, v.has_attribute_name, name_full_uri))
+
+            g.add((URIRef(ont_ns + record["event_id"]), v.has_attribute_value, value_full_uri))
+
+        # OBJECT TYPE instances
+        elif table == "object_type":
+            object_type_instance_uri = URIRef(ont_ns + record["object_type"])
+            g.add((object_type_instance_uri, RDF.type, v.object_type))
+
+        # OBJECT ATTRIBUTE NAMES instances
+        elif table == "object_attribute_name":
+            object_attribute_name_instance_uri = URIRef(ont_ns + record["object_attribute_name"])
+            g.add((object_attribute_name_instance_uri, RDF.type, v.object_attribute_name))
+
+        # OBJECT RELATION TYPES instances
+        elif table == "object_relation_type":
+            object_relation_type_instance_uri = URIRef(ont_ns + record["object_relation_type"])
+            g.add((object_relation_type_instance_uri, RDF.type, OWL.Class))
+            g.add((object_relation_type_instance_uri, RDFS.subClassOf, v.object_relation_type))
+
+        # OBJECTS instances
+        elif table == "object":
+            if record["object_existency"]:
+                object_instance_uri = URIRef(ont_ns + record["object_id"])
+                g.add((object_instance_uri, RDF.type, v.objects))
+                g.add((object_instance_uri, v.has_object_type, uri_cache.quoted(ont_ns, record["object_type"])))
+            else:
+                notExistingObjects.add(record["object_id"])
+
+        # OBJECT ATTRIBUTE VALUES instances
+        elif table == "object_attribute_value":
+            if not record["object_id"] in notExistingObjects and record["object_attribute_value_existency"] is not False:
+                value_full_uri = uri_cache.quoted(ont_ns, record["object_attribute_value"])
+                name_full_uri = uri_cache.quoted(ont_ns, record["object_attribute_name"])
+                g.add((value_full_uri, RDF.type, v.object_attribute_value))
+                g.add((value_full_uri, v.has_attribute_name, name_full_uri))
+
+                g.add((uri_cache.uri(ont_ns, record["object_id"]), v.has_attribute_value, value_full_uri))
+
+        # OBJECT RELATIONS instances
+        elif table == "object_relation":
+            if record["object_relation_existency"]:
+                object_relation_type_instance_uri = uri_cache.uri(ont_ns, record["object_relation_type"])
+                object_relation_from_instance_uri = uri_cache.uri(ont_ns, record["from_object_id"])
+                object_relation_to_instance_uri = uri_cache.uri(ont_ns, record["to_object_id"])
+
+                g.add((object_relation_type_instance_uri, v.involves_object, object_relation_from_instance_uri))
+                g.add((object_relation_type_instance_uri, v.involves_object, object_relation_to_instance_uri))
+
+    # The object attribute values need the whole object table. A loaded model gives
+    # them after it, in a stream they are kept in a temporary file and converted
+    # after all the other records
+    # The records a resumed sink already has are skipped, only the objects that do not exist are read from them
+    with stage(instrumentation, "triples"):
+        waiting_values = None
+        done = resume_point(g, "records")
+        for n, (table, record) in enumerate(records):
+            if table == "object_attribute_value" and streamed:
+                if waiting_values is None:
+                    waiting_values = tempfile.TemporaryFile("w+", encoding="utf-8")
+                waiting_values.write(json.dumps(record) + "\n")
+            elif n >= done:
+                add_record(table, record)
+                record_progress(g, "records", n + 1)
+            elif table == "object" and not record["object_existency"]:
+                notExistingObjects.add(record["object_id"])
+
+        if waiting_values is not None:
+            waiting_values.seek(0)
+            for line in waiting_values:
+                add_record("object_attribute_value", json.loads(line))
+            waiting_values.close()
+
+
+    # Write the outputs
+    with stage(instrumentation, "write"):
+        g.close()
+
+    print(f"URI cache: {uri_cache.stats()}")
+    print(f"Timestamps: {timestamp_normalizer.stats()}")
+
+    if instrumentation is not None:
+        return instrumentation.finish(uri_cache=uri_cache, timestamps=timestamp_normalizer)
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import importlib
+from source.descriptor_plan import DescriptorPlan, compile_descriptors
+from source.instrumentation import stage
+from source.provenance_index import build_provenance_index
+from source.selection import load_selection
+
+'''
+A cache of conversion results in front of the converters.
+
+The key of a result is a hash of the content of the input file, of the
+descriptors, of the converter version (CONVERTER_VERSION of its module) and of
+the options that change the output (KEY_OPTIONS). The engines, the workers, the
+pipeline, the store and the caches give the same files, they are left out. A
+result is the set of output files the converter's default sink wrote in
+generated_documents. On a hit they are copied back from the cache directory and
+nothing is parsed.
+
+The files are hashed in chunks with BLAKE2b. The digest of a file is kept with
+its size and modification time, so a file that did not change is not read again.
+The cache directory is bounded to max_bytes, the least recently used results
+are evicted first.
+'''
+
+# Module and function of every converter, the modules are imported when they are used
+CONVERTERS = {
+    "manual": ("source.manual_solution", "convert_xes_to_rdf_manual_position"),
+    "xpath": ("source.xpath_solution", "convert_xes_to_rdf_xpath_position"),
+    "oced": ("source.read_from_OCED", "convert_OCED_to_rdf"),
+}
+
+# The options that change the output of a converter, with their default value
+KEY_OPTIONS = {"selection": None, "provenance": "full"}
+
+
+class ResultCache:
+    def __init__(self, cache_dir="generated_documents/.cache", max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.digests_path = os.path.join(cache_dir, "digests.json")
+        self.digests = None
+        self.hits = 0
+        self.misses = 0
+
+    def file_digest(self, path, chunk_size=1 << 20):
+        # Streaming hash of a file, reused while its size and modification time do not change
+        if self.digests is None:
+            self.digests = {}
+            if os.path.exists(self.digests_path):
+                with open(self.digests_path, 'r') as digests_file:
+                    self.digests = json.load(digests_file)
+
+        stat = os.stat(path)
+        known = self.digests.get(os.path.abspath(path))
+        if known is not None and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["digest"]
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        self.digests[os.path.abspath(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest.hexdigest()}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _write_json(self.digests_path, self.digests)
+        return digest.hexdigest()
+
+    def key(self, converter, input_path, descriptors, options):
+        key = hashlib.blake2b(digest_size=20)
+        module = importlib.import_module(CONVERTERS[converter][0])
+        key.update(f"{converter}:{module.CONVERTER_VERSION}\n".encode())
+        key.update(self.file_digest(input_path).encode())
+        if isinstance(descriptors, DescriptorPlan):
+            key.update(repr(descriptors).encode())
+        else:
+            key.update(self.file_digest(descriptors).encode())
+        key.update(repr([(name, options.get(name, default)) for name, default in sorted(KEY_OPTIONS.items())]).encode())
+        return key.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def restore(self, key, output_paths):
+        # Copy the cached outputs back, False if the result is not in the cache
+        entry_dir = self._entry_dir(key)
+        entry_path = os.path.join(entry_dir, "entry.json")
+        if not os.path.exists(entry_path):
+            self.misses += 1
+            return False
+
+        with open(entry_path, 'r') as entry_file:
+            entry = json.load(entry_file)
+        for output_path in output_paths:
+            if not os.path.basename(output_path) in entry["files"]:
+                self.misses += 1
+                return False
+        for output_path in output_paths:
+            shutil.copyfile(os.path.join(entry_dir, os.path.basename(output_path)), output_path)
+
+        entry["last_used"] = time.time()
+        _write_json(entry_path, entry)
+        self.hits += 1
+        return True
+
+    def save(self, key, output_paths):
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        size = 0
+        for output_path in output_paths:
+            shutil.copyfile(output_path, os.path.join(entry_dir, os.path.basename(output_path)))
+            size += os.path.getsize(output_path)
+        # entry.json is written last, an entry without it is not complete
+        _write_json(os.path.join(entry_dir, "entry.json"), {
+            "files": [os.path.basename(output_path) for output_path in output_paths],
+            "size": size,
+            "last_used": time.time(),
+        })
+        self.evict()
+
+    def entries(self):
+        # (last_used, size, key) of every complete entry
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for key in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self.cache_dir, key, "entry.json")
+            if os.path.exists(entry_path):
+                with open(entry_path, 'r') as entry_file:
+                    entry = json.load(entry_file)
+                entries.append((entry["last_used"], entry["size"], key))
+        return entries
+
+    def evict(self):
+        # Remove the least recently used entries until the cache fits in max_bytes
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _write_json(path, data):
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'w') as json_file:
+        json.dump(data, json_file)
+    os.replace(temporary_path, path)
+
+
+default_result_cache = ResultCache()
+
+
+def cached_conversion(converter, input_path, descriptors, force=False, result_cache=None, **options):
+    # Run the converter ("manual", "xpath" or "oced") unless the cache has its result.
+    # force=True converts again and replaces the cached result. Conversions with their
+    # own sink or a checkpoint do not write the default outputs and are not cached.
+    # With instrumentation (see source/instrumentation.py) the ConversionReport of the
+    # conversion is returned, on a hit its only stage is the restore of the outputs.
+    if result_cache is None:
+        result_cache = default_result_cache
+    module_name, function_name = CONVERTERS[converter]
+    module = importlib.import_module(module_name)
+    convert = getattr(module, function_name)
+
+    if options.get("sink") is not None or options.get("checkpoint") is not None:
+        return convert(input_path, descriptors, **options)
+
+    plan, errors = compile_descriptors(descriptors, event_log=converter != "oced")
+    if len(errors) == 0 and options.get("selection") is not None:
+        # The key has the selection itself, not the path of its file
+        selection, errors = load_selection(options["selection"])
+        options["selection"] = selection
+    if len(errors) > 0:
+        print(errors)
+        return
+    output_paths = module.output_paths(plan.file_name)
+
+    instrumentation = options.pop("instrumentation", None)
+    provenance_index_path = options.get("provenance_index_path")
+    key = result_cache.key(converter, input_path, descriptors, options)
+    if not force:
+        if instrumentation is not None:
+            instrumentation.begin(converter, input_path)
+        with stage(instrumentation, "restore_cached"):
+            restored = result_cache.restore(key, output_paths)
+        if restored:
+            print(f"Reused the cached {converter} conversion of {input_path}: {', '.join(output_paths)}")
+            if provenance_index_path is not None:
+                print(f"Provenance index saved to {build_provenance_index(input_path, provenance_index_path)}")
+            if instrumentation is not None:
+                return instrumentation.finish(result_cache=result_cache)
+            return
+
+    # Only outputs written by this conversion are cached, not older ones left by a failed one
+    started = time.time()
+    report = convert(input_path, plan, instrumentation=instrumentation, **options)
+    if all(os.path.exists(output_path) and os.path.getmtime(output_path) >= started - 1 for output_path in output_paths):
+        result_cache.save(key, output_paths)
+    if report is not None:
+        report.caches["result_cache"] = result_cache.stats()
+    return report
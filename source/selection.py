@@ -0,0 +1,203 @@
+import json
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from source.timestamps import parse_timestamp
+
+'''
+Selective conversion: only a slice of the graph is produced.
+
+A selection spec names what to keep, every part of it is optional and a
+missing part keeps everything:
+
+    {
+        "object_types": ["Product", "Incident"],
+        "event_attributes": ["Status", "Impact"],
+        "relations": ["has_product", "is_part_of_case", "WORKS_FOR"],
+        "time_range": {"start": "2012-01-01T00:00:00+00:00", "end": "2012-02-01T00:00:00+00:00"}
+    }
+
+The names are the ones of the descriptor file (object_type, event_attribute_name,
+event_relation_type and object_relation_type) and of the OCED tables. The time
+range keeps the events with start <= time:timestamp < end, a bound can be left
+out and a timestamp without offset is in UTC.
+
+All the converters take selection= the spec, the path of a JSON file with it or
+a Selection. The filters are applied where the data is read: the XES converters
+narrow their plan with select_plan, so the columns and attribute elements the
+selection leaves out are never read or decoded, and the events out of the time
+range are skipped by the readers (EventFilter) before their attributes are
+turned into values and URIs. The OCED converter drops the records out of the
+selection as they are read (select_records). The skipped events keep their
+place in the numbering of the events and positions, the triples of a selective
+conversion are a part of the ones of the whole conversion.
+'''
+
+_SPEC_KEYS = ("object_types", "event_attributes", "relations", "time_range")
+
+
+@dataclass(frozen=True, slots=True)
+class Selection:
+    # The names are sorted tuples, None keeps everything
+    object_types: tuple = None
+    event_attributes: tuple = None
+    relations: tuple = None
+    start: datetime = None
+    end: datetime = None
+
+    def keeps_object_type(self, object_type):
+        return self.object_types is None or object_type in self.object_types
+
+    def keeps_event_attribute(self, name):
+        return self.event_attributes is None or name in self.event_attributes
+
+    def keeps_relation(self, name):
+        return self.relations is None or name in self.relations
+
+    @property
+    def has_time_range(self):
+        return self.start is not None or self.end is not None
+
+    def keeps_time(self, timestamp):
+        # timestamp is a datetime (or pandas Timestamp) or the text of one
+        if not self.has_time_range:
+            return True
+        if isinstance(timestamp, str):
+            timestamp = parse_timestamp(timestamp)
+        timestamp = _aware(timestamp)
+        return (self.start is None or timestamp >= self.start) and (self.end is None or timestamp < self.end)
+
+
+def _aware(timestamp):
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def load_selection(spec):
+    # Returns (selection, errors) for a spec dict, the path of a JSON file with
+    # one or a Selection. selection is None when errors is not empty.
+    if isinstance(spec, Selection):
+        return spec, []
+    if isinstance(spec, (str, bytes)) or hasattr(spec, "__fspath__"):
+        with open(spec, 'r') as json_file:
+            spec = json.load(json_file)
+
+    errors = []
+    if not isinstance(spec, dict):
+        return None, ["The selection should be an object!"]
+    for key in spec:
+        if not key in _SPEC_KEYS:
+            errors.append(f"{key} is not part of a selection, it can have {', '.join(_SPEC_KEYS)}!")
+
+    names = {}
+    for key in ("object_types", "event_attributes", "relations"):
+        value = spec.get(key)
+        if value is None:
+            names[key] = None
+        elif not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+            errors.append(f"{key} should be an array of names!")
+        else:
+            names[key] = tuple(sorted(set(value)))
+
+    bounds = {"start": None, "end": None}
+    time_range = spec.get("time_range")
+    if time_range is not None:
+        if not isinstance(time_range, dict):
+            errors.append("time_range should be an object with a start and/or an end!")
+        else:
+            for bound in bounds:
+                if time_range.get(bound) is None:
+                    continue
+                try:
+                    bounds[bound] = _aware(parse_timestamp(time_range[bound]))
+                except (ValueError, TypeError, OverflowError):
+                    errors.append(f"The {bound} of time_range, {time_range[bound]!r}, is not a timestamp!")
+            if bounds["start"] is not None and bounds["end"] is not None and bounds["start"] >= bounds["end"]:
+                errors.append("The start of time_range should be before its end!")
+
+    if len(errors) > 0:
+        return None, errors
+    return Selection(names["object_types"], names["event_attributes"], names["relations"], bounds["start"], bounds["end"]), []
+
+
+def select_plan(plan, selection):
+    # The plan narrowed to the selection: the objects of the selected types, the
+    # selected event attributes and the selected relations between selected objects.
+    # The trace object stays the same, the traces are still identified by it.
+    ont_ns = plan.ont_ns
+    objects = tuple(obj for obj in plan.objects if selection.keeps_object_type(obj.object_type))
+    indexes = {plan.objects.index(obj): i for i, obj in enumerate(objects)}
+
+    event_relations = tuple(
+        replace(relation, related_index=indexes[relation.related_index])
+        for relation in plan.event_relations
+        if relation.related_index in indexes and selection.keeps_relation(relation.predicate[len(ont_ns):])
+    )
+    object_relations = tuple(
+        replace(relation, object_index=indexes[relation.object_index], related_index=indexes[relation.related_index])
+        for relation in plan.object_relations
+        if relation.object_index in indexes and relation.related_index in indexes
+        and selection.keeps_relation(relation.relation_type_uri[len(ont_ns):])
+    )
+    event_attributes = tuple(attribute for attribute in plan.event_attributes if selection.keeps_event_attribute(attribute.name))
+    return replace(plan, objects=objects, event_attributes=event_attributes, event_relations=event_relations, object_relations=object_relations)
+
+
+class EventFilter:
+    # What the XES readers keep of the events: the attributes with a key in keys
+    # (all of them with keys None), and only the events with a timestamp_key
+    # attribute in the time range of selection
+    def __init__(self, selection, keys=None, timestamp_key=None):
+        self.selection = selection
+        self.keys = frozenset(keys) if keys is not None else None
+        self.timestamp_key = timestamp_key if selection.has_time_range else None
+
+    def keeps_key(self, key):
+        return self.keys is None or key in self.keys
+
+    def keeps_time(self, value):
+        # value is the timestamp_key value of an event, None when it has none
+        return self.timestamp_key is None or (value is not None and self.selection.keeps_time(value))
+
+
+def select_records(records, selection):
+    # The (table, record) pairs of an OCED stream in the selection (see
+    # source/oced_reader.py). The objects, their attribute values and relations
+    # go with the object types, the event attribute values with the events and
+    # the event attribute names. As in the OCED files, the objects and events
+    # come before their attribute values and relations.
+    kept_objects = set()
+    kept_events = set()
+    for table, record in records:
+        if table in ("event_time", "event"):
+            if not selection.keeps_time(record["event_time"]):
+                continue
+            if table == "event":
+                kept_events.add(record["event_id"])
+        elif table == "event_attribute_name":
+            if not selection.keeps_event_attribute(record["event_attribute_name"]):
+                continue
+        elif table == "event_attribute_value":
+            if not selection.keeps_event_attribute(record["event_attribute_name"]):
+                continue
+            if selection.has_time_range and not record["event_id"] in kept_events:
+                continue
+        elif table == "object_type":
+            if not selection.keeps_object_type(record["object_type"]):
+                continue
+        elif table == "object":
+            if not selection.keeps_object_type(record["object_type"]):
+                continue
+            kept_objects.add(record["object_id"])
+        elif table == "object_attribute_value":
+            if selection.object_types is not None and not record["object_id"] in kept_objects:
+                continue
+        elif table == "object_relation_type":
+            if not selection.keeps_relation(record["object_relation_type"]):
+                continue
+        elif table == "object_relation":
+            if not selection.keeps_relation(record["object_relation_type"]):
+                continue
+            if selection.object_types is not None and not (record["from_object_id"] in kept_objects and record["to_object_id"] in kept_objects):
+                continue
+        yield table, record
@@ -0,0 +1,360 @@
+import io
+import os
+import re
+import sys
+import json
+import stat
+import socket
+import asyncio
+import threading
+import tempfile
+import http.client
+import urllib.parse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from source.descriptor_plan import compile_descriptors
+from source.instrumentation import Instrumentation
+from source.sinks import StreamingSink
+from source.uri_cache import default_uri_cache
+from source.timestamps import default_timestamp_normalizer
+from source.manual_solution import convert_xes_to_rdf_manual_position
+from source.xpath_solution import convert_xes_to_rdf_xpath_position
+from source.read_from_OCED import convert_OCED_to_rdf
+
+'''
+Long-running local conversion service.
+
+Every run of index.py pays for the start of Python, the imports of rdflib and
+the converters and the compilation of the descriptors, which is most of the
+time of a small extract. ConversionService does this once: it compiles the
+descriptors when it starts and keeps the URI and timestamp caches warm between
+requests. It speaks HTTP/1.1 with keep-alive on a localhost port or on a Unix
+socket, with asyncio:
+
+    POST /xes?format=nt       an XES log, or XES fragments: <trace> elements
+                              without <log> around them
+    POST /oced?format=turtle  an OCED JSON document
+    GET /health               the number of requests and the stats of the caches
+
+format is nt (N-Triples, the default) or turtle, /xes also takes
+converter=xpath (the default) or manual and provenance (see
+source/provenance.py). The response is the triples, the X-Triples and
+X-Conversion-Seconds headers give their number and the time of the conversion.
+A payload the converter rejects gets a 422 with what the converter printed.
+
+The conversions run on an executor with a single worker thread: they are
+serialized, so that the caches are never used by two of them at once, and only
+the reading and answering of the requests is concurrent. A payload is written to a spool file for the converter, which reads
+logs from files. The converters print their errors: while the service runs,
+sys.stdout is replaced by an object that keeps what the conversion thread
+prints for the response and passes what the other threads print to the real
+stdout.
+
+    python service.py descriptors.json 8765
+    python service.py descriptors.json /tmp/conversion.sock
+
+ServiceClient sends the requests of Python code (and of
+benchmarks/service_benchmark.py) over one kept-alive connection.
+'''
+
+DEFAULT_PORT = 8765
+
+MEDIA_TYPES = {"nt": "application/n-triples", "turtle": "text/turtle"}
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+# An XML declaration at the start of a fragment, it cannot be inside the <log> put around it
+_DECLARATION = re.compile(rb'^\s*<\?xml[^>]*\?>')
+
+
+class ServiceError(Exception):
+    # An error answered with status to the client
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class _ThreadOutput:
+    # Stands for sys.stdout: what a thread prints while it is capturing goes to
+    # its capture, everything else to stdout
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.captures = {}
+
+    @contextmanager
+    def capture(self):
+        # What this thread prints in the with block, as an io.StringIO
+        printed = io.StringIO()
+        self.captures[threading.get_ident()] = printed
+        try:
+            yield printed
+        finally:
+            del self.captures[threading.get_ident()]
+
+    def write(self, text):
+        printed = self.captures.get(threading.get_ident())
+        if printed is None:
+            return self.stdout.write(text)
+        return printed.write(text)
+
+    def flush(self):
+        self.stdout.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stdout, name)
+
+
+def _xes_document(payload):
+    # The payload as an XES log, fragments are put in a <log>
+    if re.search(rb'<(?:[\w.-]+:)?log[\s>/]', payload[:4096]) is not None:
+        return payload
+    return b'<log xes.version="1.0">' + _DECLARATION.sub(b"", payload, count=1) + b'</log>'
+
+
+async def _discard(reader, length, chunk_size=1 << 16):
+    while length > 0:
+        chunk = await reader.read(min(length, chunk_size))
+        if chunk == b"":
+            break
+        length -= len(chunk)
+
+
+class ConversionService:
+    def __init__(self, descriptors_file_path, max_body_bytes=64 << 20, spool_dir=None):
+        # The plans of the XES converters and of the OCED converter, compiled once
+        self.plans = {}
+        for kind, event_log in (("xes", True), ("oced", False)):
+            plan, errors = compile_descriptors(descriptors_file_path, event_log=event_log)
+            if len(errors) > 0:
+                raise ValueError(f"The descriptors {descriptors_file_path} cannot be used: {errors}")
+            self.plans[kind] = plan
+        self.max_body_bytes = max_body_bytes
+        self.spool = tempfile.TemporaryDirectory(dir=spool_dir, prefix="conversion-service-")
+        # One conversion at a time, the caches are not shared between threads
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversion")
+        self.requests = 0
+        self.conversions = 0
+        self.failures = 0
+        self.server = None
+        # The _ThreadOutput installed as sys.stdout by the conversions, until close
+        self.output = None
+
+    def convert(self, kind, payload, format="nt", converter="xpath", provenance="full"):
+        # Runs in the conversion thread, returns (triples text, number of triples, seconds)
+        if not format in MEDIA_TYPES:
+            raise ServiceError(400, f"format should be one of {', '.join(MEDIA_TYPES)}, not {format!r}!")
+        if kind == "xes" and not converter in ("xpath", "manual"):
+            raise ServiceError(400, f"converter should be xpath or manual, not {converter!r}!")
+
+        if not isinstance(sys.stdout, _ThreadOutput):
+            sys.stdout = _ThreadOutput(sys.stdout)
+        self.output = sys.stdout
+        suffix = ".xes" if kind == "xes" else ".json"
+        spool_fd, spool_path = tempfile.mkstemp(suffix=suffix, dir=self.spool.name)
+        output = io.StringIO()
+        try:
+            with os.fdopen(spool_fd, 'wb') as spool_file:
+                spool_file.write(_xes_document(payload) if kind == "xes" else payload)
+            sink = StreamingSink(output, format)
+            plan = self.plans[kind]
+            with self.output.capture() as printed:
+                instrumentation = Instrumentation()
+                if kind == "oced":
+                    report = convert_OCED_to_rdf(spool_path, plan, sink=sink, instrumentation=instrumentation)
+                elif converter == "manual":
+                    report = convert_xes_to_rdf_manual_position(spool_path, plan, sink=sink, instrumentation=instrumentation, xes_cache=False, provenance=provenance)
+                else:
+                    report = convert_xes_to_rdf_xpath_position(spool_path, plan, sink=sink, instrumentation=instrumentation, streaming=True, provenance=provenance)
+        except ServiceError:
+            raise
+        except Exception as error:
+            raise ServiceError(422, f"{type(error).__name__}: {error}")
+        finally:
+            os.remove(spool_path)
+        if report is None:
+            # The converter printed its errors and stopped
+            raise ServiceError(422, printed.getvalue().strip())
+        return output.getvalue(), len(sink), report.seconds
+
+    def health(self):
+        return {
+            "status": "ok",
+            "requests": self.requests,
+            "conversions": self.conversions,
+            "failures": self.failures,
+            "uri_cache": default_uri_cache.stats(),
+            "timestamps": default_timestamp_normalizer.stats(),
+        }
+
+    async def dispatch(self, method, target, body):
+        # (status, content type, body, extra headers) of a request
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        if url.path == "/health":
+            return 200, "application/json", json.dumps(self.health()).encode(), {}
+        if not url.path in ("/xes", "/oced"):
+            raise ServiceError(404, f"There is no {url.path}, the paths are /xes, /oced and /health!")
+        if method != "POST":
+            raise ServiceError(405, f"Send the payload to {url.path} with POST!")
+
+        kind = url.path[1:]
+        format = query.pop("format", "nt")
+        options = {key: query[key] for key in ("converter", "provenance") if key in query and kind == "xes"}
+        loop = asyncio.get_running_loop()
+        self.conversions += 1
+        try:
+            triples, count, seconds = await loop.run_in_executor(self.executor, lambda: self.convert(kind, body, format, **options))
+        except ServiceError:
+            self.failures += 1
+            raise
+        headers = {"X-Triples": str(count), "X-Conversion-Seconds": str(seconds)}
+        return 200, f"{MEDIA_TYPES[format]}; charset=utf-8", triples.encode("utf-8"), headers
+
+    async def handle_connection(self, reader, writer):
+        # The requests of a connection, one after the other while it is kept alive
+        try:
+            while True:
+                request_line = await reader.readline()
+                if request_line.strip() == b"":
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                self.requests += 1
+
+                keep_alive = len(parts) == 3 and parts[2] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    if len(parts) != 3:
+                        raise ServiceError(400, "The request line should be: METHOD path HTTP/1.1")
+                    length = int(headers.get("content-length", "0"))
+                    if length > self.max_body_bytes:
+                        # The body is read and dropped, a client still sending it
+                        # would get a broken pipe instead of the answer
+                        keep_alive = False
+                        await _discard(reader, length)
+                        raise ServiceError(413, f"The payload is bigger than {self.max_body_bytes} bytes!")
+                    body = await reader.readexactly(length)
+                    status, content_type, payload, extra = await self.dispatch(parts[0], parts[1], body)
+                except ServiceError as error:
+                    status, content_type, payload, extra = error.status, "text/plain; charset=utf-8", str(error).encode("utf-8"), {}
+                except ValueError:
+                    keep_alive = False
+                    status, content_type, payload, extra = 400, "text/plain; charset=utf-8", b"Content-Length should be a number!", {}
+
+                head = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}", f"Content-Type: {content_type}", f"Content-Length: {len(payload)}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                head.append("Connection: keep-alive" if keep_alive else "Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None):
+        # Listen on unix_socket when it is given, otherwise on host:port. The
+        # socket left by an earlier service is replaced, any other file is kept.
+        if unix_socket is not None:
+            if os.path.exists(unix_socket):
+                if not stat.S_ISSOCK(os.stat(unix_socket).st_mode):
+                    raise FileExistsError(f"{unix_socket} exists and is not a socket, the service cannot listen on it!")
+                os.remove(unix_socket)
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            print(f"Conversion service listening on {unix_socket}")
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Conversion service listening on http://{host}:{port}")
+        return self.server
+
+    async def serve_forever(self, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None):
+        await self.start(host, port, unix_socket)
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.close()
+            if unix_socket is not None and os.path.exists(unix_socket):
+                os.remove(unix_socket)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.spool.cleanup()
+        if self.output is not None and sys.stdout is self.output and len(self.output.captures) == 0:
+            sys.stdout = self.output.stdout
+        self.output = None
+
+
+def serve(descriptors_file_path, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None):
+    # Run the service until it is interrupted
+    service = ConversionService(descriptors_file_path)
+    try:
+        asyncio.run(service.serve_forever(host, port, unix_socket))
+    except KeyboardInterrupt:
+        pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, unix_socket, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_socket = unix_socket
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_socket)
+
+
+class ServiceClient:
+    # Sends the requests to a running service over a kept-alive connection
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None, timeout=60):
+        if unix_socket is not None:
+            self.connection = _UnixHTTPConnection(unix_socket, timeout)
+        else:
+            self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        # The headers of the last response (X-Triples, X-Conversion-Seconds)
+        self.last_headers = {}
+
+    def _request(self, method, path, body=None):
+        self.connection.request(method, path, body=body)
+        response = self.connection.getresponse()
+        content = response.read()
+        self.last_headers = dict(response.getheaders())
+        if response.status != 200:
+            raise RuntimeError(f"{response.status} {response.reason}: {content.decode('utf-8', 'replace')}")
+        return content
+
+    def convert_xes(self, payload, format="nt", **parameters):
+        # The triples of an XES log or fragment (bytes or str), parameters are
+        # converter and provenance
+        return self._convert("/xes", payload, format, parameters)
+
+    def convert_oced(self, payload, format="nt"):
+        # The triples of an OCED JSON document (bytes, str or the decoded document)
+        if not isinstance(payload, (bytes, str)):
+            payload = json.dumps(payload)
+        return self._convert("/oced", payload, format, {})
+
+    def _convert(self, path, payload, format, parameters):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        query = urllib.parse.urlencode({"format": format, **parameters})
+        return self._request("POST", f"{path}?{query}", payload).decode("utf-8")
+
+    def health(self):
+        return json.loads(self._request("GET", "/health"))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,517 @@
+import os
+import re
+import sqlite3
+import hashlib
+import queue
+import threading
+import multiprocessing
+from xml.sax.saxutils import escape, quoteattr
+from rdflib import RDF, RDFS, OWL, XSD, URIRef, BNode, Literal, Graph
+from rdflib.namespace import split_uri
+from rdflib.util import from_n3
+
+'''
+Sinks receive the triples produced by the converters.
+Every sink has the same small interface as the part of rdflib's Graph the
+converters use:
+
+    sink.bind(prefix, namespace)
+    sink.add((subject, predicate, object))
+    sink.close()
+
+GraphSink keeps the previous behaviour: all the triples are collected in an
+rdflib Graph that is saved as RDF/XML and Turtle at the end.
+StreamingSink writes every triple as soon as it is produced, so nothing but a
+set of 16 byte digests of the triples is kept in memory.
+SqliteSink keeps the triples in an SQLite database on disk instead of memory
+and writes the same RDF/XML and Turtle files from it.
+
+Sinks that can resume a conversion after a crash (SqliteSink) also have
+
+    sink.progress(name)
+    sink.set_progress(name, value)
+
+the converters use them through resume_point and record_progress to skip the
+traces, rows, records or shards that are already in the sink.
+
+Sinks can also take a batch of triples with the same predicate as two columns
+of URIs (add_columns), the columnar engine of the manual converter gives them
+its URI columns this way. add_columns(sink, ...) gives them one by one to the
+sinks without it.
+'''
+
+STANDARD_PREFIXES = {"rdf": str(RDF), "rdfs": str(RDFS), "owl": str(OWL), "xsd": str(XSD)}
+
+# Looked up in a set rather than compared with ==, which is slow for rdflib terms
+_TYPE_PREDICATES = {RDF.type}
+_OBJECT_PROPERTIES = {OWL.ObjectProperty}
+
+class GraphSink:
+    # The graph is walked once when the sink is closed and every triple is given
+    # to an RDF/XML writer and a Turtle writer that stream to their files.
+    # parallel can be None, "threads" or "processes" to run the two writers
+    # next to the walk of the graph.
+    # The triples are added to the graph in batches of batch_size with addN.
+    # The converters declare a value, object or relation again (its rdf:type,
+    # attribute name, ...) for every event that has it. These repeated triples
+    # are dropped by their terms before they reach the graph: the rdf:type
+    # triples, and for the subjects whose rdf:type came again the triples of the
+    # properties the schema declares as owl:ObjectProperty (involves_object,
+    # has_attribute_name, has_attribute_value, has_object_type, ...). The other
+    # triples, has_position and the triples of the events, are not kept, the
+    # graph takes care of the few duplicates left. batch_size=0 adds every triple
+    # with Graph.add as it comes.
+    def __init__(self, rdf_file_path, owl_file_path, parallel=None, batch_size=10000):
+        if parallel not in (None, "threads", "processes"):
+            raise ValueError(f"Unknown parallel mode {parallel}, it should be threads or processes!")
+        self.graph = Graph()
+        self.rdf_file_path = rdf_file_path
+        self.owl_file_path = owl_file_path
+        self.parallel = parallel
+        self.prefixes = {}
+        self.predicates = set()
+        self.batch_size = batch_size
+        self.batch = []
+        # The (subject, class) of the rdf:type triples already added, the
+        # subjects declared more than once, the declaration properties and the
+        # triples of these properties added for the subjects
+        self.types = set() if batch_size > 0 else None
+        self.shared = set()
+        self.declarations = set()
+        self.shared_triples = set()
+
+    def bind(self, prefix, namespace):
+        self.graph.bind(prefix, namespace)
+        self.prefixes[prefix] = str(namespace)
+
+    def add(self, triple):
+        if self.types is None:
+            self.graph.add(triple)
+            self.predicates.add(triple[1])
+            return
+
+        if triple[1] in _TYPE_PREDICATES:
+            declaration = (triple[0], triple[2])
+            if declaration in self.types:
+                self.shared.add(triple[0])
+                return
+            self.types.add(declaration)
+            if triple[2] in _OBJECT_PROPERTIES:
+                self.declarations.add(triple[0])
+        elif triple[1] in self.declarations and triple[0] in self.shared:
+            if triple in self.shared_triples:
+                return
+            self.shared_triples.add(triple)
+        self.batch.append(triple)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Add the waiting triples to the graph
+        if len(self.batch) == 0:
+            return
+        graph = self.graph
+        graph.addN((subject, predicate, obj, graph) for subject, predicate, obj in self.batch)
+        self.predicates.update(triple[1] for triple in self.batch)
+        self.batch = []
+
+    def add_columns(self, subjects, predicate, objects, unique=False):
+        if not unique:
+            for subject, obj in zip(subjects, objects):
+                self.add((_as_uri(subject), predicate, _as_uri(obj)))
+            return
+        # The graph gets them at once, they are not kept in types
+        self.flush()
+        graph = self.graph
+        graph.addN((_as_uri(subject), predicate, _as_uri(obj), graph) for subject, obj in zip(subjects, objects))
+        if len(subjects) > 0:
+            self.predicates.add(predicate)
+
+    def __len__(self):
+        self.flush()
+        return len(self.graph)
+
+    def close(self):
+        self.flush()
+        writers = [
+            ("xml", self.rdf_file_path, self.prefixes, self.predicates),
+            ("turtle", self.owl_file_path, self.prefixes, self.predicates),
+        ]
+        write_outputs(triples_by_subject(self.graph), writers, self.parallel)
+
+        print(f"RDF/XML content saved to {self.rdf_file_path}")
+        print(f"OWL content saved to {os.path.basename(self.owl_file_path)}")
+
+
+def resume_point(sink, name):
+    # How many units (traces, rows, ...) of the conversion are already in the sink
+    if hasattr(sink, "progress"):
+        return sink.progress(name)
+    return 0
+
+
+def record_progress(sink, name, value):
+    # The first value units of the conversion have been added to the sink
+    if hasattr(sink, "set_progress"):
+        sink.set_progress(name, value)
+
+
+def _as_uri(value):
+    # The columns hold URIRefs, or plain strings for the URIs that are not repeated
+    return value if isinstance(value, URIRef) else URIRef(value)
+
+
+def add_columns(sink, subjects, predicate, objects, unique=False):
+    # Add the triples (subjects[i], predicate, objects[i]), subjects and objects
+    # are sequences of URIs of the same length (URIRef or str). unique=True tells
+    # that the triples are distinct and none of them is ever given to the sink
+    # again, the sink does not need to check them for duplicates.
+    if hasattr(sink, "add_columns"):
+        sink.add_columns(subjects, predicate, objects, unique)
+        return
+    for subject, obj in zip(subjects, objects):
+        sink.add((_as_uri(subject), predicate, _as_uri(obj)))
+
+
+class SqliteSink:
+    # The triples are kept in the SQLite database database_path, as the N3 form of
+    # their terms, and the outputs are written from it when the sink is closed.
+    # Triples are inserted batch_size at a time, each batch in one transaction
+    # together with the progress of the conversion. If the conversion stops, the
+    # next one with the same database_path goes on after the last committed batch.
+    def __init__(self, database_path, rdf_file_path, owl_file_path, parallel=None, batch_size=10000):
+        if parallel not in (None, "threads", "processes"):
+            raise ValueError(f"Unknown parallel mode {parallel}, it should be threads or processes!")
+        # The sink can be filled from the writer thread of a pipelined conversion
+        # (see source/pipeline.py), it is only used by one thread at a time
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS triples (s TEXT, p TEXT, o TEXT, PRIMARY KEY (s, p, o)) WITHOUT ROWID")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS prefixes (prefix TEXT PRIMARY KEY, namespace TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS progress (name TEXT PRIMARY KEY, value INTEGER)")
+        self.connection.commit()
+
+        self.rdf_file_path = rdf_file_path
+        self.owl_file_path = owl_file_path
+        self.parallel = parallel
+        self.batch_size = batch_size
+        self.batch = []
+        self.pending_progress = {}
+        self.committed_progress = dict(self.connection.execute("SELECT name, value FROM progress"))
+
+    def bind(self, prefix, namespace):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO prefixes VALUES (?, ?)", (prefix, str(namespace)))
+
+    def add(self, triple):
+        subject, predicate, obj = triple
+        self.batch.append((_to_n3(subject), _to_n3(predicate), _to_n3(obj)))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def progress(self, name):
+        return self.committed_progress.get(name, 0)
+
+    def set_progress(self, name, value):
+        # Saved with the next batch, so it never gets ahead of the triples
+        self.pending_progress[name] = value
+
+    def flush(self):
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO triples VALUES (?, ?, ?)", self.batch)
+            self.connection.executemany("INSERT OR REPLACE INTO progress VALUES (?, ?)", self.pending_progress.items())
+        self.committed_progress.update(self.pending_progress)
+        self.batch = []
+        self.pending_progress = {}
+
+    def __len__(self):
+        self.flush()
+        return self.connection.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def triples(self):
+        # All the triples, sorted by subject
+        for subject, predicate, obj in self.connection.execute("SELECT s, p, o FROM triples ORDER BY s, p, o"):
+            yield (_from_n3(subject), _from_n3(predicate), _from_n3(obj))
+
+    def close(self):
+        self.flush()
+        prefixes = dict(self.connection.execute("SELECT prefix, namespace FROM prefixes"))
+        predicates = set(_from_n3(predicate) for (predicate,) in self.connection.execute("SELECT DISTINCT p FROM triples"))
+        writers = [
+            ("xml", self.rdf_file_path, prefixes, predicates),
+            ("turtle", self.owl_file_path, prefixes, predicates),
+        ]
+        write_outputs(self.triples(), writers, self.parallel)
+        self.connection.close()
+
+        print(f"RDF/XML content saved to {self.rdf_file_path}")
+        print(f"OWL content saved to {os.path.basename(self.owl_file_path)}")
+
+
+def _to_n3(term):
+    # URIRef.n3() refuses some characters the converters put in their URIs
+    if isinstance(term, URIRef):
+        return f"<{term}>"
+    return term.n3()
+
+
+def _from_n3(text):
+    if text.startswith("<") and text.endswith(">"):
+        return URIRef(text[1:-1])
+    return from_n3(text)
+
+
+# The characters rdflib does not accept in the URIs it serializes
+_INVALID_URI = re.compile(r'[<>" {}|\\^`]')
+
+# Local names that can be written as prefix:name in Turtle without escaping
+_LOCAL_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_\-]*$")
+
+
+class StreamingSink:
+    # output can be a path or any writable text file object (sys.stdout, a pipe, ...).
+    # format is "nt" (N-Triples) or "turtle". In Turtle the URIs of the bound
+    # namespaces are written as prefixed names and consecutive triples with the
+    # same subject share it.
+    # Duplicated triples are skipped by keeping a 128 bit blake2b digest of the
+    # N-Triples form of every written triple. Two distinct triples of a run of n
+    # triples get the same digest, and the second one is lost, with a probability
+    # below n * n / 2 ** 129: less than 1e-20 for a billion triples.
+    # Set deduplicate to False if the producer never repeats a triple.
+    def __init__(self, output, format="nt", deduplicate=True):
+        if format not in ("nt", "turtle"):
+            raise ValueError(f"Unknown format {format}, it should be nt or turtle!")
+
+        if isinstance(output, (str, os.PathLike)):
+            self.file = open(output, "w", encoding="utf-8")
+            self.owns_file = True
+        else:
+            self.file = output
+            self.owns_file = False
+
+        self.format = format
+        self.seen = set() if deduplicate else None
+        self.count = 0
+        self.prefixes = {}
+        self.current_subject = None
+
+        if format == "turtle":
+            for prefix, namespace in (("rdf", RDF), ("rdfs", RDFS), ("owl", OWL), ("xsd", XSD)):
+                self.bind(prefix, str(namespace))
+
+    def bind(self, prefix, namespace):
+        if self.format != "turtle":
+            return
+        self._end_statement()
+        self.prefixes[str(namespace)] = prefix
+        self.file.write(f"@prefix {prefix}: <{namespace}> .\n")
+
+    def _term(self, term):
+        if self.format == "turtle" and isinstance(term, URIRef):
+            if term == RDF.type:
+                return "a"
+            value = str(term)
+            for namespace, prefix in self.prefixes.items():
+                if value.startswith(namespace) and _LOCAL_NAME.match(value[len(namespace):]):
+                    return f"{prefix}:{value[len(namespace):]}"
+        return term.n3()
+
+    def _end_statement(self):
+        if self.current_subject is not None:
+            self.file.write(" .\n")
+            self.current_subject = None
+
+    def add(self, triple):
+        subject, predicate, obj = triple
+        if self.seen is not None:
+            key = hashlib.blake2b(f"{_to_n3(subject)} {_to_n3(predicate)} {_to_n3(obj)}".encode("utf-8"), digest_size=16).digest()
+            if key in self.seen:
+                return
+            self.seen.add(key)
+        self.count += 1
+
+        if self.format == "nt":
+            self.file.write(f"{subject.n3()} {predicate.n3()} {obj.n3()} .\n")
+        elif subject == self.current_subject:
+            self.file.write(f" ;\n    {self._term(predicate)} {self._term(obj)}")
+        else:
+            self._end_statement()
+            self.file.write(f"{self._term(subject)} {self._term(predicate)} {self._term(obj)}")
+            self.current_subject = subject
+
+    def add_columns(self, subjects, predicate, objects, unique=False):
+        if self.format != "nt" or (not unique and self.seen is not None) or _INVALID_URI.search("".join(subjects) + "".join(objects)):
+            # One by one, an invalid URI fails in n3() as with add
+            for subject, obj in zip(subjects, objects):
+                self.add((_as_uri(subject), predicate, _as_uri(obj)))
+            return
+        # The N-Triples lines of the batch are written at once
+        predicate = predicate.n3()
+        self.file.write("".join([f"<{subject}> {predicate} <{obj}> .\n" for subject, obj in zip(subjects, objects)]))
+        self.count += len(subjects)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._end_statement()
+        self.file.flush()
+        if self.owns_file:
+            self.file.close()
+
+
+class RdfXmlWriter:
+    # Streams RDF/XML with one rdf:Description per run of triples with the same
+    # subject. The namespaces of all the predicates have to be declared on the
+    # root element, so they are given up front.
+    def __init__(self, output, prefixes, predicates):
+        if isinstance(output, (str, os.PathLike)):
+            self.file = open(output, "w", encoding="utf-8")
+            self.owns_file = True
+        else:
+            self.file = output
+            self.owns_file = False
+
+        namespaces = dict(STANDARD_PREFIXES)
+        namespaces.update(prefixes)
+        self.qnames = {}
+        used = {"rdf": namespaces["rdf"]}
+        prefix_of = {namespace: prefix for prefix, namespace in namespaces.items()}
+        for predicate in predicates:
+            namespace, local_name = split_uri(predicate)
+            if namespace not in prefix_of:
+                prefix_of[namespace] = f"ns{len(prefix_of) + 1}"
+            used[prefix_of[namespace]] = namespace
+            self.qnames[predicate] = f"{prefix_of[namespace]}:{local_name}"
+
+        self.file.write('<?xml version="1.0" encoding="utf-8"?>\n<rdf:RDF\n')
+        for prefix, namespace in sorted(used.items()):
+            self.file.write(f"   xmlns:{prefix}={quoteattr(namespace)}\n")
+        self.file.write(">\n")
+        self.current_subject = None
+
+    def _end_description(self):
+        if self.current_subject is not None:
+            self.file.write("  </rdf:Description>\n")
+            self.current_subject = None
+
+    def add(self, triple):
+        subject, predicate, obj = triple
+        if subject != self.current_subject:
+            self._end_description()
+            if isinstance(subject, BNode):
+                self.file.write(f"  <rdf:Description rdf:nodeID={quoteattr(str(subject))}>\n")
+            else:
+                self.file.write(f"  <rdf:Description rdf:about={quoteattr(str(subject))}>\n")
+            self.current_subject = subject
+
+        qname = self.qnames[predicate]
+        if isinstance(obj, Literal):
+            attributes = ""
+            if obj.language:
+                attributes = f" xml:lang={quoteattr(obj.language)}"
+            elif obj.datatype:
+                attributes = f" rdf:datatype={quoteattr(str(obj.datatype))}"
+            self.file.write(f"    <{qname}{attributes}>{escape(str(obj))}</{qname}>\n")
+        elif isinstance(obj, BNode):
+            self.file.write(f"    <{qname} rdf:nodeID={quoteattr(str(obj))}/>\n")
+        else:
+            self.file.write(f"    <{qname} rdf:resource={quoteattr(str(obj))}/>\n")
+
+    def close(self):
+        self._end_description()
+        self.file.write("</rdf:RDF>\n")
+        self.file.flush()
+        if self.owns_file:
+            self.file.close()
+
+
+def _make_writer(kind, path, prefixes, predicates):
+    if kind == "xml":
+        return RdfXmlWriter(path, prefixes, predicates)
+    writer = StreamingSink(path, format="turtle", deduplicate=False)
+    for prefix, namespace in prefixes.items():
+        if prefix not in STANDARD_PREFIXES:
+            writer.bind(prefix, namespace)
+    return writer
+
+
+def _drain(writer_arguments, chunks, errors=None):
+    # Writer side of write_outputs when it runs in a thread or in a process.
+    # After a failure the chunks are still consumed so that the walk never blocks.
+    failure = None
+    try:
+        writer = _make_writer(*writer_arguments)
+    except Exception as error:
+        failure = error
+
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            break
+        if failure is None:
+            try:
+                for triple in chunk:
+                    writer.add(triple)
+            except Exception as error:
+                failure = error
+
+    if failure is None:
+        writer.close()
+    elif errors is not None:
+        errors.append(failure)
+    else:
+        raise failure
+
+
+def triples_by_subject(graph):
+    # All the triples of the graph, the ones with the same subject one after the
+    # other. Subjects are sorted so that the outputs are the same from run to run.
+    for subject in sorted(graph.subjects(unique=True)):
+        for predicate, obj in graph.predicate_objects(subject):
+            yield (subject, predicate, obj)
+
+
+def write_outputs(triples, writers, parallel=None, chunk_size=10000):
+    # Walk the triples once and give each of them to every writer.
+    # writers is a list of (kind, path, prefixes, predicates) with kind "xml" or "turtle".
+    # Triples that come grouped by subject (as from an rdflib Graph) share their subject in the outputs.
+    if parallel is None:
+        opened = [_make_writer(*arguments) for arguments in writers]
+        for triple in triples:
+            for writer in opened:
+                writer.add(triple)
+        for writer in opened:
+            writer.close()
+        return
+
+    errors = []
+    if parallel == "threads":
+        queues = [queue.Queue(maxsize=8) for _ in writers]
+        workers = [threading.Thread(target=_drain, args=(arguments, chunks, errors)) for arguments, chunks in zip(writers, queues)]
+    else:
+        queues = [multiprocessing.Queue(maxsize=8) for _ in writers]
+        workers = [multiprocessing.Process(target=_drain, args=(arguments, chunks)) for arguments, chunks in zip(writers, queues)]
+
+    for worker in workers:
+        worker.start()
+
+    chunk = []
+    for triple in triples:
+        chunk.append(triple)
+        if len(chunk) == chunk_size:
+            for chunks in queues:
+                chunks.put(chunk)
+            chunk = []
+    for chunks in queues:
+        if len(chunk) > 0:
+            chunks.put(chunk)
+        chunks.put(None)
+
+    for worker in workers:
+        worker.join()
+        if parallel == "processes" and worker.exitcode != 0:
+            raise RuntimeError(f"Writing the outputs failed in process {worker.name}!")
+    if len(errors) > 0:
+        raise errors[0]
@@ -0,0 +1,85 @@
+import re
+from collections import OrderedDict
+from datetime import datetime
+from dateutil.parser import parse
+
+'''
+The converters turn every XES/OCED timestamp into the isoformat() string used in
+the timestamp URIs. dateutil's parser guesses the format of every string, which
+is slow, while XES and OCED timestamps are nearly always strict ISO-8601
+(2006-11-07T10:00:36+01:00). TimestampNormalizer reads those with
+datetime.fromisoformat, remembers the most recent results and only falls back
+to dateutil for the strings that do not match.
+'''
+
+# yyyy-mm-ddThh:mm:ss with optional fraction (up to microseconds) and optional Z or +hh:mm offset
+_XES_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d{1,6})?(Z|[+-]\d{2}:\d{2})?$")
+
+
+def _fromisoformat(value):
+    # The datetime of a strict ISO-8601 string, None for the other strings
+    if _XES_TIMESTAMP.match(value):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return None
+
+
+def parse_timestamp(value):
+    # The datetime of an XES/OCED timestamp, read by dateutil when it is not strict ISO-8601
+    date_object = _fromisoformat(value)
+    if date_object is None:
+        return parse(value)
+    return date_object
+
+
+class TimestampNormalizer:
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.fast = 0
+        self.fallbacks = 0
+
+    def _parse(self, value):
+        date_object = _fromisoformat(value)
+        if date_object is not None:
+            self.fast += 1
+            return date_object
+        self.fallbacks += 1
+        return parse(value)
+
+    def isoformat(self, value):
+        # Same as dateutil.parser.parse(value).isoformat()
+        result = self.entries.get(value)
+        if result is not None:
+            self.hits += 1
+            self.entries.move_to_end(value)
+            return result
+
+        result = self._parse(value).isoformat()
+        self.entries[value] = result
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return result
+
+    def stats(self):
+        parsed = self.fast + self.fallbacks
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "fast": self.fast,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": round(self.fallbacks / parsed, 4) if parsed > 0 else 0.0,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.fast = 0
+        self.fallbacks = 0
+
+
+default_timestamp_normalizer = TimestampNormalizer()
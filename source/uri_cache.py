@@ -0,0 +1,69 @@
+import urllib.parse
+from collections import OrderedDict
+from rdflib import URIRef
+
+'''
+The converters build the same URIs for the same few hundred attribute values,
+products, resources and event types over and over. UriCache keeps the ready
+URIRef of the most recently used (namespace, raw value) pairs, so the quoting
+and the "_".join(str(value).split(" ")) are done once per distinct value.
+
+All the converters use default_uri_cache unless they are given another one.
+'''
+
+class UriCache:
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, key, build):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = URIRef(build())
+        self.entries[key] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def uri(self, namespace, value):
+        # URIRef(namespace + value)
+        return self._get(("uri", namespace, value), lambda: namespace + value)
+
+    def quoted(self, namespace, value):
+        # URIRef(namespace + urllib.parse.quote(str(value)))
+        text = str(value)
+        return self._get(("quoted", namespace, text), lambda: namespace + urllib.parse.quote(text))
+
+    def joined(self, namespace, values, prefix=""):
+        # URIRef(namespace + prefix + "_".join(["_".join(str(value).split(" ")) for value in values]))
+        texts = tuple(str(value) for value in values)
+        return self._get(("joined", namespace, prefix, texts), lambda: namespace + prefix + "_".join(["_".join(text.split(" ")) for text in texts]))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups > 0 else 0.0,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+default_uri_cache = UriCache()
@@ -0,0 +1,436 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from source.xes_columns import typed_column
+from source.event_table import EventTable, SharedDictionary
+
+'''
+A cache of parsed XES files shared by the manual and the xpath converters.
+
+The first time a log is read it is parsed once into columns and saved as .npy
+files in a directory of the cache. The next runs memory-map these arrays
+instead of parsing the XML again:
+
+    meta.json                    the source file (size, mtime, hash), the columns and their XES types
+    trace_child.npy              place of every trace among the children of <log>
+    event_trace.npy              trace of every event
+    event_child.npy              place of every event among the children of its trace
+    event_<n>_codes.npy          per event, the code of its value of event column n (-1: missing)
+    event_<n>_child.npy          per event, the place of that attribute among its children
+    event_<n>_values.npy         the distinct values of the column, UTF-8 one after the other
+    event_<n>_offsets.npy        where every distinct value starts and ends in values
+    trace_<n>_...                the same for the attributes of the traces, one row per trace
+
+The places give back the xpath positions of the elements ('0/<trace>/<event>/<attribute>').
+The manual converter gets its event table (source/event_table.py) or the
+dataframe of source/xes_columns.py from the columns, the xpath converter the
+trace records of source/xes_reader.py.
+
+A cached log is used again while the size and the modification time of the
+file do not change. When they do, the file is hashed, and the cache is only
+rebuilt if the content changed.
+
+Several processes can fill the same cache (the workers of source/batch.py,
+...). Every writer stages its entry in a directory of its own and publishes it
+with a single rename; when the entry of the same file is already there another
+writer won the race and its entry is used. The cache is bounded to max_bytes,
+the least recently used entries are evicted first (the modification time of
+meta.json is the last use of an entry).
+'''
+
+CACHE_VERSION = 1
+
+
+def _local_name(tag):
+    return tag[tag.find("}") + 1:]
+
+
+def _file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Column:
+    # A dictionary-encoded column while the log is parsed
+    def __init__(self, key, xes_type, rows):
+        self.key = key
+        self.type = xes_type
+        self.dictionary = {}
+        self.codes = [-1] * rows
+        self.children = [-1] * rows
+
+    def add(self, value, child):
+        code = self.dictionary.get(value)
+        if code is None:
+            code = self.dictionary[value] = len(self.dictionary)
+        self.codes.append(code)
+        self.children.append(child)
+
+    def pad(self, rows):
+        while len(self.codes) < rows:
+            self.codes.append(-1)
+            self.children.append(-1)
+
+
+def _add_attribute(columns, element, child, rows):
+    key = element.attrib["key"]
+    xes_type = _local_name(element.tag)
+    column = columns.get(key)
+    if column is None:
+        column = columns[key] = _Column(key, xes_type, rows)
+    elif column.type != xes_type or len(column.codes) > rows:
+        # The trace records keep the type of every attribute, the columns only one per key
+        raise ValueError(f"The attribute {key} is not a {column.type} everywhere or is repeated in an element!")
+    column.add(element.attrib["value"], child)
+
+
+def parse_xes(xes_file_path):
+    # Parse the XES file into (trace_child, event_trace, event_child, event_columns,
+    # trace_columns, column_names), column_names in the order of read_xes_columns
+    column_order = {}
+    trace_keys = []
+    trace_child = []
+    event_trace = []
+    event_child = []
+    event_columns = {}
+    trace_columns = {}
+
+    # Tags of the elements being parsed from the log down, and how many children they have so far
+    root = None
+    path = []
+    counts = []
+    for action, element in ET.iterparse(xes_file_path, events=("start", "end")):
+        if action == "start":
+            if root is None:
+                root = element
+            if len(counts) > 0:
+                counts[-1] += 1
+            path.append(_local_name(element.tag))
+            counts.append(0)
+            if len(path) == 2 and path[-1] == "trace":
+                trace_child.append(counts[-2] - 1)
+                trace_keys = []
+            continue
+
+        tag = path.pop()
+        counts.pop()
+        if len(path) == 2 and path[-1] == "trace":
+            # A child of the current trace: an event or an attribute of the trace
+            child = counts[-1] - 1
+            if tag == "event":
+                rows = len(event_trace)
+                for attribute_child, attribute in enumerate(element):
+                    _add_attribute(event_columns, attribute, attribute_child, rows)
+                    column_order.setdefault(attribute.attrib["key"], None)
+                for key in trace_keys:
+                    column_order.setdefault("case:" + key, None)
+                event_trace.append(len(trace_child) - 1)
+                event_child.append(child)
+                for column in event_columns.values():
+                    column.pad(rows + 1)
+                element.clear()
+            elif "key" in element.attrib:
+                _add_attribute(trace_columns, element, child, len(trace_child) - 1)
+                trace_keys.append(element.attrib["key"])
+        elif len(path) == 1:
+            if tag == "trace":
+                for column in trace_columns.values():
+                    column.pad(len(trace_child))
+            # Nothing is kept of the children of the log that have been read
+            element.clear()
+            root.remove(element)
+
+    return trace_child, event_trace, event_child, event_columns, trace_columns, list(column_order)
+
+
+def _save_column(directory, prefix, column):
+    np.save(os.path.join(directory, f"{prefix}_codes.npy"), np.array(column.codes, dtype=np.int32))
+    np.save(os.path.join(directory, f"{prefix}_child.npy"), np.array(column.children, dtype=np.int32))
+    encoded = [value.encode("utf-8") for value in column.dictionary]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+    np.save(os.path.join(directory, f"{prefix}_values.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(os.path.join(directory, f"{prefix}_offsets.npy"), offsets)
+
+
+class ParsedXes:
+    # A parsed log of the cache, its arrays are memory-mapped when they are used
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.arrays = {}
+
+    def array(self, name):
+        if not name in self.arrays:
+            self.arrays[name] = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+        return self.arrays[name]
+
+    def dictionary(self, prefix):
+        # The distinct values of a column, in the order of their codes
+        values = bytes(self.array(f"{prefix}_values"))
+        offsets = self.array(f"{prefix}_offsets").tolist()
+        return [values[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    def _distinct(self, prefix, xes_type, codes):
+        # (the distinct values of a column converted to its type, the codes of the rows)
+        dictionary = self.dictionary(prefix)
+        if (codes < 0).any():
+            # The missing values get the code of a None at the end
+            dictionary.append(None)
+            codes = np.where(codes < 0, len(dictionary) - 1, codes)
+        return typed_column(dictionary, xes_type), codes
+
+    def _typed(self, prefix, xes_type, codes):
+        # The column of the rows with these codes, converted once per distinct value
+        distinct, codes = self._distinct(prefix, xes_type, codes)
+        return distinct.iloc[codes].reset_index(drop=True)
+
+    def dataframe(self, keys=None):
+        # Returns (dataframe, column_names) as read_xes_columns in source/xes_columns.py
+        wanted = set(keys) if keys is not None else None
+        event_trace = np.asarray(self.array("event_trace"))
+        data = {}
+        for n, (key, xes_type) in enumerate(self.meta["event_columns"]):
+            if wanted is None or key in wanted:
+                data[key] = self._typed(f"event_{n}", xes_type, np.asarray(self.array(f"event_{n}_codes")))
+        for n, (key, xes_type) in enumerate(self.meta["trace_columns"]):
+            column = "case:" + key
+            if (wanted is None or column in wanted) and not column in data:
+                codes = np.asarray(self.array(f"trace_{n}_codes"))[event_trace] if len(event_trace) > 0 else np.zeros(0, dtype=np.int32)
+                data[column] = self._typed(f"trace_{n}", xes_type, codes)
+        column_names = self.meta["column_names"]
+        data = {column: data[column] for column in column_names if column in data}
+        return pd.DataFrame(data, index=pd.RangeIndex(len(event_trace))), column_names
+
+    def event_table(self, keys=None):
+        # Returns (event table, column_names) like dataframe, the columns are
+        # dictionary-encoded (see source/event_table.py) straight from their codes
+        wanted = set(keys) if keys is not None else None
+        event_trace = np.asarray(self.array("event_trace"))
+        dictionary = SharedDictionary()
+        columns = {}
+        dates = {}
+
+        def add(column, prefix, xes_type, codes):
+            if xes_type == "date":
+                dates[column] = self._typed(prefix, xes_type, codes)
+            else:
+                distinct, codes = self._distinct(prefix, xes_type, codes)
+                columns[column] = dictionary.add_column(list(distinct), codes)
+
+        for n, (key, xes_type) in enumerate(self.meta["event_columns"]):
+            if wanted is None or key in wanted:
+                add(key, f"event_{n}", xes_type, np.asarray(self.array(f"event_{n}_codes")))
+        for n, (key, xes_type) in enumerate(self.meta["trace_columns"]):
+            column = "case:" + key
+            if (wanted is None or column in wanted) and not column in columns and not column in dates:
+                codes = np.asarray(self.array(f"trace_{n}_codes"))[event_trace] if len(event_trace) > 0 else np.zeros(0, dtype=np.int32)
+                add(column, f"trace_{n}", xes_type, codes)
+        column_names = self.meta["column_names"]
+        names = [column for column in column_names if column in columns or column in dates]
+        return EventTable(columns, dictionary.values, pd.RangeIndex(len(event_trace)), dates, names), column_names
+
+    def traces(self, event_filter=None):
+        # Yields the trace records of source/xes_reader.py, as trace_from_element builds them.
+        # With an event_filter (see source/selection.py) only the event columns
+        # it keeps are decoded and the time range is checked once per distinct timestamp.
+        def decoded(prefix, columns, keeps_key=lambda key: True):
+            # (key, type, values of the rows, places of the rows) of every column
+            result = []
+            for n, (key, xes_type) in enumerate(columns):
+                if not keeps_key(key):
+                    continue
+                dictionary = self.dictionary(f"{prefix}_{n}")
+                codes = self.array(f"{prefix}_{n}_codes").tolist()
+                children = self.array(f"{prefix}_{n}_child").tolist()
+                result.append((key, xes_type, [dictionary[code] if code >= 0 else None for code in codes], children))
+            return result
+
+        event_keys = [key for key, _ in self.meta["event_columns"]]
+        kept_events = None
+        if event_filter is None:
+            event_columns = decoded("event", self.meta["event_columns"])
+        else:
+            event_columns = decoded("event", self.meta["event_columns"], event_filter.keeps_key)
+            if event_filter.timestamp_key is not None:
+                if event_filter.timestamp_key in event_keys:
+                    n = event_keys.index(event_filter.timestamp_key)
+                    # An event without a timestamp has the code -1, the last value of keeps
+                    keeps = [event_filter.keeps_time(value) for value in self.dictionary(f"event_{n}")] + [event_filter.keeps_time(None)]
+                    kept_events = np.array(keeps, dtype=bool)[np.asarray(self.array(f"event_{n}_codes"))].tolist()
+                else:
+                    kept_events = [event_filter.keeps_time(None)] * len(self.array("event_trace"))
+        trace_columns = decoded("trace", [(key, xes_type) for key, xes_type in self.meta["trace_columns"]])
+        event_trace = self.array("event_trace").tolist()
+        event_child = self.array("event_child").tolist()
+
+        event = 0
+        for trace, trace_child in enumerate(self.array("trace_child").tolist()):
+            position = f"0/{trace_child}"
+            strings = sorted((children[trace], key, values[trace]) for key, xes_type, values, children in trace_columns
+                             if xes_type == "string" and children[trace] >= 0)
+            record = {'position': position, 'strings': [(key, value, f"{position}/{child}") for child, key, value in strings], 'events': []}
+            while event < len(event_trace) and event_trace[event] == trace:
+                event_position = f"{position}/{event_child[event]}"
+                if kept_events is not None and not kept_events[event]:
+                    record['events'].append((event_position, None))
+                else:
+                    attributes = sorted((children[event], key, values[event]) for key, _, values, children in event_columns if children[event] >= 0)
+                    record['events'].append((event_position, [(key, value, f"{event_position}/{child}") for child, key, value in attributes]))
+                event += 1
+            yield record
+
+
+class XesCache:
+    def __init__(self, cache_dir="generated_documents/.cache/xes", max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_dir(self, xes_file_path):
+        name = hashlib.blake2b(os.path.abspath(xes_file_path).encode(), digest_size=10).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def load(self, xes_file_path):
+        # The ParsedXes of the file, parsed and saved first if the cache does not have it
+        entry_dir = self._entry_dir(xes_file_path)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        stat = os.stat(xes_file_path)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as meta_file:
+                meta = json.load(meta_file)
+            if meta["version"] == CACHE_VERSION:
+                if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+                    self.hits += 1
+                    # Marks the last use of the entry for evict
+                    os.utime(meta_path)
+                    return ParsedXes(entry_dir, meta)
+                # Touched but maybe not changed
+                if meta["size"] == stat.st_size and meta["digest"] == _file_digest(xes_file_path):
+                    meta["mtime_ns"] = stat.st_mtime_ns
+                    _write_meta(meta_path, meta)
+                    self.hits += 1
+                    return ParsedXes(entry_dir, meta)
+
+        self.misses += 1
+        return self.save(xes_file_path, entry_dir, stat)
+
+    def save(self, xes_file_path, entry_dir, stat):
+        trace_child, event_trace, event_child, event_columns, trace_columns, column_names = parse_xes(xes_file_path)
+
+        # Staged in a directory of this writer only, then put in its place at once
+        os.makedirs(self.cache_dir, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".staging-")
+        try:
+            np.save(os.path.join(staging_dir, "trace_child.npy"), np.array(trace_child, dtype=np.int32))
+            np.save(os.path.join(staging_dir, "event_trace.npy"), np.array(event_trace, dtype=np.int32))
+            np.save(os.path.join(staging_dir, "event_child.npy"), np.array(event_child, dtype=np.int32))
+            for n, column in enumerate(event_columns.values()):
+                _save_column(staging_dir, f"event_{n}", column)
+            for n, column in enumerate(trace_columns.values()):
+                _save_column(staging_dir, f"trace_{n}", column)
+            meta = {
+                "version": CACHE_VERSION,
+                "source": os.path.abspath(xes_file_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "digest": _file_digest(xes_file_path),
+                "event_columns": [(column.key, column.type) for column in event_columns.values()],
+                "trace_columns": [(column.key, column.type) for column in trace_columns.values()],
+                "column_names": column_names,
+            }
+            _write_meta(os.path.join(staging_dir, "meta.json"), meta)
+            meta = self._publish(staging_dir, entry_dir, meta)
+        finally:
+            # Still there when another writer won the race or the save failed
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        self.evict(keep=entry_dir)
+        return ParsedXes(entry_dir, meta)
+
+    def _publish(self, staging_dir, entry_dir, meta):
+        # Rename the staged entry to entry_dir, returns the meta of the entry in place
+        for attempt in range(2):
+            try:
+                os.rename(staging_dir, entry_dir)
+                return meta
+            except OSError:
+                if attempt > 0 or not os.path.isdir(entry_dir):
+                    raise
+            current = _read_meta(entry_dir)
+            if current is not None and all(current.get(key) == meta[key] for key in ("version", "size", "mtime_ns", "digest")):
+                # Another writer saved the same log first, its entry is kept
+                return current
+            # The entry of an older content of the file, moved out of the way before it is removed
+            stale_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".stale-")
+            try:
+                os.rename(entry_dir, stale_dir)
+            except FileNotFoundError:
+                pass
+            shutil.rmtree(stale_dir, ignore_errors=True)
+
+    def entries(self):
+        # (last_used, size, name) of every complete entry, the staging directories start with a dot
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            try:
+                last_used = os.stat(os.path.join(entry_dir, "meta.json")).st_mtime
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            except FileNotFoundError:
+                continue
+            if not name.startswith("."):
+                entries.append((last_used, size, name))
+        return entries
+
+    def evict(self, keep=None):
+        # Remove the least recently used entries until the cache fits in max_bytes,
+        # except the entry keep that is being used
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            entry_dir = os.path.join(self.cache_dir, name)
+            if keep is not None and os.path.abspath(entry_dir) == os.path.abspath(keep):
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups > 0 else 0.0,
+        }
+
+
+def _write_meta(path, meta):
+    # Written to a file of this process and put in its place at once
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, 'w') as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(temporary_path, path)
+
+
+def _read_meta(entry_dir):
+    # The meta of an entry, None if it has none or it cannot be read
+    try:
+        with open(os.path.join(entry_dir, "meta.json"), 'r') as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+
+
+default_xes_cache = XesCache()
@@ -0,0 +1,117 @@
+import gzip
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+
+'''
+A lean XES loader for the manual converter: the events of the log are parsed
+straight into one column per attribute, without building pm4py log objects.
+
+The dataframe has one row per event in the order of the file, like the one of
+pm4py.read_xes: the attributes of the events under their key, the attributes
+of their trace under "case:<key>", missing values as NaN and the timestamps
+(date attributes) in UTC. With keys, only the values of those columns are
+kept. The order of all the columns of the log is returned as well, since the
+converters number the attributes by their place in it.
+'''
+
+# Values of the XES attribute types, the other types (string, id, ...) are kept as text
+_CONVERTERS = {
+    "int": int,
+    "float": float,
+    "boolean": lambda value: value.lower() == "true",
+}
+
+
+def _local_name(tag):
+    return tag[tag.find("}") + 1:]
+
+
+def _open(xes_file_path):
+    if xes_file_path.endswith(".gz"):
+        return gzip.open(xes_file_path, "rb")
+    return open(xes_file_path, "rb")
+
+
+def read_xes_columns(xes_file_path, keys=None):
+    # Returns (dataframe, column_names) with column_names the columns of the whole
+    # log in the order of pm4py.convert_to_dataframe. With keys (an iterable of
+    # column names) the dataframe only has the columns of the log among them.
+    wanted = set(keys) if keys is not None else None
+    # Every row is the attributes of an event followed by the ones of its trace,
+    # the columns are in the order they are first met in the rows
+    column_order = {}
+    types = {}
+    columns = {}
+    rows = 0
+
+    def keep(column, element):
+        types.setdefault(column, element.tag)
+        if wanted is not None and not column in wanted:
+            return
+        values = columns.get(column)
+        if values is None:
+            # The rows before the first value of the column do not have it
+            values = columns[column] = [None] * rows
+        values.append(element.attrib.get("value"))
+
+    # Tags of the elements being parsed, from the log down
+    path = []
+    root = None
+    trace_attributes = []
+    with _open(xes_file_path) as xes_file:
+        for action, element in ET.iterparse(xes_file, events=("start", "end")):
+            if action == "start":
+                if root is None:
+                    root = element
+                path.append(_local_name(element.tag))
+                continue
+            tag = path.pop()
+            parent = path[-1] if len(path) > 0 else None
+
+            if parent == "trace" and tag != "event" and "key" in element.attrib:
+                # An attribute of the current trace (nested attributes are not columns)
+                element.tag = tag
+                trace_attributes.append(element)
+            elif tag == "event" and parent == "trace":
+                for attribute in element:
+                    if "key" in attribute.attrib:
+                        attribute.tag = _local_name(attribute.tag)
+                        column_order.setdefault(attribute.attrib["key"], None)
+                        keep(attribute.attrib["key"], attribute)
+                for attribute in trace_attributes:
+                    column = "case:" + attribute.attrib["key"]
+                    column_order.setdefault(column, None)
+                    keep(column, attribute)
+                rows += 1
+                for values in columns.values():
+                    if len(values) < rows:
+                        values.append(None)
+                element.clear()
+            elif parent == "log":
+                if tag == "trace":
+                    trace_attributes = []
+                # Nothing is kept of the traces that have been read
+                element.clear()
+                root.remove(element)
+
+    column_names = list(column_order)
+    data = {}
+    for column in column_names:
+        if not column in columns:
+            continue
+        data[column] = typed_column(columns[column], types[column])
+    return pd.DataFrame(data, index=pd.RangeIndex(rows)), column_names
+
+
+def typed_column(values, xes_type):
+    # The column of the values (text or None) of an attribute of XES type xes_type
+    if xes_type == "date":
+        return pd.to_datetime(pd.Series(values, dtype=object), utc=True, format="ISO8601")
+    convert = _CONVERTERS.get(xes_type)
+    if convert is None:
+        return pd.Series(values)
+    converted = [convert(value) if value is not None else None for value in values]
+    if xes_type == "boolean" and None in converted:
+        return pd.Series(converted, dtype=object)
+    return pd.Series(np.array([np.nan if value is None else value for value in converted]))
@@ -0,0 +1,140 @@
+'''
+Traces are handed to the converters as plain records so that the same triple
+building code can run on a fully parsed tree or on a stream:
+
+    {
+        'position': '0/27',
+        'strings': [('concept:name', '1-357087417', '0/27/0')],
+        'events': [
+            ('0/27/1', [('org:group', 'Org line G3', '0/27/1/0'), ...]),
+            ...
+        ]
+    }
+
+Positions follow the xpath converter convention: the root is '0' and every
+child appends its index among its siblings.
+
+With an event_filter (see source/selection.py) the events keep only the
+attributes it needs, and an event out of its time range is ('0/27/1', None):
+it still counts in the numbering of the events, but none of its attributes is
+read.
+'''
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+def _event_record(event, event_position, event_filter=None):
+    if event_filter is None:
+        attributes = []
+        for i, child in enumerate(event):
+            attributes.append((child.attrib['key'], child.attrib['value'], f"{event_position}/{i}"))
+        return (event_position, attributes)
+
+    if event_filter.timestamp_key is not None:
+        timestamp = None
+        for child in event:
+            if child.attrib.get('key') == event_filter.timestamp_key:
+                timestamp = child.attrib.get('value')
+        if not event_filter.keeps_time(timestamp):
+            return (event_position, None)
+    attributes = []
+    for i, child in enumerate(event):
+        if event_filter.keeps_key(child.attrib['key']):
+            attributes.append((child.attrib['key'], child.attrib['value'], f"{event_position}/{i}"))
+    return (event_position, attributes)
+
+
+def _write_start(annotated_file, element, position, depth):
+    # Write the opening tag of an element with its position as an extra attribute
+    tag = element.tag
+    namespace = ""
+    if tag.startswith("{"):
+        if depth == 0:
+            namespace = f" xmlns={quoteattr(tag[1:tag.find('}')])}"
+        tag = tag[tag.find("}") + 1:]
+    attributes = "".join(f" {key}={quoteattr(value)}" for key, value in element.attrib.items())
+    if depth > 0:
+        annotated_file.write("\n" + "\t" * depth)
+    annotated_file.write(f"<{tag}{namespace}{attributes} position={quoteattr(position)}>")
+
+
+def _write_end(annotated_file, element, depth, has_children):
+    tag = element.tag
+    tag = tag[tag.find("}") + 1:]
+    if has_children:
+        annotated_file.write("\n" + "\t" * depth)
+    annotated_file.write(f"</{tag}>")
+
+
+def write_annotated_tree(element, annotated_file, position="0", depth=0):
+    # Write an already parsed tree with the position of every element, one
+    # element at a time instead of serializing the whole document at once.
+    # XES keeps all the information in attributes, so text content is not written.
+    _write_start(annotated_file, element, position, depth)
+    for i, child in enumerate(element):
+        write_annotated_tree(child, annotated_file, f"{position}/{i}", depth + 1)
+    _write_end(annotated_file, element, depth, len(element) > 0)
+    if depth == 0:
+        annotated_file.write("\n")
+
+
+def trace_from_element(trace, trace_position, event_filter=None):
+    # Build the trace record of an already parsed <trace> element
+    record = {'position': trace_position, 'strings': [], 'events': []}
+    for i, child in enumerate(trace):
+        position = f"{trace_position}/{i}"
+        if child.tag.endswith('string'):
+            record['strings'].append((child.attrib['key'], child.attrib['value'], position))
+        elif child.tag.endswith('event'):
+            record['events'].append(_event_record(child, position, event_filter))
+    return record
+
+
+def iter_xes_traces(xes_file_path, annotated_file=None, event_filter=None):
+    # Incrementally parse the XES file and yield one trace record at a time.
+    # Every trace is released as soon as it has been handed out, so the memory
+    # needed depends on the largest trace and not on the size of the log.
+    # If annotated_file is given, the XES file with the position of every
+    # element is written to it during the same parse.
+    root = None
+    positions = []
+    counters = []
+    record = None
+
+    for action, element in ET.iterparse(xes_file_path, events=("start", "end")):
+        if action == "start":
+            if root is None:
+                root = element
+                positions.append("0")
+            else:
+                positions.append(f"{positions[-1]}/{counters[-1]}")
+                counters[-1] += 1
+            counters.append(0)
+
+            if annotated_file is not None:
+                _write_start(annotated_file, element, positions[-1], len(positions) - 1)
+
+            if len(positions) == 2 and element.tag.endswith('trace'):
+                record = {'position': positions[-1], 'strings': [], 'events': []}
+            continue
+
+        position = positions.pop()
+        children_count = counters.pop()
+        depth = len(positions) + 1
+
+        if annotated_file is not None:
+            _write_end(annotated_file, element, depth - 1, children_count > 0)
+            if depth == 1:
+                annotated_file.write("\n")
+
+        if record is not None and depth == 3:
+            if element.tag.endswith('string'):
+                record['strings'].append((element.attrib['key'], element.attrib['value'], position))
+            elif element.tag.endswith('event'):
+                record['events'].append(_event_record(element, position, event_filter))
+                element.clear()
+        elif depth == 2:
+            if record is not None:
+                yield record
+                record = None
+            element.clear()
+            root.remove(element)
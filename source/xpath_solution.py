@@ -1,361 +1,470 @@
-import json
-import urllib.parse
-from rdflib import RDF, RDFS, URIRef, Graph
+from itertools import islice
+from rdflib import RDF, URIRef
+from source.sinks import GraphSink, StreamingSink, SqliteSink, resume_point, record_progress
+from source.descriptor_plan import compile_descriptors, referenced_keys
+from source.uri_cache import default_uri_cache
+from source.timestamps import default_timestamp_normalizer
 import xml.etree.ElementTree as ET
-from dateutil.parser import parse
-
-def convert_xes_to_rdf_xpath_position(xes_file_path, descriptors_file_path):
-    # Parse the XES file
-    tree = ET.parse(xes_file_path)
-    root = tree.getroot()
-
-    # Helper function to add position information as an attribute
-    def add_position_info(element, position):
-        element.set('position', position)
-
-    # Recursive function to traverse the XML tree and add position information
-    def traverse_and_add_position(node, position):
-        add_position_info(node, position)
-        for i, child in enumerate(node):
-            traverse_and_add_position(child, f"{position}/{i}")
-
-    # Start traversal and add position information
-    traverse_and_add_position(root, "0")
-
-    # Save the modified XML to a file
-    tree.write('generated_documents/modified_xes_file_for_xpath.xml')
-
-    # Load descriptors file
-    with open(descriptors_file_path, 'r') as json_file:
-        # Read the JSON data from the file
-        descriptors = json.load(json_file)
-
-    # Validate JSON file so that it has the proper information
-    errors = []
-
-    if not "referred_information_from_event_log" in descriptors:
-        errors.append("You need to have referred_information_from_event_log in the descriptor file!")
-
-    if not "injected_information_to_OCED_model" in descriptors:
-        errors.append("You need to have injected_information_to_OCED_model in the descriptor file!")
-
-    if len(errors) > 0:
-        print(errors)
-        return
+from source.xes_reader import iter_xes_traces, trace_from_element, write_annotated_tree
+from source.parallel import ShardSink, convert_shards, worker_context
+from source.incremental import DeltaSink, load_checkpoint, save_checkpoint, delta_path
+from source.instrumentation import stage
+from source.pipeline import PipelineSink, pipelined
+from source.xes_cache import default_xes_cache
+from source.provenance_index import build_provenance_index
+from source.selection import load_selection, select_plan, EventFilter
+from source.provenance import check_provenance, with_provenance, PositionRuns
+
+# Changed whenever the triples produced for the same input change, it is part of
+# the key of the result cache (see source/result_cache.py)
+CONVERTER_VERSION = 1
+
+
+def output_paths(file_name):
+    # The RDF/XML and Turtle files written by the default sink
+    return (f"generated_documents/xpath_{file_name}_data_to_rdf.rdf", f"generated_documents/xpath_{file_name}_data_to_owl.owl")
+
+
+def new_trace_state(plan, events_count=0):
+    # What the conversion of a trace takes over from the traces before it:
+    # the number of events converted so far, it gives the EventID of the next event,
+    # and the URI and id of the last object of every object type, by its place in plan.objects
+    return {
+        'events_count': events_count,
+        'all_event_objects': [None] * len(plan.objects),
+        'object_ids': [None] * len(plan.objects),
+    }
+
+
+'''
+info can be: 
+-   Representing a trace:
+    {'case:concept:name': {'value': '1-357087417', 'position': '0/27/0'}}
     
-    referred = descriptors["referred_information_from_event_log"]
-    injected = descriptors["injected_information_to_OCED_model"]
-
-    if not "events" in referred:
-        errors.append("You need to have event data in the descriptor file!")
-
-    if not "objects" in referred:
-        errors.append("You need to have objects data in the descriptor file!")
-
-    if "events" in referred:
-        if not isinstance(referred["events"], dict):
-            errors.append("events should be an object!")
-        else: 
-            if not "event_type_selector" in referred["events"]:
-                errors.append("You need to have event_type_selector in the descriptor file, they represent the value of Event Type!")
-            if not "event_timestamp" in referred["events"]:
-                errors.append("You need to have event_timestamp in the descriptor file, it represents the Event Timestamp!")
-            for attr in referred["events"]["attributes"]:
-                if not "event_attribute_value_selector" in attr or not "event_attribute_name" in attr:
-                    errors.append("You need to have event_attribute_value_selector and event_attribute_name for each attribute in the descriptor file!")
-                    break
-            for relation in referred["events"]["relations_to_objects"]:
-                if not "event_relation_type" in relation or not "event_related_to" in relation:
-                    errors.append("You need to have event_relation_type and event_related_to for each relation in the descriptor file!")
-                    break
-
-    if "objects" in referred:
-        if not isinstance(referred["objects"], list):
-            errors.append("objects should be array!")
-        else: 
-            for obj in referred["objects"]:
-                if not "object_type" in obj:
-                    errors.append("You need to have object_type data in the descriptor file for each object!")
-                if not "object_identifier_selector" in obj:
-                    errors.append("You need to have object_identifier_selector in the descriptor file for each object!")
-                for attr in obj["attributes"]:
-                    if not "object_attribute_value_selector" in attr or not "object_attribute_name" in attr:
-                        errors.append("You need to have object_attribute_value_selector and object_attribute_name for each attribute in the descriptor file!")
-                        break
-                if "relations" in obj:
-                    for relation in obj["relations"]:
-                        if not "object_relation_type" in relation or not "object_related_to" in relation:
-                            errors.append("You need to have object_relation_type and object_related_to for each relation in the descriptor file!")
-                            break
-    print(errors)
+-   Representing an event with all its information
+    {
+        'org:group': {'value': 'Org line G3', 'position': '0/27/2/0'}, 
+        'trace': '1-357087417', 
+        'resource country': {'value': 'POLAND', 'position': '0/27/2/1'}, 
+        'org:resource': {'value': 'Ewa', 'position': '0/27/2/2'}, 
+        'oranization country': {'value': 'us', 'position': '0/27/2/3'}, 
+        'concept:name': {'value': 'Completed', 'position': '0/27/2/4'}, 
+        'impact': {'value': 'Medium', 'position': '0/27/2/5'}, 
+        'product': {'value': 'PROD98', 'position': '0/27/2/6'}, 
+        'time:timestamp': {'value': '2012-01-30T12:30:21+01:00', 'position': '0/27/2/7'}, 
+        'lifecycle:transition': {'value': 'Closed', 'position': '0/27/2/8'}
+    }
+'''
+
+
+def add_trace_triples(g, plan, trace, state, uri_cache, timestamp_normalizer):
+    # Add the triples of one trace record (see source/xes_reader.py) and update state
+    ont_ns = plan.ont_ns
+    v = plan.vocabulary
+    trace_info = plan.trace_object
+    # A selection (see source/selection.py) can leave the trace object out of plan.objects
+    trace_index = plan.objects.index(trace_info) if trace_info in plan.objects else None
+    event_objects = [(i, obj) for i, obj in enumerate(plan.objects) if not obj.is_trace]
+    all_event_objects = state['all_event_objects']
+    object_ids = state['object_ids']
+
+    # The positions of the attribute values, with "ranges" they are collected in
+    # runs written at the end of the trace (see source/provenance.py)
+    provenance = plan.provenance
+    runs = PositionRuns(g, v.has_position) if provenance == "ranges" else None
+
+    def add_attribute_position(full_uri, event_position, position):
+        if provenance == "full":
+            g.add((full_uri, v.has_position, URIRef(ont_ns + position)))
+        elif runs is not None:
+            # 0/27/2/4 is attribute 4 of event 2 of trace 27
+            trace_position, _, event = event_position.rpartition("/")
+            runs.add(full_uri, ont_ns + trace_position + "/", int(event), position[len(event_position):])
+
+    # A trace whose events are all out of the selection only updates the state
+    trace_sink = g
+    if len(trace['events']) > 0 and all(attributes is None for _, attributes in trace['events']):
+        trace_sink = ShardSink()
+
+    info = {}
+    traceId = ""
+    for key, value, position in trace['strings']:
+        all_event_objects = state['all_event_objects'] = [None] * len(plan.objects)
+        key = f"case:{key}"
+        info[key] = {'value': value, 'position': position}
+        traceId = value
+
+        object_ids = state['object_ids'] = [None] * len(plan.objects)
+
+        if trace_index is None:
+            continue
+        obj = trace_info
+        object_id = "OBJ_" + "_".join(["_".join(str(value).split(" "))] * obj.identifier_selector.count(key))
+        object_instance_uri = URIRef(ont_ns + object_id)
+        trace_sink.add((object_instance_uri, RDF.type, v.objects))
+
+        trace_sink.add((obj.type_uri, RDF.type, v.object_type))
+
+        trace_sink.add((object_instance_uri, v.has_object_type, obj.type_uri))
+        if provenance != "none":
+            trace_sink.add((object_instance_uri, v.has_position, URIRef(ont_ns + position)))
+
+        all_event_objects[trace_index] = object_instance_uri
+        object_ids[trace_index] = object_id
+
+        for attribute in obj.attributes:
+            if attribute.selector in info:
+                # Combine the base URI and the encoded resource name to create the full URI
+                full_uri = uri_cache.quoted(ont_ns, info[attribute.selector]["value"])
+                trace_sink.add((full_uri, RDF.type, v.object_attribute_value))
+                trace_sink.add((full_uri, v.has_attribute_name, attribute.name_uri))
+                trace_sink.add((object_instance_uri, v.has_attribute_value, full_uri))
+
+    for event_position, event_attributes in trace['events']:
+        if event_attributes is None:
+            # An event out of the selection keeps its EventID
+            state['events_count'] += 1
+            continue
+        info = {}
+        for key, value, position in event_attributes:
+            info[key] = {'value': value, 'position': position}
+            info["trace"] = traceId
+        state['events_count'] += 1
+
+        # Create event instance
+        index = state['events_count']
+        event_instance_uri = URIRef(ont_ns + "EventID_" + str(index + 1))
+        g.add((event_instance_uri, RDF.type, v.events))
+
+        event_type_instance_uri = uri_cache.joined(ont_ns, [info[event_key]["value"] for event_key in plan.event_type_selector if event_key in info])
+        g.add((event_type_instance_uri, RDF.type, v.event_type))
+
+        g.add((event_instance_uri, v.has_event_type, event_type_instance_uri))
+
+        timestamp = info[plan.event_timestamp]
+        iso8601_timestamp = timestamp_normalizer.isoformat(timestamp["value"])
+        event_timestamp_instance_uri = uri_cache.uri(ont_ns, iso8601_timestamp)
+        g.add((event_timestamp_instance_uri, RDF.type, v.event_timestamp))
+        add_attribute_position(event_timestamp_instance_uri, event_position, timestamp["position"])
+
+        g.add((event_instance_uri, v.has_timestamp, event_timestamp_instance_uri))
+        if provenance != "none":
+            g.add((event_instance_uri, v.has_position, URIRef(ont_ns + event_position)))
+
+        for attribute in plan.event_attributes:
+            # Combine the base URI and the encoded resource name to create the full URI
+            attribute_info = info[attribute.selector]
+            full_uri = uri_cache.quoted(ont_ns, attribute_info["value"])
+            g.add((full_uri, RDF.type, v.event_attribute_value))
+            g.add((full_uri, v.has_attribute_name, attribute.name_uri))
+            add_attribute_position(full_uri, event_position, attribute_info["position"])
+
+            g.add((event_instance_uri, v.has_attribute_value, full_uri))
+
+        # Create object instances
+        for i, obj in event_objects:
+            object_instance_uri = uri_cache.joined(ont_ns, [info[object_key]["value"] for object_key in obj.identifier_selector if object_key in info], "OBJ_")
+            g.add((object_instance_uri, RDF.type, v.objects))
+
+            g.add((obj.type_uri, RDF.type, v.object_type))
+
+            g.add((object_instance_uri, v.has_object_type, obj.type_uri))
+
+            all_event_objects[i] = object_instance_uri
+            object_ids[i] = object_instance_uri[len(ont_ns):]
+
+            for attribute in obj.attributes:
+                if attribute.selector in info:
+                    # Combine the base URI and the encoded resource name to create the full URI
+                    full_uri = uri_cache.quoted(ont_ns, info[attribute.selector]["value"])
+                    g.add((full_uri, RDF.type, v.object_attribute_value))
+                    g.add((full_uri, v.has_attribute_name, attribute.name_uri))
+                    g.add((object_instance_uri, v.has_attribute_value, full_uri))
+
+        for relation in plan.object_relations:
+            relation_instance_uri = uri_cache.uri(ont_ns, f"{object_ids[relation.object_index]}_{object_ids[relation.related_index]}")
+            g.add((relation_instance_uri, RDF.type, relation.relation_type_uri))
+
+            g.add((relation_instance_uri, v.involves_object, all_event_objects[relation.object_index]))
+            g.add((relation_instance_uri, v.involves_object, all_event_objects[relation.related_index]))
+
+        # Now add the Event Relations because now all Object Instances are created and we can have the proper connections
+        for relation in plan.event_relations:
+            g.add((event_instance_uri, relation.predicate, all_event_objects[relation.related_index]))
+
+    if runs is not None:
+        runs.flush()
+
+
+def convert_xes_to_rdf_xpath_position(xes_file_path, descriptors_file_path, streaming=False, annotated_xml_path=None, sink=None, uri_cache=None, timestamp_normalizer=None, workers=None, shard_size=200, store=None, checkpoint=None, instrumentation=None, pipeline=False, xes_cache=None, provenance_index_path=None, selection=None, provenance="full"):
+    # The triples are written to sink (see source/sinks.py), by default they are
+    # collected in a Graph and saved as RDF/XML and Turtle in generated_documents.
+    # The URIs of repeated values come from uri_cache (see source/uri_cache.py)
+    # and the timestamps are read by timestamp_normalizer (see source/timestamps.py).
+    # With workers > 1 the traces are converted in shards of shard_size traces on a
+    # pool of worker processes (see source/parallel.py), the output is the same.
+    # With store set to the path of an SQLite database the graph is kept on disk
+    # (see SqliteSink in source/sinks.py) and a stopped conversion can be resumed.
+    # With checkpoint set to the path of a checkpoint file only the traces added to
+    # the log since the previous run are converted (see source/incremental.py).
+    # With instrumentation (see source/instrumentation.py) the stages are timed, the
+    # triples counted and the ConversionReport is returned.
+    # With pipeline=True the XES file is read as with streaming=True in a reader
+    # thread and the triples are handed to the sink in a writer thread, while the
+    # traces are converted (see source/pipeline.py).
+    # Otherwise the traces come from the parsed log kept in xes_cache (see
+    # source/xes_cache.py) for the next runs and the manual converter,
+    # xes_cache=False parses the file every time.
+    # With provenance_index_path the byte offsets of the elements of the log are
+    # written there, to look up the element of a has_position value with
+    # ProvenanceIndex (see source/provenance_index.py). True writes them next to
+    # the log (data.xes.positions.npy).
+    # With a selection (see source/selection.py) only the selected objects, event
+    # attributes, relations and the events of the time range are converted, the
+    # readers skip the rest.
+    # provenance sets the has_position triples written: "full", "event", "ranges"
+    # or "none" (see source/provenance.py).
+    if uri_cache is None:
+        uri_cache = default_uri_cache
+    if xes_cache is None:
+        xes_cache = default_xes_cache
+    if timestamp_normalizer is None:
+        timestamp_normalizer = default_timestamp_normalizer
+    if instrumentation is not None:
+        instrumentation.begin("xpath", xes_file_path)
+    # Load, validate and compile the descriptors file
+    # (descriptors_file_path can also be a plan already compiled with compile_descriptors)
+    with stage(instrumentation, "compile_descriptors"):
+        plan, errors = compile_descriptors(descriptors_file_path)
+    if len(errors) == 0 and plan.trace_object is None:
+        errors.append("You need to have an object with is_trace in the descriptor file, it represents the traces!")
+    if checkpoint is not None and workers is not None and workers > 1:
+        errors.append("The incremental conversion with a checkpoint runs in one process, leave workers out!")
+    if len(errors) == 0:
+        errors = check_provenance(provenance)
+        if len(errors) == 0:
+            plan = with_provenance(plan, provenance)
+    event_filter = None
+    if len(errors) == 0 and selection is not None:
+        selection, errors = load_selection(selection)
+        if selection is not None:
+            plan = select_plan(plan, selection)
+            event_filter = EventFilter(selection, referenced_keys(plan), plan.event_timestamp)
     if len(errors) > 0:
+        print(errors)
         return
 
-    file_name = descriptors["general_information_related_to_event_log"]["file_name"]
-    IRI = descriptors["general_information_related_to_event_log"]["IRI"]
-
-    # Create an RDF graph
-    g = Graph()
+    file_name = plan.file_name
+    ont_ns = plan.ont_ns
+
+    previous = None
+    if checkpoint is not None:
+        previous = load_checkpoint(checkpoint, "xpath")
+
+    # In streaming mode the traces are read one by one with iterparse and the
+    # whole log is never held in memory.
+    # The XES file annotated with the position of every element is only written
+    # for debugging, when annotated_xml_path is given
+    # (e.g. 'generated_documents/modified_xes_file_for_xpath.xml').
+    annotated_file = None
+    if annotated_xml_path is not None:
+        annotated_file = open(annotated_xml_path, "w", encoding="utf-8")
+
+    if pipeline:
+        traces = pipelined(iter_xes_traces(xes_file_path, annotated_file, event_filter))
+    elif streaming:
+        traces = iter_xes_traces(xes_file_path, annotated_file, event_filter)
+    else:
+        traces = None
+        if xes_cache is not False and annotated_file is None:
+            with stage(instrumentation, "load_parsed"):
+                try:
+                    traces = xes_cache.load(xes_file_path).traces(event_filter)
+                except Exception as error:
+                    print(f"Parsing {xes_file_path} without the XES cache: {error}")
+
+        if traces is None:
+            # Parse the XES file, the positions are computed from the tree while the traces are converted
+            with stage(instrumentation, "parse"):
+                tree = ET.parse(xes_file_path)
+                root = tree.getroot()
+
+                if annotated_file is not None:
+                    write_annotated_tree(root, annotated_file)
+
+            traces = (trace_from_element(trace, f"0/{i}", event_filter) for i, trace in enumerate(root) if trace.tag.endswith('trace'))
+
+    # The traces of the previous run are skipped before the sink is created, the
+    # last one must be the last trace of the previous run
+    first = 0
+    if previous is not None:
+        first = previous["traces"]
+        traces = iter(traces)
+        skipped = 0
+        for trace in islice(traces, first):
+            skipped += 1
+            skipped_id = _trace_id(trace)
+        errors = []
+        if skipped < first:
+            errors.append(f"{xes_file_path} has fewer traces than the previous run, the log has changed instead of growing!")
+        elif first > 0 and skipped_id != previous["last_trace_id"]:
+            errors.append(f"Trace {first} of {xes_file_path} is not the last trace of the previous run, the log has changed instead of growing!")
+        if len(errors) > 0:
+            if annotated_file is not None:
+                annotated_file.close()
+            print(errors)
+            return
+
+    # Create an RDF graph, once the log is known to extend the previous run: a
+    # rejected run leaves no empty delta file behind
+    if checkpoint is not None and sink is None and store is None:
+        sink = StreamingSink(delta_path("xpath_", file_name, previous))
+    if sink is None and store is not None:
+        sink = SqliteSink(store, *output_paths(file_name))
+    elif sink is None:
+        sink = GraphSink(*output_paths(file_name))
+    if checkpoint is not None:
+        sink = DeltaSink(sink, plan.vocabulary, previous["emitted_objects"] if previous is not None else [])
+    if pipeline:
+        sink = PipelineSink(sink)
+    g = sink
+    if instrumentation is not None:
+        g = instrumentation.count_triples(g, plan)
 
     # Define namespaces
-    ont_ns = f"{IRI}/ontology#"
-    owl_ns = "http://www.w3.org/2002/07/owl#"
-    rdf_ns = "http://www.w3.org/2000/01/rdf-schema#"
     g.bind("ont", ont_ns)
 
-    # Define classes
-    events_uri = URIRef(ont_ns + "events")
-    g.add((events_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_type_uri = URIRef(ont_ns + "event_type")
-    g.add((event_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_timestamp_uri = URIRef(ont_ns + "event_timestamp")
-    g.add((event_timestamp_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_attribute_name_uri = URIRef(ont_ns + "event_attribute_name")
-    g.add((event_attribute_name_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    event_attribute_value_uri = URIRef(ont_ns + "event_attribute_value")
-    g.add((event_attribute_value_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    objects_uri = URIRef(ont_ns + "objects")
-    g.add((objects_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_type_uri = URIRef(ont_ns + "object_type")
-    g.add((object_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_attribute_name_uri = URIRef(ont_ns + "object_attribute_name")
-    g.add((object_attribute_name_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_attribute_value_uri = URIRef(ont_ns + "object_attribute_value")
-    g.add((object_attribute_value_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    object_relation_type_uri = URIRef(ont_ns + "object_relation_type")
-    g.add((object_relation_type_uri, RDF.type, URIRef(owl_ns + "Class")))
-
-    involves_object_uri = URIRef(ont_ns + "relation_involves_object")
-    g.add((involves_object_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    for key, value in referred.items():
-        if key == "events": 
-            for attribute in value["attributes"]:
-                event_attribute_name_instance_uri = URIRef(ont_ns + attribute["event_attribute_name"])
-                g.add((event_attribute_name_instance_uri, RDF.type, event_attribute_name_uri))
-
-            for relation in value["relations_to_objects"]:
-                event_relation_type_uri = URIRef(ont_ns + relation["event_relation_type"])
-                g.add((event_relation_type_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-        if key == "objects": 
-            for obj in value: 
-                for attribute in obj["attributes"]:
-                    object_attribute_name_instance_uri = URIRef(ont_ns + attribute["object_attribute_name"])
-                    g.add((object_attribute_name_instance_uri, RDF.type, object_attribute_name_uri))
-
-                # if "relations" in obj:
-                #     for relation in obj["relations"]:
-                #         object_relation_type_instance_uri = URIRef(ont_ns + relation["object_relation_type"])
-                #         g.add((object_relation_type_instance_uri, RDF.type, object_relation_type_uri))
-
-
-    if "objects_relation" in injected:
-        for rel, rel_val in injected["objects_relation"].items():
-            if "relations" in rel_val:
-                for relation in rel_val["relations"]:
-                    object_relation_type_instance_uri = URIRef(ont_ns + relation["object_relation_type"])
-                    g.add((object_relation_type_instance_uri, RDF.type, URIRef(owl_ns + "Class")))
-                    g.add((object_relation_type_instance_uri, RDFS.subClassOf, object_relation_type_uri))
-
-    has_attribute_name_uri = URIRef(ont_ns + "has_attribute_name")
-    g.add((has_attribute_name_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_attribute_value_uri = URIRef(ont_ns + "has_attribute_value")
-    g.add((has_attribute_value_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_event_type_uri = URIRef(ont_ns + "has_event_type")
-    g.add((has_event_type_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_timestamp_uri = URIRef(ont_ns + "has_timestamp")
-    g.add((has_timestamp_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_object_type_uri = URIRef(ont_ns + "has_object_type")
-    g.add((has_object_type_uri, RDF.type, URIRef(owl_ns + "ObjectProperty")))
-
-    has_position_uri = URIRef(ont_ns + "has_position")
-    g.add((has_position_uri, RDF.type, URIRef(owl_ns + "DatatypeProperty")))
-
-
-    filtered_objects = [obj for obj in referred["objects"] if "is_trace" in obj]
-    trace_info = filtered_objects[0]
-
-    # Load the XML file
-    tree = ET.parse('generated_documents/modified_xes_file_for_xpath.xml')
-    root = tree.getroot()
-
-    '''
-    info can be: 
-    -   Representing a trace:
-        {'case:concept:name': {'value': '1-357087417', 'position': '0/27/0'}}
-        
-    -   Representing an event with all its information
-        {
-            'org:group': {'value': 'Org line G3', 'position': '0/27/2/0'}, 
-            'trace': '1-357087417', 
-            'resource country': {'value': 'POLAND', 'position': '0/27/2/1'}, 
-            'org:resource': {'value': 'Ewa', 'position': '0/27/2/2'}, 
-            'oranization country': {'value': 'us', 'position': '0/27/2/3'}, 
-            'concept:name': {'value': 'Completed', 'position': '0/27/2/4'}, 
-            'impact': {'value': 'Medium', 'position': '0/27/2/5'}, 
-            'product': {'value': 'PROD98', 'position': '0/27/2/6'}, 
-            'time:timestamp': {'value': '2012-01-30T12:30:21+01:00', 'position': '0/27/2/7'}, 
-            'lifecycle:transition': {'value': 'Closed', 'position': '0/27/2/8'}
-        }
-    '''
-    
-    # Define a function to extract information
-    def extract_info(element):
-        events = []
-        # Extract key, value, and position attributes
-        for trace in element:
-            info = {}
-            traceId = ""
-            if trace.tag.endswith('trace'):
-                for child in trace:
-                    if child.tag.endswith('string'):
-                        all_event_objects = {}
-                        key = f"case:{child.attrib['key']}"
-                        value = child.attrib['value']
-                        position = child.attrib['position']
-                        info[key] = {'value': value, 'position': position}
-                        traceId = value
-
-                        object_ids = {}
-                        object_ids = {}
-
-                        obj = trace_info 
-                        object_id = "OBJ_" + "_".join(["_".join(str(value).split(" ")) for trace_key in obj["object_identifier_selector"] if trace_key == key])
-                        object_instance_uri = URIRef(ont_ns + object_id)
-                        g.add((object_instance_uri, RDF.type, objects_uri))
-
-                        object_type_instance_uri = URIRef(ont_ns + obj["object_type"])
-                        g.add((object_type_instance_uri, RDF.type, object_type_uri))
-
-                        g.add((object_instance_uri, has_object_type_uri, object_type_instance_uri))
-                        g.add((object_instance_uri, has_position_uri, URIRef(ont_ns + position)))
-
-                        all_event_objects[obj["object_type"]] = object_instance_uri
-                        object_ids[obj["object_type"]] = object_id
-
-                        for attribute in obj["attributes"]:
-                            if attribute["object_attribute_value_selector"] in info:
-                                # Combine the base URI and the encoded resource name to create the full URI
-                                full_uri = ont_ns + urllib.parse.quote(str(info[attribute["object_attribute_value_selector"]]["value"]))
-                                g.add((URIRef(full_uri), RDF.type, object_attribute_value_uri))
-                                g.add((URIRef(full_uri), has_attribute_name_uri, URIRef(ont_ns + attribute["object_attribute_name"])))
-                                g.add((object_instance_uri, has_attribute_value_uri, URIRef(full_uri)))
-
-                for child in trace:
-                    event_position = ""
-                    if child.tag.endswith('event'):
-                        info = {}
-                        for eventChild in child:
-                            key = eventChild.attrib['key']
-                            value = eventChild.attrib['value']
-                            position = eventChild.attrib['position']
-                            info[key] = {'value': value, 'position': position}
-                            info["trace"] = traceId
-
-                            if event_position == "": 
-                                event_position = position[0:position.rfind("/")]
-                        events.append(info)
-
-                        # Create event instance
-                        index = len(events)
-                        events_data = referred["events"] 
-                        event_instance_uri = URIRef(ont_ns + "EventID_" + str(index + 1))
-                        g.add((event_instance_uri, RDF.type, events_uri))
-
-                        event_type_instance_uri = URIRef(ont_ns + "_".join(["_".join(str(info[event_key]["value"]).split(" ")) for event_key in events_data["event_type_selector"] if event_key in info]))
-                        g.add((event_type_instance_uri, RDF.type, event_type_uri))
-
-                        g.add((event_instance_uri, has_event_type_uri, event_type_instance_uri))
-
-                        date_object = parse(info[events_data["event_timestamp"]]["value"])
-                        iso8601_timestamp = date_object.isoformat()
-                        event_timestamp_instance_uri = URIRef(ont_ns + iso8601_timestamp)
-                        g.add((event_timestamp_instance_uri, RDF.type, event_timestamp_uri))
-                        g.add((event_timestamp_instance_uri, has_position_uri, URIRef(ont_ns + info[events_data["event_timestamp"]]["position"])))
-
-                        g.add((event_instance_uri, has_timestamp_uri, event_timestamp_instance_uri))
-                        g.add((event_instance_uri, has_position_uri, URIRef(ont_ns + event_position)))
-
-                        for attribute in events_data["attributes"]:
-                            # Combine the base URI and the encoded resource name to create the full URI
-                            full_uri = ont_ns + urllib.parse.quote(str(info[attribute["event_attribute_value_selector"]]["value"]))
-                            g.add((URIRef(full_uri), RDF.type, event_attribute_value_uri))
-                            g.add((URIRef(full_uri), has_attribute_name_uri, URIRef(ont_ns + attribute["event_attribute_name"])))
-                            g.add((URIRef(full_uri), has_position_uri, URIRef(ont_ns + info[attribute["event_attribute_value_selector"]]["position"])))
-
-                            g.add((event_instance_uri, has_attribute_value_uri, URIRef(full_uri)))
-
-                        # Create object instances
-                        objects_information = referred["objects"] 
-                        for i, obj in enumerate(objects_information):   
-                            if not "is_trace" in obj:
-                                object_id = "OBJ_" + "_".join(["_".join(str(info[object_key]["value"]).split(" ")) for object_key in obj["object_identifier_selector"] if object_key in info])
-                                object_instance_uri = URIRef(ont_ns + object_id)
-                                g.add((object_instance_uri, RDF.type, objects_uri))
-
-                                object_type_instance_uri = URIRef(ont_ns + obj["object_type"])
-                                g.add((object_type_instance_uri, RDF.type, object_type_uri))
-
-                                g.add((object_instance_uri, has_object_type_uri, object_type_instance_uri))
-
-                                all_event_objects[obj["object_type"]] = object_instance_uri
-                                object_ids[obj["object_type"]] = object_id
-
-                                for attribute in obj["attributes"]:
-                                    if attribute["object_attribute_value_selector"] in info: 
-                                        # Combine the base URI and the encoded resource name to create the full URI
-                                        full_uri = ont_ns + urllib.parse.quote(str(info[attribute["object_attribute_value_selector"]]["value"]))
-                                        g.add((URIRef(full_uri), RDF.type, object_attribute_value_uri))
-                                        g.add((URIRef(full_uri), has_attribute_name_uri, URIRef(ont_ns + attribute["object_attribute_name"])))
-                                        g.add((object_instance_uri, has_attribute_value_uri, URIRef(full_uri)))
-
-                        if "objects_relation" in injected:
-                            for rel, rel_val in injected["objects_relation"].items():
-                                if "relations" in rel_val:
-                                    for relation in rel_val["relations"]:
-                                        current_object_instance_uri = URIRef(ont_ns + object_ids[rel])
-                                        related_to_instance_uri = all_event_objects[relation["object_related_to"]]
-
-                                        relation_instance_uri = URIRef(ont_ns + f"{object_ids[rel]}_{object_ids[relation['object_related_to']]}")
-                                        g.add((relation_instance_uri, RDF.type, URIRef(ont_ns + f"{relation['object_relation_type']}")))
-
-                                        g.add((relation_instance_uri, involves_object_uri, current_object_instance_uri))
-                                        g.add((relation_instance_uri, involves_object_uri, related_to_instance_uri))
-
-                        # Now add the Event Relations because now all Object Instances are created and we can have the proper connections
-                        for relation in referred["events"]["relations_to_objects"]:
-                            g.add((event_instance_uri, URIRef(ont_ns + relation["event_relation_type"]), all_event_objects[f"{relation['event_related_to']}"]))
-
-        return info
-
-    # Call the function starting from the root element
-    extract_info(root)
-
-    # Create an ElementTree from the root
-    rdf_xml = g.serialize(format="xml")
-
-    rdf_file_path = f"generated_documents/xpath_{file_name}_data_to_rdf.rdf"
-    with open(rdf_file_path, "w", encoding="utf-8") as file:
-        file.write(rdf_xml)
-    print(f"RDF/XML content saved to {rdf_file_path}")
-
-    rdf_data = g.serialize(format="turtle")
-    # Serialize the graph to a file
-    with open(f"generated_documents/xpath_{file_name}_data_to_owl.owl", "w", encoding="utf-8") as f:
-        f.write(rdf_data)
-
-    print(f"OWL content saved to xpath_{file_name}_data_to_owl.owl")
+    # Define classes and properties
+    for triple in plan.schema_triples:
+        g.add(triple)
+
+    # In streaming mode the XES file is parsed while the traces are converted
+    with stage(instrumentation, "triples"):
+        if workers is None or workers <= 1:
+            # Convert the traces one by one, after the ones a resumed sink already has
+            state = new_trace_state(plan)
+            last_trace_id = None
+            if previous is not None:
+                # Go on from the watermark of the previous run
+                state = _restore_trace_state(previous)
+                last_trace_id = previous["last_trace_id"]
+            done = max(first, resume_point(g, "traces"))
+            replay = []
+            traces_count = first
+            for n, trace in enumerate(traces, first):
+                traces_count = n + 1
+                last_trace_id = _trace_id(trace)
+                if n < done:
+                    # Count its events and keep what is needed to rebuild the objects
+                    # of the last trace (see _trace_shards)
+                    state['events_count'] += len(trace['events'])
+                    if len(trace['strings']) > 0:
+                        replay = [trace]
+                    else:
+                        replay.append(trace)
+                    continue
+
+                if len(replay) > 0:
+                    events_count = state['events_count']
+                    for replayed in replay:
+                        add_trace_triples(ShardSink(), plan, replayed, state, uri_cache, timestamp_normalizer)
+                    state['events_count'] = events_count
+                    replay = []
+
+                add_trace_triples(g, plan, trace, state, uri_cache, timestamp_normalizer)
+                record_progress(g, "traces", n + 1)
+        else:
+            # The workers use their own URI cache and timestamp normalizer
+            convert_shards(_trace_shards(traces, shard_size), _convert_trace_shard, {'plan': plan}, g, workers)
+
+    if annotated_file is not None:
+        annotated_file.close()
+        print(f"Annotated XES content saved to {annotated_xml_path}")
+
+    if provenance_index_path is not None:
+        with stage(instrumentation, "provenance_index"):
+            index_path = build_provenance_index(xes_file_path, provenance_index_path)
+        print(f"Provenance index saved to {index_path}")
+
+    # Write the outputs
+    with stage(instrumentation, "write"):
+        g.close()
+
+    if checkpoint is not None:
+        save_checkpoint(checkpoint, {
+            "converter": "xpath",
+            "runs": previous["runs"] + 1 if previous is not None else 1,
+            "traces": traces_count,
+            "last_trace_id": last_trace_id,
+            "events_count": state['events_count'],
+            "all_event_objects": [str(uri) if uri is not None else None for uri in state['all_event_objects']],
+            "object_ids": state['object_ids'],
+            "emitted_objects": sorted(g.emitted_objects),
+        })
+
+    if workers is None or workers <= 1:
+        print(f"URI cache: {uri_cache.stats()}")
+        print(f"Timestamps: {timestamp_normalizer.stats()}")
+
+    if instrumentation is not None:
+        return instrumentation.finish(uri_cache=uri_cache, timestamps=timestamp_normalizer, xes_cache=xes_cache or None)
+
+
+def _trace_id(trace):
+    # The id of a trace record, as the traceId of add_trace_triples
+    if len(trace['strings']) == 0:
+        return ""
+    return trace['strings'][-1][1]
+
+
+def _restore_trace_state(checkpoint):
+    # The state new_trace_state would have after the traces of the checkpoint
+    return {
+        'events_count': checkpoint["events_count"],
+        'all_event_objects': [URIRef(uri) if uri is not None else None for uri in checkpoint["all_event_objects"]],
+        'object_ids': checkpoint["object_ids"],
+    }
+
+
+def _trace_shards(traces, shard_size):
+    # Group the trace records in shards of shard_size traces. A shard comes with
+    # the number of events before it and the records to replay so that it starts
+    # with the same objects as in a sequential run: the last trace with strings
+    # (they reset the objects) and the traces after it.
+    events_count = 0
+    replay = []
+    shard = []
+    shard_start = 0
+    shard_replay = []
+    for trace in traces:
+        shard.append(trace)
+        events_count += len(trace['events'])
+        if len(trace['strings']) > 0:
+            replay = [trace]
+        else:
+            replay.append(trace)
+
+        if len(shard) == shard_size:
+            yield (shard_start, shard_replay, shard)
+            shard = []
+            shard_start = events_count
+            shard_replay = list(replay)
+
+    if len(shard) > 0:
+        yield (shard_start, shard_replay, shard)
+
+
+def _convert_trace_shard(shard):
+    # Runs in a worker process of convert_shards
+    events_count, replay, traces = shard
+    plan = worker_context['plan']
+
+    state = new_trace_state(plan)
+    for trace in replay:
+        add_trace_triples(ShardSink(), plan, trace, state, default_uri_cache, default_timestamp_normalizer)
+    state['events_count'] = events_count
+
+    g = ShardSink()
+    for trace in traces:
+        add_trace_triples(g, plan, trace, state, default_uri_cache, default_timestamp_normalizer)
+    return list(g.triples)
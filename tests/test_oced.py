@@ -0,0 +1,89 @@
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from rdflib import Graph
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from source.sinks import StreamingSink
+from source.oced_reader import iter_oced_model
+from source.read_from_OCED import convert_OCED_to_rdf
+
+'''
+Converts the same OCED model as a JSON file, loaded and streamed, and as JSON
+Lines files with the records of the tables interleaved, and compares the triples.
+
+    python -m pytest tests
+'''
+
+DESCRIPTORS_FILE_PATH = os.path.join(ROOT, "descriptors.json")
+OCED_FILE_PATH = os.path.join(ROOT, "OCED_data.json")
+
+# An object that does not exist, its value comes before it in the interleaved files
+MISSING_OBJECT = {"object_id": "object_MISSING", "object_type": "Product", "object_existency": False}
+MISSING_VALUE = {
+    "object_attribute_value_id": "object_attribute_value_missing", "object_id": "object_MISSING",
+    "object_attribute_name": "Product_number", "object_attribute_value": "MISSING_VALUE",
+    "object_attribute_value_existency": True,
+}
+
+
+def _convert(oced_file_path, **options):
+    output = io.StringIO()
+    with redirect_stdout(io.StringIO()):
+        convert_OCED_to_rdf(oced_file_path, DESCRIPTORS_FILE_PATH, sink=StreamingSink(output), **options)
+    return set(Graph().parse(data=output.getvalue(), format="nt"))
+
+
+def _write_jsonl(path, records):
+    with open(path, 'w', encoding="utf-8") as jsonl_file:
+        for table, record in records:
+            jsonl_file.write(json.dumps({"table": table, "record": record}) + "\n")
+
+
+class InterleavedOcedTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        with open(OCED_FILE_PATH, 'r', encoding="utf-8") as json_file:
+            model = json.load(json_file)
+        model["object"].append(MISSING_OBJECT)
+        model["object_attribute_value"].append(MISSING_VALUE)
+        cls.json_path = os.path.join(cls.directory.name, "model_OCED.json")
+        with open(cls.json_path, 'w', encoding="utf-8") as json_file:
+            json.dump(model, json_file)
+        cls.records = list(iter_oced_model(model))
+        cls.expected = _convert(cls.json_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_missing_object_value_is_dropped(self):
+        self.assertFalse(any(MISSING_VALUE["object_attribute_value"] in str(term) for triple in self.expected for term in triple))
+        self.assertEqual(_convert(self.json_path, streaming=True), self.expected)
+
+    def test_value_before_missing_object(self):
+        # An object that exists, the value of the missing object, then the missing object
+        records = [record for record in self.records if record[1] is not MISSING_OBJECT and record[1] is not MISSING_VALUE]
+        first_object = next(n for n, (table, _) in enumerate(records) if table == "object")
+        records[first_object + 1:first_object + 1] = [("object_attribute_value", MISSING_VALUE), ("object", MISSING_OBJECT)]
+        jsonl_path = os.path.join(self.directory.name, "interleaved.jsonl")
+        _write_jsonl(jsonl_path, records)
+        self.assertEqual(_convert(jsonl_path), self.expected)
+
+    def test_values_before_objects(self):
+        # All the object attribute values first
+        records = sorted(self.records, key=lambda record: record[0] != "object_attribute_value")
+        jsonl_path = os.path.join(self.directory.name, "values_first.jsonl")
+        _write_jsonl(jsonl_path, records)
+        self.assertEqual(_convert(jsonl_path), self.expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import io
+import os
+import re
+import sys
+import json
+import asyncio
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from rdflib import Graph
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from source.sinks import StreamingSink
+from source.service import ConversionService, ServiceClient, _ThreadOutput, _xes_document
+from source.manual_solution import convert_xes_to_rdf_manual_position
+from source.xpath_solution import convert_xes_to_rdf_xpath_position
+from source.read_from_OCED import convert_OCED_to_rdf
+
+'''
+Drives a ConversionService on a temporary Unix socket with ServiceClient and
+compares its triples with the ones of the converters run directly.
+
+    python -m pytest tests
+'''
+
+DESCRIPTORS_FILE_PATH = os.path.join(ROOT, "descriptors.json")
+XES_FILE_PATH = os.path.join(ROOT, "data.xes")
+OCED_FILE_PATH = os.path.join(ROOT, "OCED_data.json")
+
+
+def _first_trace():
+    # The first <trace> element of data.xes, as a fragment without <log> around it
+    with open(XES_FILE_PATH, 'rb') as xes_file:
+        content = xes_file.read()
+    return re.search(rb'<trace>.*?</trace>', content, re.DOTALL).group(0)
+
+
+def _graph(triples, format="nt"):
+    return set(Graph().parse(data=triples, format=format))
+
+
+def _direct(convert, input_path, **options):
+    # The N-Triples of a converter run directly on input_path
+    output = io.StringIO()
+    sink = StreamingSink(output)
+    with redirect_stdout(io.StringIO()):
+        report = convert(input_path, DESCRIPTORS_FILE_PATH, sink=sink, **options)
+    return output.getvalue(), report
+
+
+class ConversionServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # The converters write their caches in generated_documents of the working directory
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.previous_directory = os.getcwd()
+        os.chdir(cls.directory.name)
+        os.makedirs("generated_documents")
+        cls.socket_path = os.path.join(cls.directory.name, "service.sock")
+
+        cls.service = ConversionService(DESCRIPTORS_FILE_PATH)
+        cls.loop = asyncio.new_event_loop()
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        with redirect_stdout(io.StringIO()):
+            asyncio.run_coroutine_threadsafe(cls.service.start(unix_socket=cls.socket_path), cls.loop).result(10)
+        cls.client = ServiceClient(unix_socket=cls.socket_path)
+
+        cls.fragment = _first_trace()
+        cls.fragment_path = os.path.join(cls.directory.name, "fragment.xes")
+        with open(cls.fragment_path, 'wb') as xes_file:
+            xes_file.write(_xes_document(cls.fragment))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+
+        async def stop():
+            cls.service.server.close()
+            await cls.service.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(stop(), cls.loop).result(10)
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join(10)
+        cls.loop.close()
+        cls.service.close()
+        os.chdir(cls.previous_directory)
+        cls.directory.cleanup()
+
+    def assert_status(self, status, request):
+        # ServiceClient raises a RuntimeError that starts with the status of the response
+        with self.assertRaises(RuntimeError) as context:
+            request()
+        self.assertTrue(str(context.exception).startswith(f"{status} "), str(context.exception))
+        return str(context.exception)
+
+    def test_health(self):
+        health = self.client.health()
+        self.assertEqual(health["status"], "ok")
+        self.assertIn("uri_cache", health)
+        self.assertIn("timestamps", health)
+
+    def test_xes_fragment_xpath(self):
+        triples = self.client.convert_xes(self.fragment, converter="xpath")
+        expected, _ = _direct(convert_xes_to_rdf_xpath_position, self.fragment_path, streaming=True)
+        self.assertGreater(int(self.client.last_headers["X-Triples"]), 0)
+        self.assertEqual(_graph(triples), _graph(expected))
+
+    def test_xes_fragment_manual(self):
+        triples = self.client.convert_xes(self.fragment, converter="manual")
+        expected, _ = _direct(convert_xes_to_rdf_manual_position, self.fragment_path, xes_cache=False)
+        self.assertEqual(int(self.client.last_headers["X-Triples"]), len(_graph(triples)))
+        self.assertEqual(_graph(triples), _graph(expected))
+
+    def test_oced(self):
+        with open(OCED_FILE_PATH, 'rb') as json_file:
+            payload = json_file.read()
+        expected, _ = _direct(convert_OCED_to_rdf, OCED_FILE_PATH)
+        self.assertEqual(_graph(self.client.convert_oced(payload)), _graph(expected))
+        self.assertEqual(_graph(self.client.convert_oced(json.loads(payload), format="turtle"), "turtle"), _graph(expected))
+
+    def test_bad_requests(self):
+        self.assert_status(400, lambda: self.client.convert_xes(self.fragment, format="xml"))
+        self.assert_status(400, lambda: self.client.convert_xes(self.fragment, converter="pm4py"))
+        self.assert_status(404, lambda: self.client._request("GET", "/logs"))
+        self.assert_status(405, lambda: self.client._request("GET", "/xes"))
+
+    def test_payload_too_large(self):
+        # The connection is closed after a 413, the next request opens a new one
+        max_body_bytes = self.service.max_body_bytes
+        self.service.max_body_bytes = 16
+        try:
+            self.assert_status(413, lambda: self.client.convert_xes(self.fragment))
+        finally:
+            self.service.max_body_bytes = max_body_bytes
+        self.assertEqual(self.client.health()["status"], "ok")
+
+    def test_rejected_payloads(self):
+        # An exception of the converter and the errors it prints
+        self.assert_status(422, lambda: self.client.convert_oced(b"{not json"))
+        message = self.assert_status(422, lambda: self.client.convert_xes(self.fragment, provenance="all"))
+        self.assertIn("provenance should be one of", message)
+
+    def test_socket_path_of_other_file(self):
+        # A file that is not a socket is not removed to listen on its path
+        path = os.path.join(self.directory.name, "not_a_socket")
+        with open(path, 'w') as other_file:
+            other_file.write("kept")
+        service = ConversionService(DESCRIPTORS_FILE_PATH)
+        try:
+            with self.assertRaises(FileExistsError):
+                asyncio.run(service.start(unix_socket=path))
+        finally:
+            service.close()
+        with open(path, 'r') as other_file:
+            self.assertEqual(other_file.read(), "kept")
+
+    def test_output_of_other_threads(self):
+        # What the capturing thread prints is kept, the other threads print to stdout
+        output = _ThreadOutput(io.StringIO())
+        with output.capture() as printed:
+            print("conversion", file=output)
+            thread = threading.Thread(target=lambda: print("other thread", file=output))
+            thread.start()
+            thread.join()
+        print("after", file=output)
+        self.assertEqual(printed.getvalue(), "conversion\n")
+        self.assertEqual(output.stdout.getvalue(), "other thread\nafter\n")
+
+
+if __name__ == "__main__":
+    unittest.main()